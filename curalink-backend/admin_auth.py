@@ -0,0 +1,19 @@
+import hmac
+import os
+from typing import Optional
+
+from fastapi import Header, HTTPException, status
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Operational endpoints (/debug/*) are only reachable with this token; they
+# stay disabled when it is not set
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """FastAPI dependency guarding admin-only endpoints"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin endpoints are disabled")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid admin token")
@@ -4,12 +4,15 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 import os
 from dotenv import load_dotenv
 
 from database import get_db
 from models import User
+from ttl_cache import TTLCache
+from password_hashing import PasswordHasher
 
 load_dotenv()
 
@@ -17,7 +20,24 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-this-in-production"
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Authenticated users are resolved on every request; keep detached copies for a
+# short time instead of querying the users table each time
+user_cache = TTLCache(
+    "sql_users",
+    ttl_seconds=float(os.getenv("USER_CACHE_TTL_SECONDS", "30")),
+    max_entries=int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+)
+
+# Hashes made with any other cost than BCRYPT_ROUNDS are upgraded on the next login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS
+)
+password_hasher = PasswordHasher(pwd_context, max_workers=int(os.getenv("PASSWORD_HASH_WORKERS", "2")))
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -36,7 +56,16 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+def token_subject(token: str) -> Optional[str]:
+    """The user id an access token was issued to, or None if it is invalid or expired"""
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    subject = payload.get("sub")
+    return str(subject) if subject is not None else None
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -50,7 +79,16 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     except JWTError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.id == user_id).first()
+    cached_user = user_cache.get(str(user_id))
+    if cached_user is not None:
+        # Attach a copy to this request's session without hitting the database
+        return await db.merge(cached_user, load=False)
+    
+    user = await db.scalar(select(User).where(User.id == user_id))
     if user is None:
         raise credentials_exception
-    return user
+    
+    # Cache a detached instance so this session's commits cannot expire it
+    db.expunge(user)
+    user_cache.set(str(user_id), user)
+    return await db.merge(user, load=False)
@@ -0,0 +1,207 @@
+"""
+Pub/sub backplane for WebSocket delivery across workers.
+
+Every worker only holds its own sockets, so a message for a user, a topic or
+everyone is published on the backplane and each worker delivers it to the
+connections it has. Envelopes are small JSON documents:
+
+    {"origin": "<worker id>", "kind": "user", "user_id": "42", "message": "...", "message_type": "chat_message"}
+    {"origin": "<worker id>", "kind": "broadcast", "exclude_user": "7", "message": "..."}
+    {"origin": "<worker id>", "kind": "topic", "topics": ["forum:3", "thread:17"], "message": "..."}
+
+Implementations (WS_BACKPLANE):
+
+    inprocess   single worker; nothing to forward (default)
+    local       several workers on one host; unix datagram sockets in WS_BACKPLANE_DIR
+    redis       any number of hosts; Redis PUBLISH/SUBSCRIBE on WS_BACKPLANE_CHANNEL
+                (WS_BACKPLANE_URL, requires the `redis` package; Valkey/KeyDB work too)
+
+The publishing worker delivers its own copy directly, without a round trip
+through the backplane, and ignores its own envelopes when they come back.
+"""
+
+import asyncio
+import glob
+import json
+import os
+import socket
+import uuid
+from typing import Callable, Optional
+
+from dotenv import load_dotenv
+
+from metrics import Counter
+
+load_dotenv()
+
+PUBLISHED = Counter("backplane_messages_published_total", "Envelopes published to other workers", ["backend"])
+RECEIVED = Counter("backplane_messages_received_total", "Envelopes received from other workers", ["backend"])
+PUBLISH_ERRORS = Counter("backplane_publish_errors_total", "Envelopes that could not be published", ["backend", "reason"])
+
+Deliver = Callable[[dict], None]
+
+class Backplane:
+    """Base class: publish() forwards an envelope to the other workers, start() receives theirs"""
+
+    name = "inprocess"
+
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._deliver: Optional[Deliver] = None
+
+    async def start(self, deliver: Deliver):
+        self._deliver = deliver
+
+    async def stop(self):
+        pass
+
+    async def publish(self, envelope: dict):
+        """Forward to the other workers; the caller has already delivered its own copy"""
+        envelope["origin"] = self.worker_id
+        await self._publish_remote(envelope)
+
+    async def _publish_remote(self, envelope: dict):
+        pass
+
+    def _receive(self, payload: bytes):
+        try:
+            envelope = json.loads(payload)
+        except ValueError:
+            return
+        if envelope.get("origin") == self.worker_id or self._deliver is None:
+            return  # Our own message, already delivered
+        RECEIVED.labels(backend=self.name).inc()
+        self._deliver(envelope)
+
+class InProcessBackplane(Backplane):
+    """Single worker: nothing to forward"""
+
+class LocalSocketBackplane(Backplane):
+    """Workers on one host; each binds <directory>/<worker>.sock and sends datagrams to the others"""
+
+    name = "local"
+
+    def __init__(self, directory: str):
+        super().__init__()
+        self.directory = directory
+        self.path = os.path.join(directory, f"{os.getpid()}-{uuid.uuid4().hex[:6]}.sock")
+        self._transport = None
+        self._sender: Optional[socket.socket] = None
+
+    async def start(self, deliver: Deliver):
+        await super().start(deliver)
+        os.makedirs(self.directory, exist_ok=True)
+        backplane = self
+
+        class Protocol(asyncio.DatagramProtocol):
+            def datagram_received(self, data, addr):
+                backplane._receive(data)
+
+        self._transport, _ = await asyncio.get_running_loop().create_datagram_endpoint(
+            Protocol, local_addr=self.path, family=socket.AF_UNIX
+        )
+        self._sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sender.setblocking(False)
+        print(f"📡 WebSocket backplane listening on {self.path}")
+
+    async def stop(self):
+        if self._transport:
+            self._transport.close()
+        if self._sender:
+            self._sender.close()
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    async def _publish_remote(self, envelope: dict):
+        if self._sender is None:
+            return
+        payload = json.dumps(envelope).encode()
+        for path in glob.glob(os.path.join(self.directory, "*.sock")):
+            if path == self.path:
+                continue
+            try:
+                self._sender.sendto(payload, path)
+                PUBLISHED.labels(backend=self.name).inc()
+            except (ConnectionRefusedError, FileNotFoundError):
+                # A worker that exited without cleaning up
+                PUBLISH_ERRORS.labels(backend=self.name, reason="stale_socket").inc()
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            except BlockingIOError:
+                PUBLISH_ERRORS.labels(backend=self.name, reason="receiver_full").inc()
+            except OSError as e:
+                PUBLISH_ERRORS.labels(backend=self.name, reason="error").inc()
+                print(f"❌ Backplane send to {path} failed: {e}")
+
+class RedisBackplane(Backplane):
+    """Redis (or any server speaking its pub/sub protocol) shared by every worker and host"""
+
+    name = "redis"
+
+    def __init__(self, url: str, channel: str):
+        super().__init__()
+        self.url = url
+        self.channel = channel
+        self._redis = None
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self, deliver: Deliver):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("WS_BACKPLANE=redis requires the redis package (pip install redis)")
+
+        await super().start(deliver)
+        self._redis = redis.from_url(self.url)
+        self._pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(self.channel)
+        self._listener = asyncio.get_running_loop().create_task(self._listen())
+        print(f"📡 WebSocket backplane subscribed to {self.channel}")
+
+    async def _listen(self):
+        while True:
+            try:
+                async for message in self._pubsub.listen():
+                    self._receive(message["data"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Backplane subscription error: {e}; resubscribing")
+                await asyncio.sleep(1)
+
+    async def stop(self):
+        if self._listener:
+            self._listener.cancel()
+        if self._pubsub:
+            await self._pubsub.close()
+        if self._redis:
+            await self._redis.close()
+
+    async def _publish_remote(self, envelope: dict):
+        if self._redis is None:
+            return
+        try:
+            await self._redis.publish(self.channel, json.dumps(envelope))
+            PUBLISHED.labels(backend=self.name).inc()
+        except Exception as e:
+            PUBLISH_ERRORS.labels(backend=self.name, reason="error").inc()
+            print(f"❌ Backplane publish failed: {e}")
+
+def create_backplane() -> Backplane:
+    """Backplane selected by WS_BACKPLANE"""
+    kind = os.getenv("WS_BACKPLANE", "inprocess").lower()
+    if kind == "local":
+        return LocalSocketBackplane(os.getenv("WS_BACKPLANE_DIR", "/tmp/curalink-backplane"))
+    if kind == "redis":
+        return RedisBackplane(
+            os.getenv("WS_BACKPLANE_URL", "redis://localhost:6379/0"),
+            os.getenv("WS_BACKPLANE_CHANNEL", "curalink:websocket")
+        )
+    if kind != "inprocess":
+        raise ValueError(f"Unknown WS_BACKPLANE {kind!r}; use inprocess, local or redis")
+    return InProcessBackplane()
@@ -0,0 +1,106 @@
+"""
+Coalesce concurrent inserts into batch writes.
+
+Producers call `await writer.write(item)`; items written by concurrent
+requests within NOTIFICATION_BATCH_DELAY_MS of each other (or until
+NOTIFICATION_BATCH_SIZE are waiting) are handed to the flush function
+together, i.e. one insert_many / multi-row INSERT and one commit instead of
+one per item. write() returns once the batch is stored, with the item's id
+set, so the caller can push it right away.
+
+If a batch fails, its items are retried one at a time so each producer gets
+its own outcome: one bad row doesn't fail the requests it happened to share
+a batch with. The flush function must therefore leave nothing behind when
+it raises (roll back), or tolerate storing an item that's already there.
+"""
+
+import asyncio
+import os
+from typing import Awaitable, Callable, Generic, List, Optional, Set, Tuple, TypeVar
+
+from dotenv import load_dotenv
+
+from metrics import Histogram
+
+load_dotenv()
+
+NOTIFICATION_BATCH_SIZE = int(os.getenv("NOTIFICATION_BATCH_SIZE", "100"))
+NOTIFICATION_BATCH_DELAY_MS = float(os.getenv("NOTIFICATION_BATCH_DELAY_MS", "5"))
+
+BATCH_SIZE = Histogram(
+    "batch_writer_batch_size", "Items stored per batch write", ["writer"],
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500)
+)
+
+T = TypeVar("T")
+
+class BatchWriter(Generic[T]):
+    """Stores items with `flush(items)`, batching the ones written concurrently"""
+
+    def __init__(self, name: str, flush: Callable[[List[T]], Awaitable[None]],
+                 max_batch: int = NOTIFICATION_BATCH_SIZE, max_delay_ms: float = NOTIFICATION_BATCH_DELAY_MS):
+        self.name = name
+        self._flush = flush
+        self.max_batch = max(max_batch, 1)
+        self.max_delay = max(max_delay_ms, 0) / 1000
+        self._pending: List[Tuple[T, asyncio.Future]] = []
+        self._timer: Optional[asyncio.Task] = None
+        self._writing: Set[asyncio.Task] = set()
+
+    async def write(self, item: T) -> T:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future))
+        if len(self._pending) >= self.max_batch:
+            if self._timer is not None:
+                # This batch is written now; the next item starts a new timer
+                self._timer.cancel()
+                self._timer = None
+            self._write_pending()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().create_task(self._write_later())
+        # shield: a cancelled request must not cancel the batch it shares with others
+        return await asyncio.shield(future)
+
+    async def _write_later(self):
+        await asyncio.sleep(self.max_delay)
+        self._timer = None
+        self._write_pending()
+
+    def _write_pending(self):
+        """Hand everything waiting to a task of its own, so no single producer owns the write"""
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._write(batch))
+            self._writing.add(task)
+            task.add_done_callback(self._writing.discard)
+
+    async def _write(self, batch: List[Tuple[T, asyncio.Future]]):
+        BATCH_SIZE.labels(writer=self.name).observe(len(batch))
+        try:
+            await self._flush([item for item, _ in batch])
+        except Exception as e:
+            if len(batch) == 1:
+                print(f"❌ {self.name} write failed: {e}")
+                self._settle(batch[0][1], error=e)
+                return
+            print(f"⚠️ {self.name} batch of {len(batch)} failed ({e}), retrying one at a time")
+            for item, future in batch:
+                try:
+                    await self._flush([item])
+                except Exception as item_error:
+                    print(f"❌ {self.name} write failed: {item_error}")
+                    self._settle(future, error=item_error)
+                else:
+                    self._settle(future, item)
+            return
+        for item, future in batch:
+            self._settle(future, item)
+
+    @staticmethod
+    def _settle(future: asyncio.Future, item=None, error: Optional[Exception] = None):
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(item)
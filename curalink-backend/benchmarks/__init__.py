@@ -0,0 +1,20 @@
+"""
+Reproducible load tests for the SQL (main:app) and MongoDB (main_mongodb:app) backends.
+
+    synthetic.py   deterministic synthetic dataset at a configurable scale
+    seed.py        loads a dataset into SQLite/MySQL or MongoDB (wipes the target first)
+    workloads.py   scripted request mixes, per backend
+    run.py         seeds each scale, drives a workload and records latency percentiles
+    compare.py     diffs two result files and flags regressions
+
+Typical session (run from curalink-backend/):
+
+    python -m benchmarks.run --backend sql --scales 1,10,100 --output results/sql-before.json
+    # ... change something ...
+    python -m benchmarks.run --backend sql --scales 1,10,100 --output results/sql-after.json
+    python -m benchmarks.compare results/sql-before.json results/sql-after.json
+
+Both apps connect to MongoDB on startup, so a local MongoDB must be running
+for either backend. Seeding drops and recreates the benchmark databases, so
+they are passed explicitly and default to throwaway names.
+"""
@@ -0,0 +1,82 @@
+"""
+Diff two benchmark result files.
+
+    python -m benchmarks.compare results/before.json results/after.json --threshold 10
+
+Each (scale, operation) present in both files is compared on p50, p99 and
+throughput. A latency increase beyond --threshold percent (and beyond the
+--min-ms noise floor) or a higher error rate is a regression; the exit status
+is 1 when there is at least one, so the comparison can gate CI.
+"""
+
+import json
+import sys
+
+def _change(before: float, after: float) -> float:
+    if not before:
+        return 0.0 if not after else float("inf")
+    return (after - before) / before * 100
+
+def compare(baseline: dict, candidate: dict, threshold: float = 10, min_ms: float = 1) -> list:
+    """One row per (scale, operation) found in both results"""
+    baseline_runs = {run["scale"]: run for run in baseline["runs"]}
+    rows = []
+    for run in candidate["runs"]:
+        before_run = baseline_runs.get(run["scale"])
+        if before_run is None:
+            continue
+        for name, after in run["operations"].items():
+            before = before_run["operations"].get(name)
+            if before is None:
+                continue
+            row = {"scale": run["scale"], "operation": name, "regressions": []}
+            for metric in ("p50_ms", "p99_ms"):
+                change = _change(before[metric], after[metric])
+                row[metric] = (before[metric], after[metric], change)
+                if change > threshold and after[metric] - before[metric] > min_ms:
+                    row["regressions"].append(metric)
+            row["throughput_rps"] = (
+                before["throughput_rps"], after["throughput_rps"],
+                _change(before["throughput_rps"], after["throughput_rps"])
+            )
+            if after["error_rate"] > before["error_rate"]:
+                row["regressions"].append("error_rate")
+            rows.append(row)
+    return rows
+
+def print_comparison(rows: list):
+    print(f"{'scale':>5}  {'operation':<58} {'p50 ms':>22} {'p99 ms':>22} {'req/s':>20}")
+    for row in rows:
+        cells = []
+        for metric in ("p50_ms", "p99_ms", "throughput_rps"):
+            before, after, change = row[metric]
+            cells.append(f"{before:>7} → {after:<7} {change:+6.1f}%")
+        flag = "  ❌ " + ", ".join(row["regressions"]) if row["regressions"] else ""
+        print(f"{row['scale']:>5}  {row['operation']:<58} " + " ".join(cells) + flag)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10, help="allowed latency increase in percent")
+    parser.add_argument("--min-ms", type=float, default=1, help="ignore latency changes smaller than this")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    for key in ("backend", "workload", "requests", "concurrency", "seed"):
+        if baseline["meta"].get(key) != candidate["meta"].get(key):
+            print(f"⚠️  {key} differs: {baseline['meta'].get(key)} vs {candidate['meta'].get(key)}")
+
+    rows = compare(baseline, candidate, args.threshold, args.min_ms)
+    print_comparison(rows)
+    regressions = [row for row in rows if row["regressions"]]
+    if regressions:
+        print(f"\n❌ {len(regressions)} regression(s) beyond {args.threshold:g}%")
+        sys.exit(1)
+    print("\n✅ No regressions")
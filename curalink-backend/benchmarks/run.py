@@ -0,0 +1,237 @@
+"""
+Drive a workload against the SQL or MongoDB app and record latency percentiles.
+
+For every scale the benchmark database is reseeded, the app is started, a
+warm-up pass runs, and then a fixed number of requests is sent with a fixed
+number of concurrent clients. The request sequence is derived from --seed, so
+two runs send exactly the same requests.
+
+    python -m benchmarks.run --backend sql --scales 1,10,100 --output results/sql.json
+    python -m benchmarks.run --backend mongo --workload write_heavy --concurrency 32
+
+By default the app runs in-process (httpx ASGITransport), which measures the
+application without network or server overhead. To measure a real server,
+seed it with benchmarks.seed --manifest, start it with the same SECRET_KEY,
+and pass --base-url and --manifest.
+
+With several scales the report ends with each endpoint's p99 per scale and
+the first scale at which it breaks the --slo-ms latency or 1% error budget.
+"""
+
+import asyncio
+import importlib
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+from datetime import datetime
+
+from benchmarks.seed import DEFAULT_DATABASE_URL, DEFAULT_MONGODB_URL, seed
+from benchmarks.workloads import get_workload
+
+APP_MODULES = {"sql": "main", "mongo": "main_mongodb"}
+AUTH_MODULES = {"sql": "auth_utils", "mongo": "mongodb_auth_utils"}
+MAX_ERROR_RATE = 0.01
+
+def percentile(sorted_values: list, q: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(q / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+def summarize(latencies: list, errors: int, wall_seconds: float) -> dict:
+    latencies = sorted(latencies)
+    count = len(latencies)
+    ms = lambda seconds: round(seconds * 1000, 2)
+    return {
+        "requests": count,
+        "errors": errors,
+        "error_rate": round(errors / count, 4) if count else 0.0,
+        "throughput_rps": round(count / wall_seconds, 1) if wall_seconds else 0.0,
+        "mean_ms": ms(sum(latencies) / count) if count else 0.0,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p90_ms": ms(percentile(latencies, 90)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "max_ms": ms(latencies[-1]) if latencies else 0.0,
+    }
+
+def plan_requests(operations: list, manifest: dict, count: int, seed_value: int) -> list:
+    rng = random.Random(seed_value)
+    chosen = rng.choices(operations, [op.weight for op in operations], k=count)
+    return [(op, op.request(manifest, rng)) for op in chosen]
+
+async def drive(client, plan: list, concurrency: int, token_for) -> tuple:
+    """Send the planned requests with `concurrency` closed-loop clients"""
+    samples = {}
+    errors = {}
+    statuses = {}
+    next_index = iter(range(len(plan)))
+
+    async def worker():
+        for index in next_index:
+            op, spec = plan[index]
+            headers = {"Authorization": f"Bearer {token_for(spec['user'])}"}
+            started_at = time.perf_counter()
+            try:
+                response = await client.request(op.method, spec["url"], params=spec["params"], json=spec["json"], headers=headers)
+                status = response.status_code
+            except Exception as e:
+                status = type(e).__name__
+            samples.setdefault(op.name, []).append(time.perf_counter() - started_at)
+            if not isinstance(status, int) or status >= 400:
+                errors[op.name] = errors.get(op.name, 0) + 1
+                statuses.setdefault(op.name, {}).setdefault(str(status), 0)
+                statuses[op.name][str(status)] += 1
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples, errors, statuses, time.perf_counter() - started_at
+
+def _client(args, app=None):
+    import httpx
+    if args.base_url:
+        return httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark", timeout=args.timeout)
+
+async def run_scale(args, scale: int, app, token_for) -> dict:
+    if args.manifest:
+        with open(args.manifest) as f:
+            manifest = json.load(f)
+    else:
+        manifest = await seed(args.backend, scale, args.seed, args.database_url, args.mongodb_url)
+
+    operations = get_workload(args.workload, args.backend)
+    warmup = plan_requests(operations, manifest, args.warmup, args.seed + 1)
+    plan = plan_requests(operations, manifest, args.requests, args.seed)
+
+    async def measure():
+        async with _client(args, app) as client:
+            await drive(client, warmup, args.concurrency, token_for)
+            return await drive(client, plan, args.concurrency, token_for)
+
+    if app is not None:
+        async with app.router.lifespan_context(app):
+            samples, errors, statuses, wall_seconds = await measure()
+    else:
+        samples, errors, statuses, wall_seconds = await measure()
+
+    all_latencies = [latency for latencies in samples.values() for latency in latencies]
+    return {
+        "scale": manifest.get("scale", scale),
+        "wall_seconds": round(wall_seconds, 3),
+        "overall": summarize(all_latencies, sum(errors.values()), wall_seconds),
+        "operations": {
+            name: dict(summarize(latencies, errors.get(name, 0), wall_seconds), error_statuses=statuses.get(name, {}))
+            for name, latencies in sorted(samples.items())
+        },
+    }
+
+def print_run(run: dict):
+    print(f"\n📊 Scale {run['scale']}: {run['overall']['requests']} requests in {run['wall_seconds']}s "
+          f"({run['overall']['throughput_rps']} req/s, p99 {run['overall']['p99_ms']} ms)")
+    print(f"{'operation':<58} {'n':>6} {'err':>5} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}")
+    for name, stats in run["operations"].items():
+        print(f"{name:<58} {stats['requests']:>6} {stats['errors']:>5} {stats['p50_ms']:>8} "
+              f"{stats['p90_ms']:>8} {stats['p99_ms']:>8} {stats['max_ms']:>8}")
+
+def breaking_points(runs: list, slo_ms: float) -> dict:
+    """p99 per scale for each operation and the first scale that breaks the budget"""
+    report = {}
+    for run in runs:
+        for name, stats in run["operations"].items():
+            entry = report.setdefault(name, {"p99_ms": {}, "breaks_at_scale": None})
+            entry["p99_ms"][str(run["scale"])] = stats["p99_ms"]
+            broken = stats["p99_ms"] > slo_ms or stats["error_rate"] > MAX_ERROR_RATE
+            if broken and entry["breaks_at_scale"] is None:
+                entry["breaks_at_scale"] = run["scale"]
+    return report
+
+def print_breaking_points(report: dict, scales: list, slo_ms: float):
+    print(f"\n📈 p99 (ms) by scale; ✗ marks the first scale over {slo_ms:g} ms or {MAX_ERROR_RATE:.0%} errors")
+    print(f"{'operation':<58}" + "".join(f"{'x' + str(scale):>10}" for scale in scales))
+    for name, entry in report.items():
+        cells = []
+        for scale in scales:
+            value = entry["p99_ms"].get(str(scale), "-")
+            mark = "✗" if entry["breaks_at_scale"] == scale else " "
+            cells.append(f"{value:>9}{mark}")
+        print(f"{name:<58}" + "".join(cells))
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+async def main(args):
+    # The apps read their database settings at import time
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ["MONGODB_URL"] = args.mongodb_url
+    app = None if args.base_url else importlib.import_module(APP_MODULES[args.backend]).app
+    create_access_token = importlib.import_module(AUTH_MODULES[args.backend]).create_access_token
+
+    tokens = {}
+    def token_for(user_id):
+        if user_id not in tokens:
+            tokens[user_id] = create_access_token(data={"sub": str(user_id)})
+        return tokens[user_id]
+
+    scales = [int(scale) for scale in args.scales.split(",")]
+    runs = []
+    for scale in scales:
+        run = await run_scale(args, scale, app, token_for)
+        print_run(run)
+        runs.append(run)
+
+    report = breaking_points(runs, args.slo_ms)
+    if len(runs) > 1:
+        print_breaking_points(report, [run["scale"] for run in runs], args.slo_ms)
+
+    result = {
+        "meta": {
+            "backend": args.backend,
+            "workload": args.workload,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+            "target": args.base_url or "in-process",
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "started_at": datetime.utcnow().isoformat() + "Z",
+        },
+        "runs": runs,
+        "breaking_points": report,
+    }
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\n📝 Results written to {args.output}")
+    return result
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run a load-test workload against the CuraLink API")
+    parser.add_argument("--backend", choices=["sql", "mongo"], default="sql")
+    parser.add_argument("--workload", default="read_mostly", help="read_only, read_mostly or write_heavy")
+    parser.add_argument("--scales", default="1", help="comma-separated data scales, e.g. 1,10,100")
+    parser.add_argument("--requests", type=int, default=2000, help="measured requests per scale")
+    parser.add_argument("--warmup", type=int, default=200, help="unmeasured requests sent first")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--slo-ms", type=float, default=500, help="p99 latency budget for the breaking-point report")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    parser.add_argument("--mongodb-url", default=DEFAULT_MONGODB_URL)
+    parser.add_argument("--base-url", help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--manifest", help="seed manifest to use instead of reseeding (with --base-url)")
+    parser.add_argument("--output", help="write the results as JSON")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,237 @@
+"""
+Load a synthetic dataset into the SQL database or MongoDB.
+
+The target is wiped first (tables dropped / collections dropped), so the
+database URL is always given explicitly:
+
+    python -m benchmarks.seed --backend sql --scale 10 --database-url sqlite:///./benchmark.db
+    python -m benchmarks.seed --backend mongo --scale 10 --mongodb-url mongodb://localhost:27017/curalink_benchmark
+
+--manifest writes the seeded ids, which run.py needs when it drives an
+already running server (--base-url).
+"""
+
+import json
+from datetime import timedelta
+
+from benchmarks.synthetic import Dataset, generate
+
+BENCHMARK_PASSWORD = "benchmark-password"
+BATCH_SIZE = 1000
+
+DEFAULT_DATABASE_URL = "sqlite:///./benchmark.db"
+DEFAULT_MONGODB_URL = "mongodb://localhost:27017/curalink_benchmark"
+
+def _batches(rows: list):
+    for start in range(0, len(rows), BATCH_SIZE):
+        yield rows[start:start + BATCH_SIZE]
+
+# SQL
+
+async def seed_sql(database_url: str, dataset: Dataset) -> dict:
+    """Recreate the SQL schema at `database_url` and bulk-load the dataset; returns the manifest"""
+    from sqlalchemy import insert
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    from database import Base, to_async_url
+    from migrations import migration_metadata, run_migrations
+    from models import (
+        User, UserRole, PatientProfile, ResearcherProfile, Forum, ForumPost,
+        ChatMessage, Notification, Favorite, MeetingRequest
+    )
+    from auth_utils import pwd_context
+
+    hashed_password = pwd_context.hash(BENCHMARK_PASSWORD)
+    paths = {}
+    for post in dataset.forum_posts:
+        paths[post["id"]] = ForumPost.build_path(paths.get(post["parent_id"]), post["id"])
+
+    tables = [
+        (User, [
+            {
+                "id": user["id"], "email": user["email"], "hashed_password": hashed_password,
+                "full_name": user["full_name"], "role": UserRole(user["role"]), "created_at": user["created_at"]
+            }
+            for user in dataset.users
+        ]),
+        (PatientProfile, dataset.patient_profiles),
+        (ResearcherProfile, dataset.researcher_profiles),
+        (Forum, [
+            {key: forum[key] for key in ("id", "title", "description", "category", "post_count", "created_at")}
+            for forum in dataset.forums
+        ]),
+        (ForumPost, [
+            {
+                "id": post["id"], "forum_id": post["forum_id"], "author_id": post["author_id"],
+                "parent_id": post["parent_id"], "path": paths[post["id"]], "content": post["content"],
+                "reply_count": post["reply_count"], "created_at": post["created_at"]
+            }
+            for post in dataset.forum_posts
+        ]),
+        (ChatMessage, dataset.messages),
+        (Notification, dataset.notifications),
+        (Favorite, dataset.favorites),
+        (MeetingRequest, dataset.meetings),
+    ]
+
+    engine = create_async_engine(to_async_url(database_url))
+    try:
+        async with engine.begin() as connection:
+            await connection.run_sync(migration_metadata.drop_all)
+            await connection.run_sync(Base.metadata.drop_all)
+            await connection.run_sync(run_migrations)
+            for model, rows in tables:
+                for batch in _batches(rows):
+                    await connection.execute(insert(model.__table__), batch)
+    finally:
+        await engine.dispose()
+
+    print(f"✅ Seeded SQL database at scale {dataset.scale}: {dataset.counts()}")
+    return dataset.manifest()
+
+# MongoDB
+
+def object_id(value: int, created_at) -> str:
+    """Deterministic ObjectId: the real creation time followed by the synthetic id"""
+    return f"{int(created_at.timestamp()) & 0xFFFFFFFF:08x}{value:016x}"
+
+MONGO_MEETING_STATUS = {"pending": "scheduled", "accepted": "completed", "rejected": "cancelled"}
+
+async def seed_mongo(mongodb_url: str, dataset: Dataset) -> dict:
+    """Drop the collections at `mongodb_url` and bulk-load the dataset; returns the manifest"""
+    from bson import ObjectId
+    from beanie import init_beanie
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    from mongodb_models import (
+        User, Trial, Publication, Expert, Forum, ForumPost, Favorite, ChatMessage, Meeting, Notification
+    )
+    from mongodb_auth_utils import pwd_context
+
+    hashed_password = pwd_context.hash(BENCHMARK_PASSWORD)
+    user_ids = {user["id"]: object_id(user["id"], user["created_at"]) for user in dataset.users}
+    user_names = {user["id"]: user["full_name"] for user in dataset.users}
+    forum_ids = {forum["id"]: object_id(forum["id"], forum["created_at"]) for forum in dataset.forums}
+    post_ids = {post["id"]: object_id(post["id"], post["created_at"]) for post in dataset.forum_posts}
+    paths = {}
+    for post in dataset.forum_posts:
+        paths[post["id"]] = ForumPost.build_path(paths.get(post["parent_id"]), post_ids[post["id"]])
+
+    collections = [
+        (User, [
+            {
+                "_id": ObjectId(user_ids[user["id"]]), "email": user["email"], "username": user["username"],
+                "full_name": user["full_name"], "hashed_password": hashed_password, "role": user["role"],
+                "is_active": True, "is_verified": False, "specialization": user["specialty"],
+                "institution": user["institution"], "created_at": user["created_at"], "updated_at": user["created_at"]
+            }
+            for user in dataset.users
+        ]),
+        (Forum, [
+            {
+                "_id": ObjectId(forum_ids[forum["id"]]), "title": forum["title"], "description": forum["description"],
+                "category": forum["category"], "created_by": user_ids[forum["created_by"]], "is_active": True,
+                "post_count": forum["post_count"], "created_at": forum["created_at"], "updated_at": forum["created_at"]
+            }
+            for forum in dataset.forums
+        ]),
+        (ForumPost, [
+            {
+                "_id": ObjectId(post_ids[post["id"]]), "forum_id": forum_ids[post["forum_id"]], "title": post["title"],
+                "content": post["content"], "author_id": user_ids[post["author_id"]],
+                "author_name": user_names[post["author_id"]], "is_pinned": False, "reply_count": post["reply_count"],
+                "parent_post_id": post_ids.get(post["parent_id"]), "path": paths[post["id"]],
+                "created_at": post["created_at"], "updated_at": post["created_at"]
+            }
+            for post in dataset.forum_posts
+        ]),
+        (ChatMessage, [
+            {
+                "sender_id": user_ids[message["sender_id"]], "receiver_id": user_ids[message["receiver_id"]],
+                "message": message["message"], "is_read": message["read"], "created_at": message["created_at"]
+            }
+            for message in dataset.messages
+        ]),
+        (Notification, [
+            {
+                "user_id": user_ids[notification["user_id"]], "title": notification["title"],
+                "message": notification["message"],
+                "type": "message" if notification["type"] == "message" else "info",
+                "is_read": notification["read"], "created_at": notification["created_at"]
+            }
+            for notification in dataset.notifications
+        ]),
+        (Favorite, [
+            {
+                "user_id": user_ids[favorite["user_id"]], "item_type": favorite["item_type"],
+                "item_id": favorite["item_id"], "created_at": favorite["created_at"]
+            }
+            for favorite in dataset.favorites
+        ]),
+        (Meeting, [
+            {
+                "title": f"Consultation {meeting['id']}", "description": meeting["message"],
+                "organizer_id": user_ids[meeting["requester_id"]],
+                "participants": [user_ids[meeting["requester_id"]], user_ids[meeting["expert_id"]]],
+                "scheduled_time": meeting["created_at"] + timedelta(days=7), "duration_minutes": 30,
+                "status": MONGO_MEETING_STATUS[meeting["status"]],
+                "created_at": meeting["created_at"], "updated_at": meeting["created_at"]
+            }
+            for meeting in dataset.meetings
+        ]),
+    ]
+
+    client = AsyncIOMotorClient(mongodb_url)
+    try:
+        database = client.get_default_database()
+        for model, documents in collections:
+            collection = database[model.Settings.name]
+            await collection.drop()
+            for batch in _batches(documents):
+                await collection.insert_many(batch, ordered=False)
+        # Creates the indexes declared on the models, as the app does on startup
+        await init_beanie(
+            database=database,
+            document_models=[User, Trial, Publication, Expert, Forum, ForumPost, Favorite, ChatMessage, Meeting, Notification]
+        )
+    finally:
+        client.close()
+
+    manifest = dataset.manifest()
+    to_mongo = lambda ids: [user_ids[i] for i in ids]
+    manifest.update({
+        "users": to_mongo(manifest["users"]),
+        "researchers": to_mongo(manifest["researchers"]),
+        "forums": [forum_ids[i] for i in manifest["forums"]],
+        "root_posts": [[forum_ids[forum], post_ids[post]] for forum, post in manifest["root_posts"]],
+        "conversations": [to_mongo(pair) for pair in manifest["conversations"]],
+        "favorites": [[user_ids[user], item_type, item_id] for user, item_type, item_id in manifest["favorites"]],
+    })
+    print(f"✅ Seeded MongoDB at scale {dataset.scale}: {dataset.counts()}")
+    return manifest
+
+async def seed(backend: str, scale: int, seed_value: int = 42, database_url: str = DEFAULT_DATABASE_URL,
+               mongodb_url: str = DEFAULT_MONGODB_URL) -> dict:
+    dataset = generate(scale, seed_value)
+    if backend == "mongo":
+        return await seed_mongo(mongodb_url, dataset)
+    return await seed_sql(database_url, dataset)
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+
+    parser = argparse.ArgumentParser(description="Seed a benchmark database with synthetic data (wipes it first)")
+    parser.add_argument("--backend", choices=["sql", "mongo"], default="sql")
+    parser.add_argument("--scale", type=int, default=1, help="multiplier on the base row counts")
+    parser.add_argument("--seed", type=int, default=42, help="random seed; the same seed gives the same data")
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    parser.add_argument("--mongodb-url", default=DEFAULT_MONGODB_URL)
+    parser.add_argument("--manifest", help="write the seeded ids to this JSON file")
+    args = parser.parse_args()
+
+    manifest = asyncio.run(seed(args.backend, args.scale, args.seed, args.database_url, args.mongodb_url))
+    if args.manifest:
+        with open(args.manifest, "w") as f:
+            json.dump(manifest, f)
+        print(f"📝 Manifest written to {args.manifest}")
@@ -0,0 +1,247 @@
+"""
+Deterministic synthetic dataset.
+
+The same (scale, seed) always produces the same rows. Activity is skewed the
+way real usage is: a few users send most messages and receive most
+notifications, and a few forums hold most posts, so hot-path queries see
+realistic fan-out instead of a uniform spread.
+
+Ids are 1-based integers; each seeder maps them to its backend's keys.
+"""
+
+import random
+from datetime import datetime, timedelta
+
+# Rows per entity at scale 1; every count grows linearly with the scale
+BASE_COUNTS = {
+    "patients": 200,
+    "researchers": 50,
+    "forums": 10,
+    "forum_posts": 1000,
+    "messages": 4000,
+    "notifications": 4000,
+    "favorites": 1000,
+    "meetings": 300,
+}
+
+SPECIALTIES = ["Oncology", "Cardiology", "Neurology", "Immunology", "Endocrinology", "Pulmonology", "Rheumatology"]
+CONDITIONS = ["lung cancer", "heart failure", "glioblastoma", "lupus", "type 1 diabetes", "asthma", "rheumatoid arthritis"]
+INSTITUTIONS = ["Mayo Clinic", "Johns Hopkins", "Karolinska Institutet", "Charité", "MD Anderson", "Cleveland Clinic"]
+CITIES = ["Boston", "Toronto", "Berlin", "Stockholm", "Houston", "Mumbai", "Sydney"]
+WORDS = (
+    "trial patient dose response therapy outcome cohort biomarker placebo protocol side effect "
+    "remission symptom screening enrollment follow-up imaging genetic study result question"
+).split()
+NOTIFICATION_TYPES = ["message", "meeting_request", "meeting_accepted", "general"]
+MEETING_STATUSES = ["pending", "accepted", "rejected"]
+FAVORITE_TYPES = ["trial", "publication", "expert"]
+
+MAX_THREAD_DEPTH = 6
+HISTORY_DAYS = 180
+
+class Dataset:
+    """Generated rows, as plain dicts, plus the lookups workloads need"""
+
+    def __init__(self, scale: int, seed: int):
+        self.scale = scale
+        self.seed = seed
+        self.users = []
+        self.patient_profiles = []
+        self.researcher_profiles = []
+        self.forums = []
+        self.forum_posts = []
+        self.messages = []
+        self.notifications = []
+        self.favorites = []
+        self.meetings = []
+
+    def counts(self) -> dict:
+        return {
+            "users": len(self.users),
+            "forums": len(self.forums),
+            "forum_posts": len(self.forum_posts),
+            "messages": len(self.messages),
+            "notifications": len(self.notifications),
+            "favorites": len(self.favorites),
+            "meetings": len(self.meetings),
+        }
+
+    def manifest(self) -> dict:
+        """Ids the workloads pick from (JSON-serializable)"""
+        conversations = sorted({tuple(sorted((m["sender_id"], m["receiver_id"]))) for m in self.messages})
+        return {
+            "scale": self.scale,
+            "seed": self.seed,
+            "users": [user["id"] for user in self.users],
+            "researchers": [user["id"] for user in self.users if user["role"] == "researcher"],
+            "forums": [forum["id"] for forum in self.forums],
+            "root_posts": [[post["forum_id"], post["id"]] for post in self.forum_posts if post["parent_id"] is None],
+            "conversations": [list(pair) for pair in conversations],
+            "favorites": [[fav["user_id"], fav["item_type"], fav["item_id"]] for fav in self.favorites],
+        }
+
+def _zipf_weights(count: int, exponent: float = 1.1) -> list:
+    return [1 / (rank ** exponent) for rank in range(1, count + 1)]
+
+def _sentence(rng: random.Random, low: int, high: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high))).capitalize() + "."
+
+def generate(scale: int = 1, seed: int = 42, now: datetime = None) -> Dataset:
+    """Build the dataset for `scale` (1, 10, 100...)"""
+    rng = random.Random(seed)
+    counts = {name: base * scale for name, base in BASE_COUNTS.items()}
+    now = now or datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    start = now - timedelta(days=HISTORY_DAYS)
+    dataset = Dataset(scale, seed)
+
+    def timestamps(count):
+        """`count` increasing timestamps spread over the history window"""
+        span = HISTORY_DAYS * 86400
+        return [start + timedelta(seconds=offset) for offset in sorted(rng.uniform(0, span) for _ in range(count))]
+
+    # Users: patients first, then researchers
+    user_count = counts["patients"] + counts["researchers"]
+    for user_id, created_at in zip(range(1, user_count + 1), timestamps(user_count)):
+        is_researcher = user_id > counts["patients"]
+        role = "researcher" if is_researcher else "patient"
+        dataset.users.append({
+            "id": user_id,
+            "email": f"{role}{user_id}@bench.example.com",
+            "username": f"{role}{user_id}",
+            "full_name": f"{'Dr. ' if is_researcher else ''}Bench {role.title()} {user_id}",
+            "role": role,
+            "specialty": rng.choice(SPECIALTIES) if is_researcher else None,
+            "institution": rng.choice(INSTITUTIONS) if is_researcher else None,
+            "created_at": created_at,
+        })
+        if is_researcher:
+            dataset.researcher_profiles.append({
+                "user_id": user_id,
+                "specialty": dataset.users[-1]["specialty"],
+                "research_interests": ", ".join(rng.sample(CONDITIONS, 2)),
+                "institution": dataset.users[-1]["institution"],
+                "available_for_meetings": rng.random() < 0.8,
+                "verified": rng.random() < 0.5,
+            })
+        else:
+            dataset.patient_profiles.append({
+                "user_id": user_id,
+                "medical_condition": rng.choice(CONDITIONS),
+                "location": rng.choice(CITIES),
+                "age": rng.randint(18, 90),
+            })
+
+    user_ids = [user["id"] for user in dataset.users]
+    patient_ids = user_ids[:counts["patients"]]
+    researcher_ids = user_ids[counts["patients"]:]
+    # Activity ranking is shuffled so the busiest users are not just the lowest ids
+    active_users = user_ids[:]
+    rng.shuffle(active_users)
+    user_weights = _zipf_weights(len(active_users))
+
+    # Forums and threaded posts
+    for forum_id in range(1, counts["forums"] + 1):
+        dataset.forums.append({
+            "id": forum_id,
+            "title": f"{rng.choice(CONDITIONS).title()} discussion {forum_id}",
+            "description": _sentence(rng, 8, 20),
+            "category": rng.choice(SPECIALTIES),
+            "created_by": rng.choice(researcher_ids),
+            "post_count": 0,
+            "created_at": start,
+        })
+
+    forum_ids = [forum["id"] for forum in dataset.forums]
+    forum_weights = _zipf_weights(len(forum_ids), exponent=0.8)
+    posts_by_forum = {forum_id: [] for forum_id in forum_ids}
+    posts = {}
+    for post_id, created_at in zip(range(1, counts["forum_posts"] + 1), timestamps(counts["forum_posts"])):
+        forum_id = rng.choices(forum_ids, forum_weights)[0]
+        candidates = posts_by_forum[forum_id]
+        parent = None
+        if candidates and rng.random() < 0.7:
+            # Replies favour recent posts, like a live discussion
+            parent = posts[candidates[-1 - min(int(rng.expovariate(0.2)), len(candidates) - 1)]]
+            if parent["depth"] >= MAX_THREAD_DEPTH:
+                parent = None
+        post = {
+            "id": post_id,
+            "forum_id": forum_id,
+            "author_id": rng.choices(active_users, user_weights)[0],
+            "parent_id": parent["id"] if parent else None,
+            "title": _sentence(rng, 3, 8),
+            "content": _sentence(rng, 10, 60),
+            "reply_count": 0,
+            "depth": parent["depth"] + 1 if parent else 0,
+            "created_at": created_at,
+        }
+        if parent:
+            parent["reply_count"] += 1
+        dataset.forums[forum_id - 1]["post_count"] += 1
+        posts[post_id] = post
+        candidates.append(post_id)
+        dataset.forum_posts.append(post)
+
+    # Chat: most traffic is in a few long conversations
+    conversation_count = max(len(user_ids) // 2, 1)
+    conversations = []
+    for _ in range(conversation_count):
+        first = rng.choices(active_users, user_weights)[0]
+        second = rng.choice(user_ids)
+        if first != second:
+            conversations.append((first, second))
+    conversation_weights = _zipf_weights(len(conversations), exponent=0.9)
+    unread_after = now - timedelta(days=3)
+    for message_id, created_at in zip(range(1, counts["messages"] + 1), timestamps(counts["messages"])):
+        pair = rng.choices(conversations, conversation_weights)[0]
+        sender, receiver = pair if rng.random() < 0.5 else pair[::-1]
+        dataset.messages.append({
+            "id": message_id,
+            "sender_id": sender,
+            "receiver_id": receiver,
+            "message": _sentence(rng, 3, 30),
+            "read": created_at < unread_after or rng.random() < 0.3,
+            "created_at": created_at,
+        })
+
+    for notification_id, created_at in zip(range(1, counts["notifications"] + 1), timestamps(counts["notifications"])):
+        kind = rng.choice(NOTIFICATION_TYPES)
+        dataset.notifications.append({
+            "id": notification_id,
+            "user_id": rng.choices(active_users, user_weights)[0],
+            "type": kind,
+            "title": kind.replace("_", " ").title(),
+            "message": _sentence(rng, 5, 15),
+            "from_user": f"Bench User {rng.choice(user_ids)}",
+            "read": created_at < unread_after and rng.random() < 0.9,
+            "created_at": created_at,
+        })
+
+    seen_favorites = set()
+    for created_at in timestamps(counts["favorites"]):
+        user_id = rng.choices(active_users, user_weights)[0]
+        item_type = rng.choice(FAVORITE_TYPES)
+        item_id = f"NCT{rng.randint(1, 99999999):08d}" if item_type == "trial" else str(rng.randint(1, 40000000))
+        if (user_id, item_type, item_id) in seen_favorites:
+            continue
+        seen_favorites.add((user_id, item_type, item_id))
+        dataset.favorites.append({
+            "id": len(dataset.favorites) + 1,
+            "user_id": user_id,
+            "item_type": item_type,
+            "item_id": item_id,
+            "item_data": '{"title": "%s"}' % _sentence(rng, 4, 10),
+            "created_at": created_at,
+        })
+
+    for meeting_id, created_at in zip(range(1, counts["meetings"] + 1), timestamps(counts["meetings"])):
+        dataset.meetings.append({
+            "id": meeting_id,
+            "requester_id": rng.choice(patient_ids),
+            "expert_id": rng.choice(researcher_ids),
+            "message": _sentence(rng, 5, 20),
+            "status": rng.choice(MEETING_STATUSES),
+            "created_at": created_at,
+        })
+
+    return dataset
@@ -0,0 +1,161 @@
+"""
+Scripted request mixes.
+
+A workload is a weighted list of operations per backend. Each operation picks
+its acting user and path parameters from the seed manifest, so every request
+targets data that exists; busy users and forums are picked more often, the
+same way they were generated.
+
+Operations are reported by their route template ("GET /api/forums/{forum_id}/posts").
+"""
+
+import random
+import uuid
+
+class Operation:
+    def __init__(self, method: str, path: str, weight: float, build=None):
+        self.method = method
+        self.path = path
+        self.weight = weight
+        self.build = build or _as_any_user
+
+    @property
+    def name(self) -> str:
+        return f"{self.method} {self.path}"
+
+    def request(self, manifest: dict, rng: random.Random) -> dict:
+        """user, url, query params and JSON body for one request"""
+        spec = self.build(manifest, rng)
+        return {
+            "user": spec["user"],
+            "url": self.path.format(**spec.get("path", {})),
+            "params": spec.get("params"),
+            "json": spec.get("json"),
+        }
+
+def _skewed(rng: random.Random, items: list):
+    """Pick from `items`, favouring the front of the list"""
+    return items[min(int(rng.expovariate(8 / len(items))), len(items) - 1)]
+
+def _as_any_user(manifest, rng):
+    return {"user": _skewed(rng, manifest["users"])}
+
+def _conversation(manifest, rng):
+    user, other = _skewed(rng, manifest["conversations"])
+    if rng.random() < 0.5:
+        user, other = other, user
+    return {"user": user, "path": {"other_user_id": other}}
+
+def _forum_page(manifest, rng):
+    return {
+        "user": _skewed(rng, manifest["users"]),
+        "path": {"forum_id": _skewed(rng, manifest["forums"])},
+        "params": {"limit": 20, "skip": rng.choice([0, 0, 0, 20, 40])},
+    }
+
+def _thread(manifest, rng):
+    forum_id, post_id = rng.choice(manifest["root_posts"])
+    return {"user": _skewed(rng, manifest["users"]), "path": {"forum_id": forum_id, "post_id": post_id}}
+
+def _favorite_check(manifest, rng):
+    user, item_type, item_id = rng.choice(manifest["favorites"])
+    return {"user": user, "path": {"item_type": item_type, "item_id": item_id}}
+
+def _send_message(manifest, rng):
+    spec = _conversation(manifest, rng)
+    return {"user": spec["user"], "json": {"receiver_id": spec["path"]["other_user_id"], "message": "Benchmark message"}}
+
+def _new_favorite(manifest, rng):
+    return {
+        "user": _skewed(rng, manifest["users"]),
+        "json": {"item_type": "publication", "item_id": uuid.UUID(int=rng.getrandbits(128)).hex, "item_data": "{}"},
+    }
+
+def _sql_forum_post(manifest, rng):
+    forum_id, post_id = rng.choice(manifest["root_posts"])
+    if rng.random() < 0.7:
+        # Only researchers may reply in the SQL app
+        return {
+            "user": _skewed(rng, manifest["researchers"]),
+            "path": {"forum_id": forum_id},
+            "json": {"forum_id": forum_id, "content": "Benchmark reply", "parent_id": post_id},
+        }
+    return {
+        "user": _skewed(rng, manifest["users"]),
+        "path": {"forum_id": forum_id},
+        "json": {"forum_id": forum_id, "content": "Benchmark post"},
+    }
+
+def _mongo_forum_post(manifest, rng):
+    forum_id, post_id = rng.choice(manifest["root_posts"])
+    return {
+        "user": _skewed(rng, manifest["users"]),
+        "path": {"forum_id": forum_id},
+        "json": {
+            "forum_id": forum_id, "title": "Benchmark", "content": "Benchmark reply",
+            "parent_post_id": post_id if rng.random() < 0.7 else None
+        },
+    }
+
+SQL_READS = [
+    Operation("GET", "/api/users/me", 5),
+    Operation("GET", "/api/notifications/", 10),
+    Operation("GET", "/api/notifications/unread-count", 15),
+    Operation("GET", "/api/chat/conversations", 10),
+    Operation("GET", "/api/chat/messages/{other_user_id}", 10, _conversation),
+    Operation("GET", "/api/forums/", 5),
+    Operation("GET", "/api/forums/{forum_id}/posts", 15, _forum_page),
+    Operation("GET", "/api/forums/{forum_id}/posts/{post_id}/thread", 5, _thread),
+    Operation("GET", "/api/favorites/", 5),
+    Operation("GET", "/api/favorites/check/{item_type}/{item_id}", 5, _favorite_check),
+    Operation("GET", "/api/meetings/", 5),
+    Operation("GET", "/api/users/researchers", 5),
+]
+
+SQL_WRITES = [
+    Operation("POST", "/api/chat/messages", 15, _send_message),
+    Operation("POST", "/api/forums/{forum_id}/posts", 10, _sql_forum_post),
+    Operation("PUT", "/api/notifications/mark-all-read", 5),
+    Operation("POST", "/api/favorites/", 5, _new_favorite),
+]
+
+MONGO_READS = [
+    Operation("GET", "/api/users/me", 5),
+    Operation("GET", "/api/notifications/", 20),
+    Operation("GET", "/api/chat/", 10),
+    Operation("GET", "/api/chat/messages/{other_user_id}", 15, _conversation),
+    Operation("GET", "/api/forums/", 5),
+    Operation("GET", "/api/forums/{forum_id}/posts", 15, _forum_page),
+    Operation("GET", "/api/forums/{forum_id}/posts/{post_id}/thread", 5, _thread),
+    Operation("GET", "/api/favorites/", 5),
+    Operation("GET", "/api/favorites/check/{item_type}/{item_id}", 5, _favorite_check),
+    Operation("GET", "/api/meetings/", 5),
+    Operation("GET", "/api/users/", 5),
+]
+
+MONGO_WRITES = [
+    Operation("POST", "/api/chat/messages", 15, _send_message),
+    Operation("POST", "/api/forums/{forum_id}/posts", 10, _mongo_forum_post),
+    Operation("PUT", "/api/notifications/mark-all-read", 5),
+    Operation("POST", "/api/favorites/", 5, _new_favorite),
+]
+
+def _mix(reads: list, writes: list, write_share: float) -> list:
+    """Scale the two groups so writes make up `write_share` of the requests"""
+    read_total = sum(op.weight for op in reads)
+    write_total = sum(op.weight for op in writes)
+    return (
+        [Operation(op.method, op.path, op.weight / read_total * (1 - write_share), op.build) for op in reads]
+        + [Operation(op.method, op.path, op.weight / write_total * write_share, op.build) for op in writes]
+    )
+
+WORKLOADS = {
+    "read_only": {"sql": SQL_READS, "mongo": MONGO_READS},
+    "read_mostly": {"sql": _mix(SQL_READS, SQL_WRITES, 0.1), "mongo": _mix(MONGO_READS, MONGO_WRITES, 0.1)},
+    "write_heavy": {"sql": _mix(SQL_READS, SQL_WRITES, 0.5), "mongo": _mix(MONGO_READS, MONGO_WRITES, 0.5)},
+}
+
+def get_workload(name: str, backend: str) -> list:
+    if name not in WORKLOADS:
+        raise ValueError(f"Unknown workload {name!r}; choose from {', '.join(WORKLOADS)}")
+    return WORKLOADS[name][backend]
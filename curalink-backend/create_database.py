@@ -4,6 +4,7 @@ Automatic Database Creation Script for CuraLink
 This script will create the database automatically before starting the application
 """
 
+import asyncio
 import pymysql
 import sys
 from dotenv import load_dotenv
@@ -47,7 +48,7 @@ def create_database():
         connection.close()
         
         print("\n🎉 Database setup complete!")
-        print("📊 The FastAPI application will now create all tables automatically.")
+        apply_migrations()
         print("\n🚀 You can now start the backend with: python main.py")
         return True
         
@@ -62,6 +63,27 @@ def create_database():
         print(f"❌ Unexpected error: {e}")
         return False
 
+def apply_migrations():
+    """Create the tables and apply pending schema migrations (indexes etc.)"""
+    try:
+        from database import engine
+        from migrations import run_migrations
+    except ImportError as e:
+        print(f"⚠️  Skipping schema migrations ({e})")
+        print("📊 The FastAPI application will create tables and apply migrations on startup.")
+        return
+    
+    try:
+        async def migrate():
+            async with engine.begin() as connection:
+                return await connection.run_sync(run_migrations)
+
+        applied = asyncio.run(migrate())
+        print(f"✅ Schema is up to date ({len(applied)} migration(s) applied)")
+    except Exception as e:
+        print(f"❌ Error applying migrations: {e}")
+        print("📊 The FastAPI application will retry on startup.")
+
 if __name__ == "__main__":
     success = create_database()
     sys.exit(0 if success else 1)
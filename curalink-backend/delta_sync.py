@@ -0,0 +1,106 @@
+"""
+Delta sync and conditional GET for list endpoints.
+
+List endpoints accept `since=<cursor>` and then return only what changed:
+
+    {"items": [...], "deleted": ["<id>", ...], "cursor": "<next cursor>", "full": false}
+
+`items` holds new and modified items; clients upsert them by id (an item
+changed at exactly the cursor's instant can be sent again). `deleted` lists
+the ids removed since the cursor, read from tombstones kept for
+SYNC_TOMBSTONE_DAYS. A cursor older than that gets every item with
+"full": true, and the client replaces what it has.
+
+Every response, with or without `since`, carries an ETag computed from a
+cheap aggregate of the user's collection (row count, newest change, newest
+deletion). A poll that sends it back in If-None-Match gets 304 Not Modified
+without any rows being loaded or serialized.
+"""
+
+import base64
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+load_dotenv()
+
+SYNC_TOMBSTONE_DAYS = int(os.getenv("SYNC_TOMBSTONE_DAYS", "30"))
+
+def tombstone_cutoff() -> datetime:
+    """Deletions before this are forgotten; older cursors need a full resync"""
+    return datetime.utcnow() - timedelta(days=SYNC_TOMBSTONE_DAYS)
+
+def _plain(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def encode_cursor(changed=None, deleted: Optional[datetime] = None) -> str:
+    """Opaque cursor: the newest change (timestamp or id), the newest deletion seen and when it was issued"""
+    payload = json.dumps(
+        {"c": _plain(changed), "d": _plain(deleted), "t": datetime.utcnow().isoformat()}, separators=(",", ":")
+    )
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(payload, dict):
+            raise ValueError(cursor)
+        return {"c": payload.get("c"), "d": cursor_datetime(payload.get("d")), "t": cursor_datetime(payload.get("t"))}
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid since cursor")
+
+def is_expired(position: dict) -> bool:
+    """Deletions after this cursor may already be forgotten, so the client needs everything"""
+    return position["t"] is None or position["t"] < tombstone_cutoff()
+
+def cursor_int(value) -> Optional[int]:
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid since cursor")
+
+def cursor_datetime(value) -> Optional[datetime]:
+    if value is None:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid since cursor")
+
+def make_etag(*version) -> str:
+    """Weak ETag for a collection state, e.g. make_etag("favorites", user_id, count, newest, deleted)"""
+    digest = hashlib.sha1(json.dumps(jsonable_encoder(version)).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+def _cache_headers(etag: str) -> dict:
+    # Browsers must revalidate every time, which is what makes 304s possible
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """A 304 response when the client already has this state, else None"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    if header.strip() == "*" or etag in [tag.strip() for tag in header.split(",")]:
+        return Response(status_code=304, headers=_cache_headers(etag))
+    return None
+
+def tagged_response(content, etag: str) -> JSONResponse:
+    return JSONResponse(jsonable_encoder(content), headers=_cache_headers(etag))
+
+def delta_response(items: list, deleted: Iterable, cursor: str, etag: str, full: bool = False) -> JSONResponse:
+    return tagged_response({
+        "items": items,
+        "deleted": [str(item_id) for item_id in deleted],
+        "cursor": cursor,
+        "full": full,
+    }, etag)
@@ -0,0 +1,143 @@
+"""
+Event-loop lag monitor and blocking-call detector.
+
+A heartbeat task sleeps for a short interval and measures how late it wakes
+up; the difference is the event-loop lag (event_loop_lag_seconds). A watchdog
+thread watches the heartbeat: when the loop has not come back for longer than
+LOOP_LAG_THRESHOLD_MS it grabs the loop thread's current stack, which is the
+code that is blocking it (a sync driver call, requests.post, time.sleep, a
+password hash...). The stall is logged with that stack once the loop resumes
+and counted in event_loop_blocks_total.
+
+With LOOP_MONITOR_STRICT=1, StrictLoopMiddleware fails any request during
+which the loop was blocked, so tests going through the app catch regressions.
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Optional
+
+from metrics import Counter, Histogram
+
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LOOP_LAG = Histogram("event_loop_lag_seconds", "How late the event loop ran a scheduled heartbeat", buckets=LAG_BUCKETS)
+LOOP_BLOCKS = Counter("event_loop_blocks_total", "Times a callback blocked the event loop past the threshold")
+
+class EventLoopBlockedError(RuntimeError):
+    """Raised in strict mode when a request blocked the event loop"""
+
+class LoopMonitor:
+    def __init__(self, threshold_ms: float = 100, interval_ms: float = 50, max_reports: int = 50, stack_depth: int = 20):
+        self.threshold = threshold_ms / 1000
+        self.interval = interval_ms / 1000
+        self.stack_depth = stack_depth
+        self.reports = deque(maxlen=max_reports)
+        self.stalls_detected = 0
+        self.last_stack: Optional[str] = None
+        self._loop_thread_id: Optional[int] = None
+        self._last_beat = time.monotonic()
+        self._captured: Optional[tuple] = None  # (beat, stack) taken by the watchdog
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start monitoring the running event loop"""
+        if self.running:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stopped.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _heartbeat(self):
+        while True:
+            beat = time.monotonic()
+            self._last_beat = beat
+            await asyncio.sleep(self.interval)
+            lag = max(time.monotonic() - beat - self.interval, 0.0)
+            LOOP_LAG.observe(lag)
+
+            if lag >= self.threshold:
+                captured, self._captured = self._captured, None
+                stack = captured[1] if captured and captured[0] == beat else None
+                self._report(lag, stack)
+
+    def _watch(self):
+        check_every = max(self.threshold / 4, 0.005)
+        while not self._stopped.wait(check_every):
+            beat = self._last_beat
+            if time.monotonic() - beat - self.interval < self.threshold:
+                continue
+            if self._captured and self._captured[0] == beat:
+                continue  # Already captured this stall
+
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)[-self.stack_depth:]) if frame else None
+            self._captured = (beat, stack)
+            self.last_stack = stack
+            self.stalls_detected += 1
+
+    def _report(self, lag: float, stack: Optional[str]):
+        LOOP_BLOCKS.inc()
+        self.reports.append({
+            "at": time.time(),
+            "blocked_ms": round(lag * 1000, 1),
+            "stack": stack
+        })
+        print(f"🐢 Event loop blocked for {lag * 1000:.0f} ms")
+        if stack:
+            print(stack.rstrip())
+
+    def recent_blocks(self) -> list:
+        return list(reversed(self.reports))
+
+loop_monitor = LoopMonitor(
+    threshold_ms=float(os.getenv("LOOP_LAG_THRESHOLD_MS", "100")),
+    interval_ms=float(os.getenv("LOOP_MONITOR_INTERVAL_MS", "50"))
+)
+
+LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "true").lower() in ("1", "true", "yes")
+LOOP_MONITOR_STRICT = os.getenv("LOOP_MONITOR_STRICT", "false").lower() in ("1", "true", "yes")
+
+class StrictLoopMiddleware:
+    """ASGI middleware that turns a blocked event loop into a failed request (strict mode)"""
+
+    def __init__(self, app, monitor: LoopMonitor = loop_monitor):
+        self.app = app
+        self.monitor = monitor
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.monitor.running:
+            return await self.app(scope, receive, send)
+
+        stalls_before = self.monitor.stalls_detected
+        await self.app(scope, receive, send)
+        if self.monitor.stalls_detected != stalls_before:
+            stack = self.monitor.last_stack
+            raise EventLoopBlockedError(
+                f"{scope['method']} {scope['path']} blocked the event loop for more than "
+                f"{self.monitor.threshold * 1000:.0f} ms" + (f" at:\n{stack}" if stack else "")
+            )
@@ -1,19 +1,51 @@
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Depends, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
 from contextlib import asynccontextmanager
 import uvicorn
 import json
+from typing import Optional
 
-from mongodb_database import connect_to_mongo, close_mongo_connection
+from mongodb_database import connect_to_mongo, close_mongo_connection, db
 from mongodb_routers import auth, users, trials, publications, experts, forums, favorites, chat, meetings, notifications
+from mongodb_auth_utils import user_cache, password_hasher, token_subject
+from websocket_manager import manager
+from metrics import REGISTRY, PROMETHEUS_CONTENT_TYPE
+from query_profiler import QueryProfilerMiddleware, profiler
+from request_metrics import RequestMetricsMiddleware, observe_cache
+from loop_monitor import loop_monitor, StrictLoopMiddleware, LOOP_MONITOR_ENABLED, LOOP_MONITOR_STRICT
+from sampling_profiler import sampling_profiler, SamplingProfilerMiddleware, ProfileAlreadyRunning, render_collapsed
+from admin_auth import require_admin
+from mongodb_realtime import replay_since
+from mongodb_unread import unread_notifications, unread_messages
+from notification_retention import RetentionJob, purge_mongo_notifications
+
+# Reconnecting clients catch up on missed notifications and chat messages
+manager.resume_handler = replay_since
+# WebSockets must present an access token issued to the user id they connect as
+manager.token_verifier = token_subject
+
+# The retention job purges read notifications and enforces the per-user cap
+notification_retention = RetentionJob(lambda: purge_mongo_notifications(db.database))
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     print("🚀 CuraLink Backend Starting with MongoDB...")
+    if LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+    await manager.start()
     await connect_to_mongo()
+    unread_notifications.start()
+    unread_messages.start()
+    notification_retention.start()
     yield
     # Shutdown
+    await loop_monitor.stop()
+    await unread_notifications.stop()
+    await unread_messages.stop()
+    await notification_retention.stop()
+    await manager.stop()
     await close_mongo_connection()
     print("👋 CuraLink Backend Shutting Down...")
 
@@ -39,6 +71,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Marks requests picked by an on-demand /debug/profile session
+app.add_middleware(SamplingProfilerMiddleware)
+
+# Attribute database statements to the route that issued them
+app.add_middleware(QueryProfilerMiddleware)
+
+# Fail requests that block the event loop (tests / staging)
+if LOOP_MONITOR_STRICT:
+    app.add_middleware(StrictLoopMiddleware)
+
+# Per-route latency, status and payload sizes (outermost, so it times everything)
+app.add_middleware(RequestMetricsMiddleware)
+
+observe_cache(user_cache.name, user_cache.stats)
+observe_cache(unread_notifications.name, unread_notifications.stats)
+observe_cache(unread_messages.name, unread_messages.stats)
+
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(users.router, prefix="/api/users", tags=["Users"])
@@ -62,7 +111,41 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "database": "MongoDB"}
+    return {"status": "healthy", "database": "MongoDB", "user_cache": user_cache.stats(), "password_hashing": password_hasher.stats(), "websockets": manager.stats()}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics_endpoint():
+    """Prometheus scrape endpoint"""
+    return Response(REGISTRY.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+@app.get("/debug/queries", include_in_schema=False, dependencies=[Depends(require_admin)])
+async def query_report():
+    """Slowest statements, most expensive statement shapes and suspected N+1 patterns"""
+    return profiler.report()
+
+@app.get("/debug/event-loop", include_in_schema=False, dependencies=[Depends(require_admin)])
+async def event_loop_report():
+    """Recent event-loop stalls with the stack that caused each one"""
+    return {"threshold_ms": loop_monitor.threshold * 1000, "blocks": loop_monitor.recent_blocks()}
+
+@app.post("/debug/profile", include_in_schema=False, dependencies=[Depends(require_admin)])
+async def sample_profile(
+    seconds: float = Query(10, gt=0, le=120),
+    fraction: float = Query(1.0, gt=0, le=1),
+    route: Optional[str] = None,
+    interval_ms: float = Query(5, ge=1, le=1000),
+    all_threads: bool = False
+):
+    """Sample a fraction of requests (or one route template) for N seconds; returns collapsed stacks"""
+    try:
+        session = await sampling_profiler.profile(seconds, fraction, route, interval_ms, all_threads)
+    except ProfileAlreadyRunning as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return Response(
+        render_collapsed(session),
+        media_type="text/plain",
+        headers={"Content-Disposition": "attachment; filename=profile.collapsed"}
+    )
 
 # Test MongoDB endpoint
 @app.get("/test-db")
@@ -85,12 +168,19 @@ async def test_database():
 # WebSocket endpoint for real-time updates
 @app.websocket("/ws/{user_id}")
 async def websocket_endpoint(websocket: WebSocket, user_id: str):
-    await manager.connect(user_id, websocket)
+    # Pass the access token as ?token=... or in the first frame: {"type": "auth", "token": "..."}
+    connection = await manager.connect(user_id, websocket)
+    if connection is None:
+        return
     try:
         while True:
             data = await websocket.receive_text()
             message_data = json.loads(data)
             
+            # Topic subscriptions (forums, forum:<id>, thread:<post id>, user:<id>)
+            if await manager.handle_client_message(connection, message_data):
+                continue
+            
             # Handle different message types
             if message_data.get("type") == "chat":
                 await manager.send_personal_message(
@@ -112,7 +202,10 @@ async def websocket_endpoint(websocket: WebSocket, user_id: str):
                     })
                 )
     except WebSocketDisconnect:
-        manager.disconnect(user_id)
+        pass
+    finally:
+        # Also after a malformed frame or a failed send, so the connection and its writer task don't leak
+        manager.disconnect(connection)
 
 if __name__ == "__main__":
     import os
@@ -0,0 +1,209 @@
+"""
+In-process metrics registry rendered in the Prometheus text format.
+
+Metrics are module-level singletons created once and updated from anywhere
+(request handlers, driver event listeners running on other threads).
+GET /metrics on either app returns REGISTRY.render().
+
+    CHECKOUTS = Counter("db_pool_checkouts_total", "Connections checked out", ["pool"])
+    CHECKOUTS.labels(pool="sql").inc()
+"""
+
+import math
+import threading
+from typing import Callable, Dict, Iterable, Optional, Sequence, Tuple
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Registry:
+    """Holds every metric and renders them for scraping"""
+
+    def __init__(self):
+        self._metrics: Dict[str, "Metric"] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: "Metric"):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+
+    def get(self, name: str) -> Optional["Metric"]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry: Registry = REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[LabelValues, object] = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def labels(self, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _default(self):
+        """The unlabelled child, for metrics declared without labels"""
+        return self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _label_dict(self, key: LabelValues) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    def samples(self) -> Iterable[Tuple[str, Dict[str, str], float]]:
+        raise NotImplementedError
+
+class _Value:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+        self.function: Optional[Callable[[], float]] = None
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        with self._lock:
+            self.value = value
+
+    def set_function(self, function: Callable[[], float]):
+        """Read the value from `function` at scrape time instead of storing it"""
+        self.function = function
+
+    def get(self) -> float:
+        if self.function is not None:
+            return self.function()
+        return self.value
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+    type = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self._default().inc(amount)
+
+    def samples(self):
+        for key, child in list(self._children.items()):
+            yield self.name, self._label_dict(key), child.get()
+
+class Gauge(Metric):
+    """Value that can go up and down, or be computed when scraped"""
+    type = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+    def set(self, value: float):
+        self._default().set(value)
+
+    def inc(self, amount: float = 1.0):
+        self._default().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self._default().dec(amount)
+
+    def set_function(self, function: Callable[[], float]):
+        self._default().set_function(function)
+
+    def samples(self):
+        for key, child in list(self._children.items()):
+            try:
+                value = child.get()
+            except Exception:
+                continue  # A broken callback must not break the whole scrape
+            yield self.name, self._label_dict(key), value
+
+class _HistogramValue:
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.sum += value
+            self.count += 1
+            for i, upper_bound in enumerate(self.buckets):
+                if value <= upper_bound:
+                    self.counts[i] += 1
+                    break
+
+class Histogram(Metric):
+    """Distribution of observed values in cumulative buckets"""
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry: Registry = REGISTRY):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float):
+        self._default().observe(value)
+
+    def samples(self):
+        for key, child in list(self._children.items()):
+            labels = self._label_dict(key)
+            with child._lock:
+                counts, total, count = list(child.counts), child.sum, child.count
+            cumulative = 0
+            for upper_bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket", {**labels, "le": _format_value(upper_bound)}, cumulative
+            yield f"{self.name}_bucket", {**labels, "le": "+Inf"}, count
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, count
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value: float) -> str:
+    if value is None:
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4"
@@ -0,0 +1,151 @@
+"""
+Versioned schema migrations for the SQL database.
+
+Tables are created from the models on first start; every schema change after
+that is appended to MIGRATIONS with the next version number and recorded in
+the schema_migrations table once applied, so each one runs exactly once per
+database.
+"""
+
+from sqlalchemy import Table, Column, Integer, String, DateTime, MetaData, inspect, select, insert, update, text, bindparam
+from sqlalchemy.sql import func
+
+from database import Base
+import models
+
+migration_metadata = MetaData()
+
+schema_migrations = Table(
+    "schema_migrations",
+    migration_metadata,
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("name", String(255), nullable=False),
+    Column("applied_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+def _create_indexes(*indexes):
+    """Build a migration step that creates the given model indexes if missing"""
+    def step(connection):
+        for index in indexes:
+            index.create(connection, checkfirst=True)
+    return step
+
+def _add_column(connection, column):
+    """ALTER TABLE ... ADD COLUMN for a model column, unless it already exists"""
+    table = column.table
+    existing = {c["name"] for c in inspect(connection).get_columns(table.name)}
+    if column.name in existing:
+        return
+    ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=connection.dialect)}"
+    if column.server_default is not None:
+        ddl += f" DEFAULT {column.server_default.arg}"
+        if not column.nullable:
+            ddl += " NOT NULL"
+    connection.execute(text(ddl))
+
+def _index(table, name):
+    return next(index for index in table.indexes if index.name == name)
+
+def _add_forum_post_paths(connection):
+    forum_posts = models.ForumPost.__table__
+    _add_column(connection, forum_posts.c.path)
+    
+    # Parents are always inserted before their replies, so walking the posts
+    # in id order sees every parent's path before it is needed
+    rows = connection.execute(
+        select(forum_posts.c.id, forum_posts.c.parent_id).order_by(forum_posts.c.id)
+    ).all()
+    paths = {}
+    for post_id, parent_id in rows:
+        paths[post_id] = models.ForumPost.build_path(paths.get(parent_id), post_id)
+    
+    if paths:
+        connection.execute(
+            update(forum_posts).where(forum_posts.c.id == bindparam("post_id")).values(path=bindparam("post_path")),
+            [{"post_id": post_id, "post_path": path} for post_id, path in paths.items()]
+        )
+    
+    _index(forum_posts, "ix_forum_posts_forum_path").create(connection, checkfirst=True)
+
+def _add_forum_counters(connection):
+    from reconcile_counters import reconcile_sql_forum_counters
+    
+    _add_column(connection, models.Forum.__table__.c.post_count)
+    _add_column(connection, models.ForumPost.__table__.c.reply_count)
+    reconcile_sql_forum_counters(connection)
+
+def _add_change_stamps(connection):
+    notifications = models.Notification.__table__
+    meeting_requests = models.MeetingRequest.__table__
+    _add_column(connection, notifications.c.updated_at)
+    
+    # Existing rows last changed when they were created, as far as sync is concerned
+    for table in (notifications, meeting_requests):
+        connection.execute(
+            update(table).where(table.c.updated_at.is_(None)).values(updated_at=table.c.created_at)
+        )
+    
+    _index(notifications, "ix_notifications_user_updated").create(connection, checkfirst=True)
+
+def _add_notification_retention(connection):
+    notifications = models.Notification.__table__
+    _add_column(connection, notifications.c.read_at)
+    
+    # Notifications read before retention existed count as read at their last change
+    connection.execute(
+        update(notifications).where(notifications.c.read == True, notifications.c.read_at.is_(None))
+        .values(read_at=func.coalesce(notifications.c.updated_at, notifications.c.created_at))
+    )
+    
+    _index(notifications, "ix_notifications_read_at").create(connection, checkfirst=True)
+
+MIGRATIONS = [
+    (1, "add hot query indexes", _create_indexes(
+        _index(models.ChatMessage.__table__, "ix_chat_messages_sender_receiver_created"),
+        _index(models.ChatMessage.__table__, "ix_chat_messages_receiver_read"),
+        _index(models.Notification.__table__, "ix_notifications_user_read_created"),
+        _index(models.Favorite.__table__, "ix_favorites_user_item"),
+        _index(models.ForumPost.__table__, "ix_forum_posts_forum_parent"),
+        _index(models.MeetingRequest.__table__, "ix_meeting_requests_expert_status"),
+        _index(models.MeetingRequest.__table__, "ix_meeting_requests_requester_status"),
+    )),
+    (2, "add materialized path to forum posts", _add_forum_post_paths),
+    (3, "add forum post and reply counters", _add_forum_counters),
+    (4, "add change stamps for delta sync", _add_change_stamps),
+    (5, "add notification read stamps for retention", _add_notification_retention),
+]
+
+def run_migrations(connection):
+    """Create missing tables and apply pending migrations; returns the versions applied"""
+    is_new_database = not inspect(connection).has_table(models.User.__tablename__)
+
+    Base.metadata.create_all(connection)
+    migration_metadata.create_all(connection)
+
+    applied = set(connection.execute(select(schema_migrations.c.version)).scalars())
+    newly_applied = []
+
+    for version, name, step in MIGRATIONS:
+        if version in applied:
+            continue
+        # A database created from the current models already has the schema
+        # every migration would produce, so only record the version
+        if not is_new_database:
+            step(connection)
+        connection.execute(insert(schema_migrations).values(version=version, name=name))
+        newly_applied.append(version)
+        print(f"✅ Applied migration {version}: {name}")
+
+    return newly_applied
+
+if __name__ == "__main__":
+    import asyncio
+    from database import engine
+
+    async def migrate():
+        async with engine.begin() as connection:
+            return await connection.run_sync(run_migrations)
+
+    applied = asyncio.run(migrate())
+
+    print(f"🎉 Database schema is up to date ({len(applied)} migration(s) applied)")
@@ -1,9 +1,14 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Text, Boolean, DateTime, ForeignKey, Enum, Index
+from sqlalchemy.dialects import mysql
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
+from datetime import datetime
 from database import Base
 import enum
 
+# Change stamps for delta sync need sub-second precision; MySQL DATETIME drops it by default
+PreciseDateTime = DateTime(timezone=True).with_variant(mysql.DATETIME(fsp=6), "mysql")
+
 class UserRole(str, enum.Enum):
     PATIENT = "patient"
     RESEARCHER = "researcher"
@@ -68,6 +73,10 @@ class Favorite(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     user = relationship("User", back_populates="favorites")
+    
+    __table_args__ = (
+        Index("ix_favorites_user_item", "user_id", "item_type", "item_id"),
+    )
 
 class Forum(Base):
     __tablename__ = "forums"
@@ -76,6 +85,7 @@ class Forum(Base):
     title = Column(String(255), nullable=False)
     description = Column(Text)
     category = Column(String(100))
+    post_count = Column(Integer, nullable=False, default=0, server_default="0")  # Maintained on post create/delete
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     posts = relationship("ForumPost", back_populates="forum")
@@ -87,13 +97,35 @@ class ForumPost(Base):
     forum_id = Column(Integer, ForeignKey("forums.id"))
     author_id = Column(Integer, ForeignKey("users.id"))
     parent_id = Column(Integer, ForeignKey("forum_posts.id"), nullable=True)  # For replies
+    path = Column(String(255), nullable=True)  # Materialized path of zero-padded ids from the thread root, e.g. "0000000012/0000000034"
     content = Column(Text, nullable=False)
+    reply_count = Column(Integer, nullable=False, default=0, server_default="0")  # Direct replies, maintained on reply create/delete
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     forum = relationship("Forum", back_populates="posts")
     author = relationship("User", back_populates="forum_posts")
     replies = relationship("ForumPost", remote_side=[id])
+    
+    __table_args__ = (
+        Index("ix_forum_posts_forum_parent", "forum_id", "parent_id"),
+        Index("ix_forum_posts_forum_path", "forum_id", "path"),
+    )
+    
+    PATH_SEGMENT_WIDTH = 10
+    PATH_SEPARATOR = "/"
+    MAX_DEPTH = 20  # Keeps the longest path within the 255 character column
+    
+    @classmethod
+    def build_path(cls, parent_path, post_id):
+        segment = str(post_id).zfill(cls.PATH_SEGMENT_WIDTH)
+        return f"{parent_path}{cls.PATH_SEPARATOR}{segment}" if parent_path else segment
+    
+    @classmethod
+    def subtree_bounds(cls, path):
+        """Half-open range [low, high) containing the paths of every descendant of `path`"""
+        # "0" sorts right after "/", so the range is exactly the "<path>/" prefix
+        return f"{path}{cls.PATH_SEPARATOR}", f"{path}0"
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
@@ -107,6 +139,11 @@ class ChatMessage(Base):
     
     sender = relationship("User", foreign_keys=[sender_id], back_populates="sent_messages")
     receiver = relationship("User", foreign_keys=[receiver_id], back_populates="received_messages")
+    
+    __table_args__ = (
+        Index("ix_chat_messages_sender_receiver_created", "sender_id", "receiver_id", "created_at"),
+        Index("ix_chat_messages_receiver_read", "receiver_id", "read"),
+    )
 
 class MeetingRequest(Base):
     __tablename__ = "meeting_requests"
@@ -117,10 +154,15 @@ class MeetingRequest(Base):
     message = Column(Text)
     status = Column(String(50), default="pending")  # pending, accepted, rejected
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(PreciseDateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # Delta sync change stamp
     
     requester = relationship("User", foreign_keys=[requester_id], back_populates="meeting_requests_sent")
     expert = relationship("User", foreign_keys=[expert_id], back_populates="meeting_requests_received")
+    
+    __table_args__ = (
+        Index("ix_meeting_requests_expert_status", "expert_id", "status"),
+        Index("ix_meeting_requests_requester_status", "requester_id", "status"),
+    )
 
 class ClinicalTrial(Base):
     __tablename__ = "clinical_trials"
@@ -151,5 +193,47 @@ class Notification(Base):
     meeting_id = Column(Integer, nullable=True)  # Reference to meeting request if applicable
     read = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(PreciseDateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # Delta sync change stamp
+    read_at = Column(DateTime(timezone=True), nullable=True)  # Retention: purged NOTIFICATION_READ_TTL_DAYS later
     
     user = relationship("User", back_populates="notifications")
+    
+    __table_args__ = (
+        Index("ix_notifications_user_read_created", "user_id", "read", "created_at"),
+        Index("ix_notifications_user_updated", "user_id", "updated_at"),
+        Index("ix_notifications_read_at", "read_at"),
+    )
+
+class NotificationArchive(Base):
+    """Compliance copy of a notification as it was sent; outlives the live row (see notification_retention)"""
+    __tablename__ = "notification_archive"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    notification_id = Column(Integer, nullable=False, index=True)  # Not unique: SQLite/MySQL can reuse a deleted row's id
+    user_id = Column(Integer, nullable=False)
+    type = Column(String(50))
+    title = Column(String(255), nullable=False)
+    message = Column(Text, nullable=False)
+    from_user = Column(String(255))
+    meeting_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime(timezone=True))
+    archived_at = Column(DateTime(timezone=True), nullable=False, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ix_notification_archive_user_created", "user_id", "created_at"),
+        Index("ix_notification_archive_archived", "archived_at"),
+    )
+
+class SyncTombstone(Base):
+    """A deleted item, kept for SYNC_TOMBSTONE_DAYS so delta sync can report it"""
+    __tablename__ = "sync_tombstones"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, nullable=False)
+    collection = Column(String(50), nullable=False)  # 'notifications', 'meetings', 'favorites'
+    item_id = Column(String(64), nullable=False)
+    deleted_at = Column(PreciseDateTime, nullable=False, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ix_sync_tombstones_user_collection_deleted", "user_id", "collection", "deleted_at"),
+    )
@@ -8,6 +8,8 @@ import os
 from dotenv import load_dotenv
 
 from mongodb_models import User
+from ttl_cache import TTLCache
+from password_hashing import PasswordHasher
 
 load_dotenv()
 
@@ -15,7 +17,24 @@ SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-this-in-production"
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
 
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+# Authenticated users are resolved on every request; keep them for a short
+# time instead of fetching the document each time
+user_cache = TTLCache(
+    "mongo_users",
+    ttl_seconds=float(os.getenv("USER_CACHE_TTL_SECONDS", "30")),
+    max_entries=int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+)
+
+# Hashes made with any other cost than PBKDF2_ROUNDS are upgraded on the next login
+PBKDF2_ROUNDS = int(os.getenv("PBKDF2_ROUNDS", "29000"))
+pwd_context = CryptContext(
+    schemes=["pbkdf2_sha256"],
+    deprecated="auto",
+    pbkdf2_sha256__default_rounds=PBKDF2_ROUNDS,
+    pbkdf2_sha256__min_rounds=PBKDF2_ROUNDS,
+    pbkdf2_sha256__max_rounds=PBKDF2_ROUNDS
+)
+password_hasher = PasswordHasher(pwd_context, max_workers=int(os.getenv("PASSWORD_HASH_WORKERS", "2")))
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -34,6 +53,15 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def token_subject(token: str) -> Optional[str]:
+    """The user id an access token was issued to, or None if it is invalid or expired"""
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    subject = payload.get("sub")
+    return str(subject) if subject is not None else None
+
 async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -48,7 +76,13 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
     except JWTError:
         raise credentials_exception
     
-    user = await User.get(user_id)
-    if user is None:
-        raise credentials_exception
-    return user
+    cached_user = user_cache.get(user_id)
+    if cached_user is None:
+        cached_user = await User.get(user_id)
+        if cached_user is None:
+            raise credentials_exception
+        user_cache.set(user_id, cached_user)
+    
+    # Never hand out the shared instance. The copy may be stale, so handlers write
+    # with set() / $set on the changed fields only, never save() the whole document
+    return cached_user.copy(deep=True)
@@ -1,13 +1,30 @@
 import os
 from motor.motor_asyncio import AsyncIOMotorClient
 from beanie import init_beanie
+from pymongo import IndexModel, UpdateOne
+from bson import ObjectId
 from dotenv import load_dotenv
 
+from pool_metrics import MongoPoolListener
+from query_profiler import MongoCommandProfiler
+
 load_dotenv()
 
 # MongoDB connection
 MONGODB_URL = os.getenv("MONGODB_URL", "mongodb://localhost:27017/curalink")
 
+def pool_options() -> dict:
+    """Motor pool settings from the environment; unset values keep the driver defaults"""
+    options = {
+        "maxPoolSize": int(os.getenv("MONGO_MAX_POOL_SIZE", "100")),
+        "minPoolSize": int(os.getenv("MONGO_MIN_POOL_SIZE", "0")),
+    }
+    if os.getenv("MONGO_MAX_IDLE_TIME_MS"):
+        options["maxIdleTimeMS"] = int(os.getenv("MONGO_MAX_IDLE_TIME_MS"))
+    if os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS"):
+        options["waitQueueTimeoutMS"] = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS"))
+    return options
+
 class Database:
     client: AsyncIOMotorClient = None
     database = None
@@ -16,21 +33,113 @@ db = Database()
 
 async def connect_to_mongo():
     """Create database connection"""
-    db.client = AsyncIOMotorClient(MONGODB_URL)
+    db.client = AsyncIOMotorClient(MONGODB_URL, event_listeners=[MongoPoolListener(), MongoCommandProfiler()], **pool_options())
     db.database = db.client.get_default_database()
     
     # Import models here to avoid circular imports
-    from mongodb_models import User, Trial, Publication, Expert, Forum, ForumPost, Favorite, ChatMessage, Meeting, Notification
+    from mongodb_models import User, Trial, Publication, Expert, Forum, ForumPost, Favorite, ChatMessage, Meeting, Notification, NotificationArchive, SyncTombstone
     
     # Initialize beanie with the models
     await init_beanie(
         database=db.database,
         document_models=[
             User, Trial, Publication, Expert, Forum, ForumPost, 
-            Favorite, ChatMessage, Meeting, Notification
+            Favorite, ChatMessage, Meeting, Notification, NotificationArchive, SyncTombstone
         ]
     )
     print("✅ Connected to MongoDB")
+    
+    # init_beanie creates the indexes declared in each document's Settings;
+    # verify they are actually there and report the ones nobody uses
+    await verify_indexes([
+        User, Trial, Publication, Expert, Forum, ForumPost,
+        Favorite, ChatMessage, Meeting, Notification, NotificationArchive, SyncTombstone
+    ])
+    await backfill_forum_post_paths()
+    await backfill_change_stamps()
+    await backfill_read_stamps()
+
+async def verify_indexes(document_models):
+    """Report declared indexes that are missing and existing indexes that are never used"""
+    report = {"missing": [], "unused": [], "undeclared": []}
+    index_stats_available = True
+    
+    for model in document_models:
+        collection = db.database[model.Settings.name]
+        declared = {
+            index.document["name"]
+            for index in getattr(model.Settings, "indexes", [])
+            if isinstance(index, IndexModel)
+        }
+        
+        try:
+            existing = set((await collection.index_information()).keys())
+        except Exception as e:
+            print(f"⚠️  Could not read indexes for {model.Settings.name}: {e}")
+            continue
+        
+        for name in sorted(declared - existing):
+            report["missing"].append(f"{model.Settings.name}.{name}")
+        
+        # Indexes created from Indexed() fields are not listed in Settings.indexes,
+        # so only flag extras on collections that declare their indexes explicitly
+        if declared:
+            for name in sorted(existing - declared - {"_id_"}):
+                report["undeclared"].append(f"{model.Settings.name}.{name}")
+        
+        # $indexStats counters reset on server restart, so "unused" means
+        # unused since the server last started
+        if not index_stats_available:
+            continue
+        try:
+            async for stats in collection.aggregate([{"$indexStats": {}}]):
+                if stats["name"] != "_id_" and stats["accesses"]["ops"] == 0:
+                    report["unused"].append(f"{model.Settings.name}.{stats['name']}")
+        except Exception as e:
+            print(f"⚠️  Could not read index usage statistics: {e}")
+            index_stats_available = False
+    
+    if report["missing"]:
+        print(f"❌ Missing MongoDB indexes: {', '.join(report['missing'])}")
+    if report["undeclared"]:
+        print(f"⚠️  Undeclared MongoDB indexes: {', '.join(report['undeclared'])}")
+    if report["unused"]:
+        print(f"ℹ️  Unused MongoDB indexes: {', '.join(report['unused'])}")
+    if not report["missing"]:
+        print("✅ MongoDB indexes verified")
+    
+    return report
+
+async def backfill_forum_post_paths():
+    """Give forum posts stored before materialized paths existed their path"""
+    from mongodb_models import ForumPost
+    
+    collection = db.database[ForumPost.Settings.name]
+    # _id order puts every parent before its replies
+    missing = await collection.find(
+        {"path": None}, {"parent_post_id": 1}
+    ).sort("_id", 1).to_list(None)
+    if not missing:
+        return 0
+    
+    parent_ids = [
+        ObjectId(doc["parent_post_id"]) for doc in missing
+        if doc.get("parent_post_id") and ObjectId.is_valid(doc["parent_post_id"])
+    ]
+    paths = {
+        str(doc["_id"]): doc["path"]
+        async for doc in collection.find({"_id": {"$in": parent_ids}, "path": {"$ne": None}}, {"path": 1})
+    }
+    
+    updates = []
+    for doc in missing:
+        path = ForumPost.build_path(paths.get(doc.get("parent_post_id")), str(doc["_id"]))
+        paths[str(doc["_id"])] = path
+        updates.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"path": path}}))
+    
+    await collection.bulk_write(updates, ordered=False)
+    print(f"✅ Backfilled thread paths for {len(updates)} forum posts")
+    return len(updates)
 
 async def close_mongo_connection():
     """Close database connection"""
@@ -41,3 +150,37 @@ async def close_mongo_connection():
 async def get_database():
     """Get database instance"""
     return db.database
+
+async def backfill_change_stamps():
+    """Give notifications stored before delta sync existed a change stamp (their creation time)"""
+    from mongodb_models import Notification
+    
+    collection = db.database[Notification.Settings.name]
+    missing = await collection.find({"updated_at": None}, {"created_at": 1}).to_list(None)
+    if not missing:
+        return 0
+    
+    await collection.bulk_write([
+        UpdateOne({"_id": doc["_id"]}, {"$set": {"updated_at": doc.get("created_at")}})
+        for doc in missing
+    ], ordered=False)
+    print(f"✅ Backfilled change stamps for {len(missing)} notifications")
+    return len(missing)
+
+async def backfill_read_stamps():
+    """Give notifications read before retention existed a read stamp, so the retention job can purge them"""
+    from mongodb_models import Notification
+    
+    collection = db.database[Notification.Settings.name]
+    missing = await collection.find(
+        {"is_read": True, "read_at": None}, {"updated_at": 1, "created_at": 1}
+    ).to_list(None)
+    if not missing:
+        return 0
+    
+    await collection.bulk_write([
+        UpdateOne({"_id": doc["_id"]}, {"$set": {"read_at": doc.get("updated_at") or doc.get("created_at")}})
+        for doc in missing
+    ], ordered=False)
+    print(f"✅ Backfilled read stamps for {len(missing)} notifications")
+    return len(missing)
@@ -0,0 +1,77 @@
+import asyncio
+from typing import Dict, List, Optional, Iterable
+
+from beanie import PydanticObjectId
+from beanie.operators import In
+from pydantic import BaseModel, Field
+
+from mongodb_models import User
+
+class UserSummary(BaseModel):
+    """Projection of the User fields needed to display who did something"""
+    id: PydanticObjectId = Field(alias="_id")
+    full_name: str
+    email: str
+
+    def to_dict(self) -> dict:
+        return {"id": str(self.id), "full_name": self.full_name, "email": self.email}
+
+class UserLoader:
+    """Request-scoped batching loader for user summaries (DataLoader pattern).
+
+    Every load() issued before the event loop gets a chance to run is
+    collected into a single `{_id: {$in: [...]}}` query that projects only
+    the summary fields. Results are memoized for the lifetime of the loader,
+    so the same user is never fetched twice in one request.
+    """
+
+    def __init__(self):
+        self._results: Dict[str, asyncio.Future] = {}
+        self._pending: List[str] = []
+
+    def load(self, user_id: Optional[str]) -> "asyncio.Future[Optional[dict]]":
+        loop = asyncio.get_running_loop()
+        key = str(user_id) if user_id else ""
+
+        if key not in self._results:
+            future = loop.create_future()
+            self._results[key] = future
+            if not PydanticObjectId.is_valid(key):
+                future.set_result(None)
+            else:
+                if not self._pending:
+                    loop.call_soon(self._schedule_dispatch)
+                self._pending.append(key)
+
+        return self._results[key]
+
+    async def load_many(self, user_ids: Iterable[Optional[str]]) -> Dict[str, Optional[dict]]:
+        """Resolve several ids with one query; returns {user_id: summary or None}"""
+        ids = list(dict.fromkeys(str(user_id) for user_id in user_ids if user_id))
+        results = await asyncio.gather(*(self.load(user_id) for user_id in ids))
+        return dict(zip(ids, results))
+
+    def _schedule_dispatch(self):
+        batch, self._pending = self._pending, []
+        asyncio.ensure_future(self._dispatch(batch))
+
+    async def _dispatch(self, batch: List[str]):
+        try:
+            summaries = await User.find(
+                In(User.id, [PydanticObjectId(user_id) for user_id in batch]),
+                projection_model=UserSummary
+            ).to_list()
+        except Exception as e:
+            for user_id in batch:
+                if not self._results[user_id].done():
+                    self._results[user_id].set_exception(e)
+            return
+
+        found = {str(summary.id): summary.to_dict() for summary in summaries}
+        for user_id in batch:
+            if not self._results[user_id].done():
+                self._results[user_id].set_result(found.get(user_id))
+
+def get_user_loader() -> UserLoader:
+    """FastAPI dependency: a fresh loader per request"""
+    return UserLoader()
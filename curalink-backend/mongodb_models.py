@@ -1,9 +1,13 @@
-from beanie import Document, Indexed
+from beanie import Document, Indexed, before_event, Insert, Replace, Save, SaveChanges
 from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from pymongo import IndexModel, ASCENDING, DESCENDING
+from typing import Optional, List, ClassVar
 from datetime import datetime
 from enum import Enum
 
+from delta_sync import SYNC_TOMBSTONE_DAYS
+from notification_retention import NOTIFICATION_ARCHIVE_DAYS
+
 class UserRole(str, Enum):
     PATIENT = "patient"
     RESEARCHER = "researcher"
@@ -110,11 +114,32 @@ class ForumPost(Document):
     is_pinned: bool = False
     reply_count: int = 0
     parent_post_id: Optional[str] = None
+    path: Optional[str] = None  # Materialized path of ids from the thread root, e.g. "<root id>/<reply id>"
     created_at: datetime = datetime.utcnow()
     updated_at: datetime = datetime.utcnow()
     
     class Settings:
         name = "forum_posts"
+        indexes = [
+            IndexModel([("forum_id", ASCENDING), ("created_at", DESCENDING)], name="forum_created_at"),
+            IndexModel([("parent_post_id", ASCENDING), ("created_at", ASCENDING)], name="parent_created_at"),
+            IndexModel([("forum_id", ASCENDING), ("path", ASCENDING)], name="forum_path"),
+        ]
+    
+    PATH_SEPARATOR: ClassVar[str] = "/"
+    MAX_DEPTH: ClassVar[int] = 20  # Same cap as the SQL models; keeps paths (and their index keys) bounded
+    
+    @classmethod
+    def build_path(cls, parent_path: Optional[str], post_id: str) -> str:
+        # ObjectIds are fixed width and start with their creation time, so
+        # sorting by path lists each thread depth-first, oldest reply first
+        return f"{parent_path}{cls.PATH_SEPARATOR}{post_id}" if parent_path else post_id
+    
+    @classmethod
+    def subtree_bounds(cls, path: str):
+        """Half-open range [low, high) containing the paths of every descendant of `path`"""
+        # "0" sorts right after "/", so the range is exactly the "<path>/" prefix
+        return f"{path}{cls.PATH_SEPARATOR}", f"{path}0"
 
 class Favorite(Document):
     user_id: str
@@ -124,6 +149,14 @@ class Favorite(Document):
     
     class Settings:
         name = "favorites"
+        indexes = [
+            IndexModel(
+                [("user_id", ASCENDING), ("item_type", ASCENDING), ("item_id", ASCENDING)],
+                name="user_item_unique",
+                unique=True
+            ),
+            IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_created_at"),
+        ]
 
 class ChatMessage(Document):
     sender_id: str
@@ -134,6 +167,11 @@ class ChatMessage(Document):
     
     class Settings:
         name = "chat_messages"
+        indexes = [
+            IndexModel([("sender_id", ASCENDING), ("receiver_id", ASCENDING), ("created_at", ASCENDING)], name="sender_receiver_created_at"),
+            IndexModel([("receiver_id", ASCENDING), ("created_at", ASCENDING)], name="receiver_created_at"),
+            IndexModel([("receiver_id", ASCENDING), ("is_read", ASCENDING)], name="receiver_is_read"),
+        ]
 
 class MeetingStatus(str, Enum):
     SCHEDULED = "scheduled"
@@ -155,6 +193,10 @@ class Meeting(Document):
     
     class Settings:
         name = "meetings"
+        indexes = [
+            IndexModel([("organizer_id", ASCENDING), ("scheduled_time", DESCENDING)], name="organizer_scheduled_time"),
+            IndexModel([("participants", ASCENDING), ("scheduled_time", DESCENDING)], name="participants_scheduled_time"),
+        ]
 
 class NotificationType(str, Enum):
     INFO = "info"
@@ -175,7 +217,61 @@ class Notification(Document):
     sender_id: Optional[str] = None  # For call/message notifications
     call_room: Optional[str] = None  # For video call room name
     message_content: Optional[str] = None  # For message notifications
+    occurrences: int = 1  # Notifications folded into this one (see mongodb_notification_writer.write_coalesced)
     created_at: datetime = datetime.utcnow()
+    updated_at: Optional[datetime] = None  # Delta sync change stamp
+    read_at: Optional[datetime] = None  # Retention: purged NOTIFICATION_READ_TTL_DAYS later
+    
+    @before_event(Insert, Replace, Save, SaveChanges)
+    def stamp_updated_at(self):
+        self.updated_at = datetime.utcnow()
     
     class Settings:
         name = "notifications"
+        indexes = [
+            IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_created_at"),
+            IndexModel([("user_id", ASCENDING), ("is_read", ASCENDING)], name="user_is_read"),
+            IndexModel([("user_id", ASCENDING), ("updated_at", ASCENDING)], name="user_updated_at"),
+            IndexModel([("user_id", ASCENDING), ("sender_id", ASCENDING), ("type", ASCENDING), ("is_read", ASCENDING),
+                        ("created_at", DESCENDING)], name="user_sender_unread"),
+            # The retention job finds expired read notifications; not a TTL index, which
+            # would delete them without delta-sync tombstones
+            IndexModel([("read_at", ASCENDING)], name="read_at"),
+        ]
+
+class NotificationArchive(Document):
+    """Compliance copy of a notification as it was sent; outlives the live one (see notification_retention)"""
+    user_id: str
+    title: str
+    message: str
+    type: NotificationType = NotificationType.INFO
+    action_url: Optional[str] = None
+    meeting_id: Optional[str] = None
+    sender_id: Optional[str] = None
+    call_room: Optional[str] = None
+    message_content: Optional[str] = None
+    created_at: datetime
+    archived_at: datetime
+    
+    class Settings:
+        name = "notification_archive"
+        indexes = [
+            IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_created_at"),
+            *([IndexModel([("archived_at", ASCENDING)], name="archived_at_ttl", expireAfterSeconds=NOTIFICATION_ARCHIVE_DAYS * 86400)]
+              if NOTIFICATION_ARCHIVE_DAYS > 0 else []),
+        ]
+
+class SyncTombstone(Document):
+    """A deleted item, kept for SYNC_TOMBSTONE_DAYS so delta sync can report it"""
+    user_id: str
+    collection: str  # "notifications", "meetings", "favorites"
+    item_id: str
+    deleted_at: datetime
+    
+    class Settings:
+        name = "sync_tombstones"
+        indexes = [
+            IndexModel([("user_id", ASCENDING), ("collection", ASCENDING), ("deleted_at", ASCENDING)], name="user_collection_deleted_at"),
+            # MongoDB removes expired tombstones itself
+            IndexModel([("deleted_at", ASCENDING)], name="deleted_at_ttl", expireAfterSeconds=SYNC_TOMBSTONE_DAYS * 86400),
+        ]
@@ -0,0 +1,87 @@
+"""
+Batched notification inserts (MongoDB); see batch_writer.py.
+
+One insert_many per batch. insert_many bypasses Beanie's event
+hooks, so the change stamp is set here, and the ids are assigned here too.
+
+With NOTIFICATION_ARCHIVE on, the compliance copies (same ids) are inserted
+first, so a notification is never delivered without one (see
+notification_retention). A failed batch is retried a document at a time
+(see batch_writer.py) and insert_many may have stored part of it, so
+documents that are already there count as stored.
+
+write_coalesced() folds a chatty sender's repeats into one notification: while
+the receiver hasn't read it, another notification of the same type from the
+same sender within NOTIFICATION_COALESCE_SECONDS of the first updates it
+(occurrences + latest preview) instead of adding a document. The archive keeps the
+first one; the chat messages themselves are stored in full.
+"""
+
+import os
+from datetime import datetime, timedelta
+from typing import List, Tuple
+
+from beanie import PydanticObjectId
+from dotenv import load_dotenv
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+
+from batch_writer import BatchWriter
+from metrics import Counter
+from mongodb_models import Notification, NotificationArchive
+from notification_retention import NOTIFICATION_ARCHIVE
+
+load_dotenv()
+
+NOTIFICATION_COALESCE_SECONDS = float(os.getenv("NOTIFICATION_COALESCE_SECONDS", "300"))
+
+COALESCED = Counter("notifications_coalesced_total", "Notifications folded into an earlier unread one", ["type"])
+
+async def _insert_notifications(notifications: List[Notification]):
+    now = datetime.utcnow()
+    for notification in notifications:
+        notification.id = notification.id or PydanticObjectId()
+        notification.updated_at = now
+    if NOTIFICATION_ARCHIVE:
+        await _insert_new(NotificationArchive, [
+            NotificationArchive(**notification.dict(exclude={"is_read", "occurrences", "updated_at", "read_at", "revision_id"}), archived_at=now)
+            for notification in notifications
+        ])
+    await _insert_new(Notification, notifications)
+
+DUPLICATE_KEY = 11000
+
+async def _insert_new(model, documents):
+    """insert_many that skips documents already stored (same _id) by an earlier attempt"""
+    try:
+        await model.insert_many(documents, ordered=False)
+    except BulkWriteError as e:
+        if any(error["code"] != DUPLICATE_KEY for error in e.details["writeErrors"]):
+            raise
+
+notification_writer = BatchWriter("notifications", _insert_notifications)
+
+async def write_coalesced(notification: Notification) -> Tuple[Notification, bool]:
+    """Fold `notification` into its sender's unread one or write it; returns the stored notification and whether it is new"""
+    if NOTIFICATION_COALESCE_SECONDS > 0 and notification.sender_id:
+        now = datetime.utcnow()
+        folded = await Notification.get_motor_collection().find_one_and_update(
+            {
+                "user_id": notification.user_id,
+                "sender_id": notification.sender_id,
+                "type": notification.type,
+                "is_read": False,
+                "created_at": {"$gte": now - timedelta(seconds=NOTIFICATION_COALESCE_SECONDS)},
+                "occurrences": {"$gte": 1}  # Written before coalescing existed; $inc would undercount them
+            },
+            {
+                "$set": {"message": notification.message, "message_content": notification.message_content, "updated_at": now},
+                "$inc": {"occurrences": 1}
+            },
+            sort=[("created_at", -1)],
+            return_document=ReturnDocument.AFTER
+        )
+        if folded:
+            COALESCED.labels(type=notification.type.value).inc()
+            return Notification.model_validate(folded), False
+    return await notification_writer.write(notification), True
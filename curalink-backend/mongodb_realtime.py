@@ -0,0 +1,134 @@
+"""
+Real-time pushes for the MongoDB app.
+
+Notifications (including video-call events), chat messages and meeting
+updates are pushed to the recipient's sockets when they are written, so the
+frontend no longer polls for them. Every notification and chat message event
+carries a `cursor`: the message's ObjectId, or for a notification an ObjectId
+made from its updated_at (a coalesced notification keeps its _id but changes
+later, see mongodb_notification_writer). A client that reconnects sends
+{"type": "resume", "cursor": "<last cursor>"} and receives the notifications
+and messages it missed, oldest first, followed by
+{"type": "resumed", "replayed": <n>}.
+
+Replay selects messages by _id and notifications by updated_at. ObjectIds and
+clocks from different workers are only ordered to the second, so replay starts
+RESUME_OVERLAP_SECONDS before the cursor and clients drop events they already
+have. When more than WS_RESUME_LIMIT events are missing the
+client is told to {"type": "resync"}, i.e. refetch its lists over HTTP.
+"""
+
+import json
+import os
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from beanie import PydanticObjectId
+from bson import ObjectId
+from dotenv import load_dotenv
+
+from mongodb_models import ChatMessage, Meeting, Notification, User
+from mongodb_loaders import UserLoader
+from websocket_manager import manager
+
+load_dotenv()
+
+RESUME_LIMIT = int(os.getenv("WS_RESUME_LIMIT", "100"))
+RESUME_OVERLAP_SECONDS = 2
+
+def serialize_notification(notification: Notification) -> dict:
+    """The shape GET /api/notifications/ returns"""
+    notification_dict = notification.dict()
+    notification_dict["id"] = str(notification.id)
+    notification_dict["created_at"] = notification.created_at.isoformat()
+    notification_dict["updated_at"] = notification.updated_at.isoformat() if notification.updated_at else None
+    notification_dict["read_at"] = notification.read_at.isoformat() if notification.read_at else None
+    notification_dict["timestamp"] = notification.created_at.isoformat()
+    notification_dict["read"] = notification.is_read
+    return notification_dict
+
+def serialize_message(message: ChatMessage, sender_name: str) -> dict:
+    """The shape GET /api/chat/messages/{other_user_id} returns"""
+    return {
+        "id": str(message.id),
+        "sender_id": message.sender_id,
+        "receiver_id": message.receiver_id,
+        "sender_name": sender_name,
+        "message": message.message,
+        "created_at": message.created_at.isoformat()
+    }
+
+def _notification_changed_at(notification: Notification) -> datetime:
+    return notification.updated_at or notification.created_at
+
+def _notification_event(notification: Notification) -> str:
+    return json.dumps({
+        "type": "notification",
+        "cursor": str(ObjectId.from_datetime(_notification_changed_at(notification))),
+        "notification": serialize_notification(notification)
+    }, default=str)
+
+def _message_event(message: ChatMessage, sender_name: str) -> str:
+    return json.dumps({
+        "type": "chat_message",
+        "cursor": str(message.id),
+        "message": serialize_message(message, sender_name)
+    })
+
+async def push_notification(notification: Notification):
+    """Send a new or coalesced notification to its recipient (clients replace it by id)"""
+    await manager.send_personal_message(notification.user_id, _notification_event(notification), "notification")
+
+async def push_chat_message(message: ChatMessage, sender: User):
+    """Send a chat message to the receiver and to the sender's other tabs"""
+    event = _message_event(message, sender.full_name)
+    await manager.send_personal_message(message.receiver_id, event, "chat_message")
+    if message.sender_id != message.receiver_id:
+        await manager.send_personal_message(message.sender_id, event, "chat_message")
+
+async def push_meeting_update(meeting: Meeting, user_id: str, message_type: str, actor: User):
+    """meeting_request (to the expert) or meeting_status_update (to the organizer)"""
+    await manager.send_personal_message(user_id, json.dumps({
+        "type": message_type,
+        "request_id": str(meeting.id),
+        "request": {
+            "id": str(meeting.id),
+            "title": meeting.title,
+            "status": meeting.status,
+            "organizer_id": meeting.organizer_id,
+            "participants": meeting.participants,
+            "scheduled_time": meeting.scheduled_time.isoformat() if meeting.scheduled_time else None,
+            "updated_at": meeting.updated_at.isoformat() if meeting.updated_at else None,
+            "actor": {"id": str(actor.id), "full_name": actor.full_name}
+        }
+    }, default=str), message_type)
+
+async def replay_since(user_id: str, cursor: str) -> Optional[List[Tuple[str, str]]]:
+    """Events a reconnecting client missed after `cursor`, oldest first; None when it must resync"""
+    if not PydanticObjectId.is_valid(cursor):
+        return None
+    since = ObjectId(cursor).generation_time.replace(tzinfo=None) - timedelta(seconds=RESUME_OVERLAP_SECONDS)
+
+    # By updated_at: a notification coalesced since the cursor has an older _id
+    notifications = await Notification.find(
+        {"user_id": user_id, "updated_at": {"$gte": since}}
+    ).sort("updated_at").limit(RESUME_LIMIT + 1).to_list()
+    messages = await ChatMessage.find({
+        "$or": [{"receiver_id": user_id}, {"sender_id": user_id}],
+        "_id": {"$gte": ObjectId.from_datetime(since)}
+    }).sort("_id").limit(RESUME_LIMIT + 1).to_list()
+    if len(notifications) + len(messages) > RESUME_LIMIT:
+        return None
+
+    senders = await UserLoader().load_many(message.sender_id for message in messages)
+    events = [
+        (_notification_changed_at(notification), _notification_event(notification), "notification")
+        for notification in notifications
+    ]
+    events += [
+        (message.id.generation_time.replace(tzinfo=None),
+         _message_event(message, (senders.get(message.sender_id) or {}).get("full_name", "Unknown")), "chat_message")
+        for message in messages
+    ]
+    events.sort(key=lambda event: event[0])
+    return [(text, message_type) for _, text, message_type in events]
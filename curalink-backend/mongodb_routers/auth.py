@@ -4,8 +4,8 @@ from datetime import timedelta, datetime
 from mongodb_models import User
 from mongodb_schemas import UserCreate, UserLogin, Token, UserResponse
 from mongodb_auth_utils import (
-    verify_password,
-    get_password_hash,
+    password_hasher,
+    user_cache,
     create_access_token,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
@@ -31,7 +31,7 @@ async def register(user_data: UserCreate):
         )
     
     # Create user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await password_hasher.hash(user_data.password)
     db_user = User(
         email=user_data.email,
         username=user_data.username,
@@ -77,13 +77,22 @@ async def register(user_data: UserCreate):
 async def login(user_credentials: UserLogin):
     user = await User.find_one(User.email == user_credentials.email)
     
-    if not user or not verify_password(user_credentials.password, user.hashed_password):
+    valid, new_hash = False, None
+    if user:
+        valid, new_hash = await password_hasher.verify_and_update(user_credentials.password, user.hashed_password)
+    
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Upgrade hashes created with older cost settings while we have the plain password
+    if new_hash:
+        await user.set({User.hashed_password: new_hash})
+        user_cache.invalidate(str(user.id))
+    
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": str(user.id)}, expires_delta=access_token_expires
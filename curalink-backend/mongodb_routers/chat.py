@@ -1,10 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from typing import List, Optional
 from datetime import datetime
 from pydantic import BaseModel
 
 from mongodb_models import ChatMessage, User, Notification, NotificationType
 from mongodb_auth_utils import get_current_user
+from mongodb_loaders import UserLoader, get_user_loader
+from mongodb_realtime import push_chat_message, push_notification
+from delta_sync import make_etag, not_modified, encode_cursor, decode_cursor, cursor_datetime, tagged_response, delta_response
+from mongodb_notification_writer import write_coalesced
+from mongodb_unread import unread_messages, unread_notifications
 
 router = APIRouter()
 
@@ -17,7 +22,11 @@ class MessageCreate(BaseModel):
     message: str
 
 @router.post("/messages")
-async def send_message(message_data: MessageCreate, current_user: User = Depends(get_current_user)):
+async def send_message(
+    message_data: MessageCreate,
+    current_user: User = Depends(get_current_user),
+    user_loader: UserLoader = Depends(get_user_loader)
+):
     chat_message = ChatMessage(
         sender_id=str(current_user.id),
         receiver_id=message_data.receiver_id,
@@ -25,10 +34,12 @@ async def send_message(message_data: MessageCreate, current_user: User = Depends
         created_at=datetime.utcnow()
     )
     await chat_message.insert()
+    unread_messages.increment(chat_message.receiver_id, chat_message.sender_id)
+    await push_chat_message(chat_message, current_user)
     
     # Send message notification to receiver
     try:
-        receiver = await User.get(message_data.receiver_id)
+        receiver = await user_loader.load(message_data.receiver_id)
         if receiver:
             notification = Notification(
                 user_id=message_data.receiver_id,
@@ -40,7 +51,11 @@ async def send_message(message_data: MessageCreate, current_user: User = Depends
                 is_read=False,
                 created_at=datetime.utcnow()
             )
-            await notification.insert()
+            # A burst of messages updates one notification instead of adding one each
+            notification, created = await write_coalesced(notification)
+            if created:
+                unread_notifications.increment(notification.user_id)
+            await push_notification(notification)
     except Exception as e:
         print(f"Failed to send message notification: {e}")
     
@@ -53,30 +68,84 @@ async def send_message(message_data: MessageCreate, current_user: User = Depends
     }
 
 @router.get("/messages/{other_user_id}")
-async def get_messages(other_user_id: str, current_user: User = Depends(get_current_user)):
-    # Get the other user to include their name
-    other_user = await User.get(other_user_id)
-    
-    messages = await ChatMessage.find({
+async def get_messages(
+    other_user_id: str,
+    request: Request,
+    since: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    user_loader: UserLoader = Depends(get_user_loader)
+):
+    """The conversation with another user, or with `since` only new messages (see delta_sync).
+
+    Read state is part of full responses only: a `since` delta carries new
+    messages, not older ones the other user has read since. Clients that
+    show read receipts refetch the conversation without `since`.
+    """
+    conversation = {
         "$or": [
             {"sender_id": str(current_user.id), "receiver_id": other_user_id},
             {"sender_id": other_user_id, "receiver_id": str(current_user.id)}
         ]
-    }).sort("created_at").to_list()
+    }
+    # Messages are only ever added or marked read: the count, newest timestamp and
+    # unread counts per direction describe the conversation, in one aggregation
+    stats = await ChatMessage.find(conversation).aggregate([{"$group": {
+        "_id": None,
+        "count": {"$sum": 1},
+        "newest": {"$max": "$created_at"},
+        "unread_received": {"$sum": {"$cond": [{"$and": [{"$eq": ["$sender_id", other_user_id]}, {"$eq": ["$is_read", False]}]}, 1, 0]}},
+        "unread_sent": {"$sum": {"$cond": [{"$and": [{"$eq": ["$sender_id", str(current_user.id)]}, {"$eq": ["$is_read", False]}]}, 1, 0]}}
+    }}]).to_list()
+    stats = stats[0] if stats else {"count": 0, "newest": None, "unread_received": 0, "unread_sent": 0}
+    count, newest = stats["count"], stats["newest"]
+    
+    # Opening the conversation reads what the other user sent; polls that find
+    # nothing unread don't write
+    if stats["unread_received"]:
+        result = await ChatMessage.find({
+            "sender_id": other_user_id, "receiver_id": str(current_user.id), "is_read": False
+        }).update({"$set": {"is_read": True}})
+        if result.modified_count:
+            unread_messages.decrement(str(current_user.id), other_user_id, result.modified_count)
+    
+    # After the update nothing received is unread; what we sent is only in full responses
+    version = [count, newest] if since else [count, newest, stats["unread_sent"]]
+    etag = make_etag("messages", str(current_user.id), other_user_id, *version)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    
+    # Get the other user's name without loading the whole document
+    other_user = await user_loader.load(other_user_id)
+    
+    query = dict(conversation)
+    sent_since = cursor_datetime(decode_cursor(since)["c"]) if since else None
+    if sent_since is not None:
+        query["created_at"] = {"$gt": sent_since}
+    messages = await ChatMessage.find(query).sort("created_at").to_list()
     
     # Format messages with sender names
     formatted_messages = []
     for msg in messages:
-        sender_name = current_user.full_name if msg.sender_id == str(current_user.id) else (other_user.full_name if other_user else "Unknown")
+        sender_name = current_user.full_name if msg.sender_id == str(current_user.id) else (other_user["full_name"] if other_user else "Unknown")
         formatted_messages.append({
             "id": str(msg.id),
             "sender_id": msg.sender_id,
             "sender_name": sender_name,
             "message": msg.message,
+            "read": msg.is_read,
             "created_at": msg.created_at.isoformat()
         })
     
-    return formatted_messages
+    if since is None:
+        return tagged_response(formatted_messages, etag)
+    return delta_response(formatted_messages, [], encode_cursor(newest), etag)
+
+@router.get("/unread-count")
+async def get_unread_count(current_user: User = Depends(get_current_user)):
+    """Unread messages in total and per sender (from memory, see unread_counters)"""
+    unread = await unread_messages.counts(str(current_user.id))
+    return {"unread_count": sum(unread.values()), "conversations": unread}
 
 @router.get("/")
 async def get_user_messages(current_user: User = Depends(get_current_user)):
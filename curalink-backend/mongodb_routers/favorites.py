@@ -1,9 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from typing import List, Optional
 from datetime import datetime
+from pymongo.errors import DuplicateKeyError
 
 from mongodb_models import Favorite, User
 from mongodb_auth_utils import get_current_user
+from delta_sync import make_etag, not_modified, encode_cursor, decode_cursor, cursor_datetime, is_expired, tagged_response, delta_response
+from mongodb_tombstones import record_deletion, latest_deletion, deleted_since, collection_version
 
 router = APIRouter()
 
@@ -34,7 +37,14 @@ async def add_favorite(favorite_data: FavoriteCreate, current_user: User = Depen
         item_id=favorite_data.item_id,
         created_at=datetime.utcnow()
     )
-    await favorite.insert()
+    try:
+        await favorite.insert()
+    except DuplicateKeyError:
+        # A concurrent request saved the same item between the check and the insert
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Item already in favorites"
+        )
     
     return {"message": "Added to favorites", "id": str(favorite.id)}
 
@@ -55,12 +65,33 @@ async def remove_favorite(favorite_id: str, current_user: User = Depends(get_cur
         )
     
     await favorite.delete()
+    await record_deletion("favorites", favorite.id, [favorite.user_id])
     return {"message": "Removed from favorites"}
 
 @router.get("/")
-async def get_favorites(current_user: User = Depends(get_current_user)):
-    favorites = await Favorite.find({"user_id": str(current_user.id)}).to_list()
-    return favorites
+async def get_favorites(request: Request, since: Optional[str] = None, current_user: User = Depends(get_current_user)):
+    """All favorites, or with `since` only what changed (see delta_sync)"""
+    user_id = str(current_user.id)
+    # Favorites are only ever added or removed, so the count, newest and newest deletion describe them
+    count, newest = await collection_version(Favorite, {"user_id": user_id}, "created_at")
+    newest_deletion = await latest_deletion(user_id, "favorites")
+    etag = make_etag("favorites", user_id, count, newest, newest_deletion)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    
+    query = {"user_id": user_id}
+    position = decode_cursor(since) if since else None
+    full = position is None or is_expired(position)
+    added_since = None if full else cursor_datetime(position["c"])
+    if added_since is not None:
+        query["created_at"] = {"$gte": added_since}
+    favorites = await Favorite.find(query).to_list()
+    
+    if since is None:
+        return tagged_response(favorites, etag)
+    deleted = [] if full else await deleted_since(user_id, "favorites", position["d"])
+    return delta_response(favorites, deleted, encode_cursor(newest, newest_deletion), etag, full)
 
 @router.get("/check/{item_type}/{item_id}")
 async def check_favorite(item_type: str, item_id: str, current_user: User = Depends(get_current_user)):
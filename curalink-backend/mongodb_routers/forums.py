@@ -1,6 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from typing import List, Optional
 from datetime import datetime
+from beanie import PydanticObjectId
 
 from mongodb_models import Forum, ForumPost, User
 from mongodb_schemas import ForumCreate, ForumResponse, ForumPostCreate, ForumPostResponse
@@ -65,3 +66,176 @@ async def get_forum(forum_id: str):
         created_at=forum.created_at,
         updated_at=forum.updated_at
     )
+
+def _post_response(post: ForumPost) -> dict:
+    return {
+        "id": str(post.id),
+        "forum_id": post.forum_id,
+        "title": post.title,
+        "content": post.content,
+        "author_id": post.author_id,
+        "author_name": post.author_name,
+        "is_pinned": post.is_pinned,
+        "parent_post_id": post.parent_post_id,
+        "created_at": post.created_at,
+        "updated_at": post.updated_at,
+        "replies": []
+    }
+
+def _subtree_filter(post: ForumPost) -> dict:
+    low, high = ForumPost.subtree_bounds(post.path)
+    return {"path": {"$gte": low, "$lt": high}}
+
+def _build_post_tree(roots: List[ForumPost], descendants: List[ForumPost], reply_limit: Optional[int]) -> List[dict]:
+    """Assemble posts into nested threads in memory.
+
+    `descendants` must be in path order. Each node keeps its total
+    `reply_count`; with a `reply_limit` only the latest that many replies are
+    returned per node.
+    """
+    nodes = {str(post.id): _post_response(post) for post in roots}
+    threads = list(nodes.values())
+    
+    for post in descendants:
+        nodes[str(post.id)] = _post_response(post)
+    for post in descendants:
+        parent = nodes.get(post.parent_post_id)
+        if parent is not None:
+            parent["replies"].append(nodes[str(post.id)])
+    
+    for node in nodes.values():
+        node["reply_count"] = len(node["replies"])
+        if reply_limit is not None:
+            node["replies"] = node["replies"][-reply_limit:] if reply_limit > 0 else []
+    
+    return threads
+
+async def _adjust_counters(forum_id: str, parent_post_id: str, delta: int, reply_delta: int = None):
+    """Shift the forum's post count and the parent's reply count (by `reply_delta`, default `delta`) with server-side $inc"""
+    await Forum.find_one({"_id": PydanticObjectId(forum_id)}).update({"$inc": {"post_count": delta}})
+    if parent_post_id:
+        reply_delta = delta if reply_delta is None else reply_delta
+        await ForumPost.find_one({"_id": PydanticObjectId(parent_post_id)}).update({"$inc": {"reply_count": reply_delta}})
+
+@router.post("/{forum_id}/posts", response_model=ForumPostResponse)
+async def create_post(forum_id: str, post_data: ForumPostCreate, current_user: User = Depends(get_current_user)):
+    forum = await Forum.get(forum_id)
+    if not forum:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Forum not found"
+        )
+    
+    parent = None
+    if post_data.parent_post_id:
+        parent = await ForumPost.find_one({"_id": PydanticObjectId(post_data.parent_post_id), "forum_id": forum_id}) \
+            if PydanticObjectId.is_valid(post_data.parent_post_id) else None
+        if not parent:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Parent post not found"
+            )
+        if parent.path.count(ForumPost.PATH_SEPARATOR) + 1 >= ForumPost.MAX_DEPTH:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Replies are nested too deeply"
+            )
+    
+    # Assign the id up front so the post is inserted with its final path
+    post_id = PydanticObjectId()
+    post = ForumPost(
+        id=post_id,
+        forum_id=forum_id,
+        title=post_data.title,
+        content=post_data.content,
+        author_id=str(current_user.id),
+        author_name=current_user.full_name,
+        parent_post_id=post_data.parent_post_id,
+        path=ForumPost.build_path(parent.path if parent else None, str(post_id)),
+        created_at=datetime.utcnow(),
+        updated_at=datetime.utcnow()
+    )
+    await post.insert()
+    await _adjust_counters(forum_id, post.parent_post_id, 1)
+    
+    return ForumPostResponse(
+        id=str(post.id),
+        forum_id=post.forum_id,
+        title=post.title,
+        content=post.content,
+        author_id=post.author_id,
+        author_name=post.author_name,
+        is_pinned=post.is_pinned,
+        reply_count=post.reply_count,
+        parent_post_id=post.parent_post_id,
+        created_at=post.created_at,
+        updated_at=post.updated_at
+    )
+
+@router.get("/{forum_id}/posts")
+async def get_forum_posts(
+    forum_id: str,
+    skip: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=100),
+    reply_limit: Optional[int] = Query(None, ge=0, le=50)
+):
+    """Get the top-level posts in a forum with their replies.
+
+    Everything by default, as before paging existed; `limit` pages the posts
+    and `reply_limit` trims each reply list to a preview (`reply_count` stays
+    the total, so clients can tell replies were left out).
+    """
+    roots = await ForumPost.find(
+        {"forum_id": forum_id, "parent_post_id": None}
+    ).sort("created_at").skip(skip).limit(limit).to_list()
+    
+    if not roots:
+        return []
+    
+    # Every reply below the page's posts, at any depth, in one indexed range query
+    descendants = await ForumPost.find({
+        "forum_id": forum_id,
+        "$or": [_subtree_filter(post) for post in roots]
+    }).sort("path").to_list()
+    
+    return _build_post_tree(roots, descendants, reply_limit)
+
+@router.get("/{forum_id}/posts/{post_id}/thread")
+async def get_post_thread(forum_id: str, post_id: str):
+    """Get a post with its complete reply tree"""
+    root = await ForumPost.find_one({"_id": PydanticObjectId(post_id), "forum_id": forum_id}) \
+        if PydanticObjectId.is_valid(post_id) else None
+    if not root:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Post not found"
+        )
+    
+    descendants = await ForumPost.find({"forum_id": forum_id, **_subtree_filter(root)}).sort("path").to_list()
+    
+    return _build_post_tree([root], descendants, len(descendants))[0]
+
+@router.delete("/{forum_id}/posts/{post_id}")
+async def delete_post(forum_id: str, post_id: str, current_user: User = Depends(get_current_user)):
+    """Delete a post and its replies (only author can delete)"""
+    post = await ForumPost.find_one({"_id": PydanticObjectId(post_id), "forum_id": forum_id}) \
+        if PydanticObjectId.is_valid(post_id) else None
+    if not post:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Post not found"
+        )
+    
+    if post.author_id != str(current_user.id):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You can only delete your own posts"
+        )
+    
+    # The replies go with it; leaving them would orphan them under a missing parent
+    removed = await ForumPost.get_motor_collection().delete_many(
+        {"forum_id": forum_id, "$or": [{"_id": post.id}, _subtree_filter(post)]}
+    )
+    await _adjust_counters(forum_id, post.parent_post_id, -removed.deleted_count, reply_delta=-1)
+    
+    return {"message": "Post deleted successfully"}
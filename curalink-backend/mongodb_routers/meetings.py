@@ -1,10 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from typing import List, Optional
 from datetime import datetime
 from pydantic import BaseModel
 
 from mongodb_models import Meeting, User, MeetingStatus
 from mongodb_auth_utils import get_current_user
+from mongodb_loaders import UserLoader, get_user_loader
+from mongodb_realtime import push_meeting_update, push_notification
+from delta_sync import make_etag, not_modified, encode_cursor, decode_cursor, cursor_datetime, is_expired, tagged_response, delta_response
+from mongodb_tombstones import record_deletion, latest_deletion, deleted_since, collection_version
+from mongodb_notification_writer import notification_writer
+from mongodb_unread import unread_notifications
 
 router = APIRouter()
 
@@ -59,18 +65,49 @@ async def create_meeting(
             is_read=False,
             created_at=datetime.utcnow()
         )
-        await notification.insert()
+        await notification_writer.write(notification)
+        unread_notifications.increment(notification.user_id)
+        await push_notification(notification)
+        await push_meeting_update(meeting, meeting_data.expert_id, "meeting_request", current_user)
     
     return {"message": "Meeting request sent successfully", "meeting_id": str(meeting.id)}
 
 @router.get("/")
-async def get_meetings(current_user: User = Depends(get_current_user)):
-    meetings = await Meeting.find({
+async def get_meetings(
+    request: Request,
+    since: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    user_loader: UserLoader = Depends(get_user_loader)
+):
+    """Meetings the user organizes or joins, or with `since` only what changed (see delta_sync)"""
+    user_id = str(current_user.id)
+    mine = {
         "$or": [
-            {"organizer_id": str(current_user.id)},
-            {"participants": str(current_user.id)}
+            {"organizer_id": user_id},
+            {"participants": user_id}
         ]
-    }).to_list()
+    }
+    count, newest = await collection_version(Meeting, mine, "updated_at")
+    newest_deletion = await latest_deletion(user_id, "meetings")
+    etag = make_etag("meetings", user_id, count, newest, newest_deletion)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    
+    query = dict(mine)
+    position = decode_cursor(since) if since else None
+    full = position is None or is_expired(position)
+    changed_since = None if full else cursor_datetime(position["c"])
+    if changed_since is not None:
+        query["updated_at"] = {"$gte": changed_since}
+    meetings = await Meeting.find(query).to_list()
+    
+    # Resolve every organizer and participant with a single query
+    users = await user_loader.load_many(
+        user_id
+        for meeting in meetings
+        for user_id in [meeting.organizer_id, *meeting.participants]
+    )
     
     # Populate organizer and participant information
     result_meetings = []
@@ -82,30 +119,22 @@ async def get_meetings(current_user: User = Depends(get_current_user)):
         meeting_dict["_id"] = str(meeting.id)  # Add both for compatibility
         
         # Add organizer information
-        if meeting.organizer_id:
-            organizer = await User.get(meeting.organizer_id)
-            if organizer:
-                meeting_dict["organizer"] = {
-                    "id": str(organizer.id),
-                    "full_name": organizer.full_name,
-                    "email": organizer.email
-                }
+        organizer = users.get(meeting.organizer_id)
+        if organizer:
+            meeting_dict["organizer"] = organizer
         
         # Add participant information
-        populated_participants = []
-        for participant_id in meeting.participants:
-            participant = await User.get(participant_id)
-            if participant:
-                populated_participants.append({
-                    "id": str(participant.id),
-                    "full_name": participant.full_name,
-                    "email": participant.email
-                })
-        meeting_dict["populated_participants"] = populated_participants
+        meeting_dict["populated_participants"] = [
+            users[participant_id] for participant_id in meeting.participants
+            if users.get(participant_id)
+        ]
         
         result_meetings.append(meeting_dict)
     
-    return result_meetings
+    if since is None:
+        return tagged_response(result_meetings, etag)
+    deleted = [] if full else await deleted_since(user_id, "meetings", position["d"])
+    return delta_response(result_meetings, deleted, encode_cursor(newest, newest_deletion), etag, full)
 
 @router.get("/{meeting_id}")
 async def get_meeting(meeting_id: str, current_user: User = Depends(get_current_user)):
@@ -188,7 +217,10 @@ async def update_meeting_status(
         is_read=False,
         created_at=datetime.utcnow()
     )
-    await notification.insert()
+    await notification_writer.write(notification)
+    unread_notifications.increment(notification.user_id)
+    await push_notification(notification)
+    await push_meeting_update(meeting, meeting.organizer_id, "meeting_status_update", current_user)
     
     return {"message": f"Meeting {new_status} successfully"}
 
@@ -211,4 +243,5 @@ async def delete_meeting(meeting_id: str, current_user: User = Depends(get_curre
         raise HTTPException(status_code=403, detail="Only meeting participants can delete this meeting")
     
     await meeting.delete()
+    await record_deletion("meetings", meeting.id, [meeting.organizer_id, *meeting.participants])
     return {"message": "Meeting deleted successfully"}
@@ -1,10 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from typing import List, Optional
 from datetime import datetime
 
 from mongodb_models import Notification, User, NotificationType
 from mongodb_auth_utils import get_current_user
-from pydantic import BaseModel
+from mongodb_realtime import push_notification, serialize_notification
+from delta_sync import make_etag, not_modified, encode_cursor, decode_cursor, cursor_datetime, is_expired, tagged_response, delta_response
+from mongodb_tombstones import record_deletion, record_deletions, latest_deletion, deleted_since, collection_version
+from mongodb_notification_writer import notification_writer, write_coalesced
+from mongodb_unread import unread_notifications
+from mongodb_loaders import UserLoader, get_user_loader
+from pydantic import BaseModel, Field
+from bson import ObjectId
 
 router = APIRouter()
 
@@ -16,6 +23,25 @@ class MessageNotificationRequest(BaseModel):
     receiver_id: str
     message_content: str
 
+class NotificationSelection(BaseModel):
+    """Notifications to mark read or delete at once: a list of ids and/or an inclusive id range"""
+    ids: List[str] = Field(default=[], max_length=500)
+    from_id: Optional[str] = None
+    to_id: Optional[str] = None
+
+def _read_update() -> dict:
+    # read_at starts the clock for the retention job (see notification_retention)
+    now = datetime.utcnow()
+    return {"$set": {"is_read": True, "read_at": now, "updated_at": now}}
+
+async def _mark_read(notification: Notification):
+    # Conditional update, so concurrent requests only count the notification once
+    result = await Notification.find_one({"_id": notification.id, "is_read": False}).update(
+        _read_update()
+    )
+    if result.modified_count:
+        unread_notifications.decrement(notification.user_id)
+
 @router.post("/")
 async def create_notification(
     user_id: str,
@@ -32,26 +58,37 @@ async def create_notification(
         action_url=action_url,
         created_at=datetime.utcnow()
     )
-    await notification.insert()
+    await notification_writer.write(notification)
+    unread_notifications.increment(notification.user_id)
+    await push_notification(notification)
     
     return {"message": "Notification created successfully"}
 
 @router.get("/")
-async def get_notifications(current_user: User = Depends(get_current_user)):
-    notifications = await Notification.find(
-        {"user_id": str(current_user.id)}
-    ).sort("-created_at").to_list()
+async def get_notifications(request: Request, since: Optional[str] = None, current_user: User = Depends(get_current_user)):
+    """All notifications, newest first, or with `since` only what changed (see delta_sync)"""
+    user_id = str(current_user.id)
+    count, newest = await collection_version(Notification, {"user_id": user_id}, "updated_at")
+    newest_deletion = await latest_deletion(user_id, "notifications")
+    etag = make_etag("notifications", user_id, count, newest, newest_deletion)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
     
-    # Convert to dict and ensure ID is included
-    result_notifications = []
-    for notification in notifications:
-        notification_dict = notification.dict()
-        notification_dict["id"] = str(notification.id)
-        notification_dict["timestamp"] = notification.created_at.isoformat()
-        notification_dict["read"] = notification.is_read
-        result_notifications.append(notification_dict)
+    query = {"user_id": user_id}
+    position = decode_cursor(since) if since else None
+    full = position is None or is_expired(position)
+    changed_since = None if full else cursor_datetime(position["c"])
+    if changed_since is not None:
+        query["updated_at"] = {"$gte": changed_since}
+    notifications = await Notification.find(query).sort("-created_at").to_list()
     
-    return result_notifications
+    # Same shape as the pushed "notification" events
+    items = [serialize_notification(notification) for notification in notifications]
+    if since is None:
+        return tagged_response(items, etag)
+    deleted = [] if full else await deleted_since(user_id, "notifications", position["d"])
+    return delta_response(items, deleted, encode_cursor(newest, newest_deletion), etag, full)
 
 @router.put("/{notification_id}/read")
 async def mark_notification_read(notification_id: str, current_user: User = Depends(get_current_user)):
@@ -74,16 +111,75 @@ async def mark_notification_read(notification_id: str, current_user: User = Depe
             detail="Access denied"
         )
     
-    notification.is_read = True
-    await notification.save()
+    await _mark_read(notification)
     
     return {"message": "Notification marked as read"}
 
 @router.put("/mark-all-read")
 async def mark_all_notifications_read(current_user: User = Depends(get_current_user)):
-    await Notification.find({"user_id": str(current_user.id)}).update({"$set": {"is_read": True}})
+    # Only unread ones, so already-read notifications keep their change stamp
+    result = await Notification.find({"user_id": str(current_user.id), "is_read": False}).update(
+        _read_update()
+    )
+    # By the documents changed rather than to zero, so a notification inserted meanwhile stays counted
+    if result.modified_count:
+        unread_notifications.decrement(str(current_user.id), amount=result.modified_count)
     return {"message": "All notifications marked as read"}
 
+def _object_id(value: str) -> ObjectId:
+    if not ObjectId.is_valid(value):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid notification ID"
+        )
+    return ObjectId(value)
+
+def _selected(selection: NotificationSelection) -> dict:
+    if not selection.ids and selection.from_id is None and selection.to_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Select notifications by ids or an id range"
+        )
+    conditions = []
+    if selection.ids:
+        conditions.append({"_id": {"$in": [_object_id(i) for i in selection.ids]}})
+    bounds = {}
+    if selection.from_id is not None:
+        bounds["$gte"] = _object_id(selection.from_id)
+    if selection.to_id is not None:
+        bounds["$lte"] = _object_id(selection.to_id)
+    if bounds:
+        conditions.append({"_id": bounds})
+    return conditions[0] if len(conditions) == 1 else {"$or": conditions}
+
+@router.put("/bulk-read")
+async def mark_notifications_read(selection: NotificationSelection, current_user: User = Depends(get_current_user)):
+    """Mark several notifications as read with one update_many"""
+    user_id = str(current_user.id)
+    result = await Notification.find({"user_id": user_id, "is_read": False, **_selected(selection)}).update(
+        _read_update()
+    )
+    if result.modified_count:
+        unread_notifications.decrement(user_id, amount=result.modified_count)
+    return {"message": f"{result.modified_count} notification(s) marked as read", "updated": result.modified_count}
+
+@router.post("/bulk-delete")
+async def delete_notifications(selection: NotificationSelection, current_user: User = Depends(get_current_user)):
+    """Delete several notifications with one delete_many"""
+    user_id = str(current_user.id)
+    query = {"user_id": user_id, **_selected(selection)}
+    ids = [document["_id"] for document in await Notification.get_motor_collection().find(query, {"_id": 1}).to_list(None)]
+    
+    if ids:
+        # Unread ones first, for the same reason as in delete_notification
+        unread = (await Notification.find({"_id": {"$in": ids}, "is_read": False}).delete()).deleted_count
+        if unread:
+            unread_notifications.decrement(user_id, amount=unread)
+        await Notification.find({"_id": {"$in": ids}}).delete()
+        await record_deletions("notifications", ids, user_id)
+    
+    return {"message": f"{len(ids)} notification(s) deleted", "deleted": len(ids)}
+
 @router.delete("/{notification_id}")
 async def delete_notification(notification_id: str, current_user: User = Depends(get_current_user)):
     if notification_id == "undefined" or not notification_id:
@@ -105,22 +201,31 @@ async def delete_notification(notification_id: str, current_user: User = Depends
             detail="Access denied"
         )
     
-    await notification.delete()
+    # Delete it while still unread first, so a concurrent mark-read can't decrement the count too
+    unread = (await Notification.find_one({"_id": notification.id, "is_read": False}).delete()).deleted_count
+    if unread:
+        unread_notifications.decrement(notification.user_id)
+    else:
+        await notification.delete()
+    await record_deletion("notifications", notification.id, [notification.user_id])
     return {"message": "Notification deleted"}
 
+@router.get("/unread-count")
+async def get_unread_count(current_user: User = Depends(get_current_user)):
+    """Count of unread notifications (from memory, see unread_counters)"""
+    return {"unread_count": await unread_notifications.total(str(current_user.id))}
+
 @router.post("/cleanup")
 async def cleanup_invalid_notifications(current_user: User = Depends(get_current_user)):
     """Clean up any notifications that might have invalid data"""
     try:
-        # Find all notifications for the user
-        notifications = await Notification.find({"user_id": str(current_user.id)}).to_list()
-        
-        cleaned_count = 0
-        for notification in notifications:
-            # Check if notification has all required fields
-            if not hasattr(notification, 'id') or not notification.id:
-                await notification.delete()
-                cleaned_count += 1
+        # One delete_many for documents missing a required field, instead of loading
+        # (and validating) every notification of the user
+        result = await Notification.get_motor_collection().delete_many({
+            "user_id": str(current_user.id),
+            "$or": [{field: None} for field in ("title", "message", "created_at")]
+        })
+        cleaned_count = result.deleted_count
         
         return {"message": f"Cleaned up {cleaned_count} invalid notifications"}
     except Exception as e:
@@ -129,12 +234,13 @@ async def cleanup_invalid_notifications(current_user: User = Depends(get_current
 @router.post("/video-call")
 async def send_video_call_notification(
     call_request: VideoCallRequest, 
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    user_loader: UserLoader = Depends(get_user_loader)
 ):
     """Send a video call notification to another user"""
     try:
-        # Get receiver info
-        receiver = await User.get(call_request.receiver_id)
+        # Check the receiver exists (summary projection, see mongodb_loaders)
+        receiver = await user_loader.load(call_request.receiver_id)
         if not receiver:
             raise HTTPException(status_code=404, detail="Receiver not found")
         
@@ -149,7 +255,9 @@ async def send_video_call_notification(
             is_read=False,
             created_at=datetime.utcnow()
         )
-        await notification.insert()
+        await notification_writer.write(notification)
+        unread_notifications.increment(notification.user_id)
+        await push_notification(notification)
         
         return {"message": "Video call notification sent", "notification_id": str(notification.id)}
     except Exception as e:
@@ -158,12 +266,13 @@ async def send_video_call_notification(
 @router.post("/message")
 async def send_message_notification(
     message_request: MessageNotificationRequest, 
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    user_loader: UserLoader = Depends(get_user_loader)
 ):
     """Send a message notification to another user"""
     try:
-        # Get receiver info
-        receiver = await User.get(message_request.receiver_id)
+        # Check the receiver exists (summary projection, see mongodb_loaders)
+        receiver = await user_loader.load(message_request.receiver_id)
         if not receiver:
             raise HTTPException(status_code=404, detail="Receiver not found")
         
@@ -178,7 +287,10 @@ async def send_message_notification(
             is_read=False,
             created_at=datetime.utcnow()
         )
-        await notification.insert()
+        notification, created = await write_coalesced(notification)
+        if created:
+            unread_notifications.increment(notification.user_id)
+        await push_notification(notification)
         
         return {"message": "Message notification sent", "notification_id": str(notification.id)}
     except Exception as e:
@@ -188,7 +300,8 @@ async def send_message_notification(
 async def respond_to_video_call(
     notification_id: str,
     response: dict,  # {"action": "accept" or "decline"}
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    user_loader: UserLoader = Depends(get_user_loader)
 ):
     """Respond to a video call notification"""
     try:
@@ -204,11 +317,10 @@ async def respond_to_video_call(
             raise HTTPException(status_code=400, detail="Invalid action")
         
         # Mark notification as read
-        notification.is_read = True
-        await notification.save()
+        await _mark_read(notification)
         
         # Send response notification to caller
-        caller = await User.get(notification.sender_id)
+        caller = await user_loader.load(notification.sender_id)
         if caller:
             if action == "accept":
                 # Send special call accepted notification that will auto-open video modal
@@ -232,7 +344,9 @@ async def respond_to_video_call(
                     is_read=False,
                     created_at=datetime.utcnow()
                 )
-            await response_notification.insert()
+            await notification_writer.write(response_notification)
+            unread_notifications.increment(response_notification.user_id)
+            await push_notification(response_notification)
         
         return {
             "message": f"Call {action}d successfully",
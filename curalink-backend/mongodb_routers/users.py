@@ -4,7 +4,7 @@ from datetime import datetime
 
 from mongodb_models import User
 from mongodb_schemas import UserResponse
-from mongodb_auth_utils import get_current_user
+from mongodb_auth_utils import get_current_user, user_cache
 
 router = APIRouter()
 
@@ -61,12 +61,14 @@ async def update_patient_profile(
             detail="Access denied. Patient role required."
         )
     
-    # Update user fields
+    # $set only the changed fields: current_user may be a cached copy up to
+    # USER_CACHE_TTL_SECONDS old, and saving it whole would revert newer writes
+    changes = {User.updated_at: datetime.utcnow()}
     if bio is not None:
-        current_user.bio = bio
+        changes[User.bio] = bio
     
-    current_user.updated_at = datetime.utcnow()
-    await current_user.save()
+    await current_user.set(changes)
+    user_cache.invalidate(str(current_user.id))
     
     return {"message": "Profile updated successfully"}
 
@@ -108,18 +110,19 @@ async def update_researcher_profile(
             detail="Access denied. Researcher role required."
         )
     
-    # Update user fields
+    # $set only the changed fields (current_user may be a stale cached copy)
+    changes = {User.updated_at: datetime.utcnow()}
     if specialty is not None:
-        current_user.specialization = specialty
+        changes[User.specialization] = specialty
     if institution is not None:
-        current_user.institution = institution
+        changes[User.institution] = institution
     if orcid_id is not None:
-        current_user.orcid_id = orcid_id
+        changes[User.orcid_id] = orcid_id
     if bio is not None:
-        current_user.bio = bio
+        changes[User.bio] = bio
     
-    current_user.updated_at = datetime.utcnow()
-    await current_user.save()
+    await current_user.set(changes)
+    user_cache.invalidate(str(current_user.id))
     
     return {"message": "Profile updated successfully"}
 
@@ -0,0 +1,64 @@
+"""
+Deletion records and collection versions for delta sync (MongoDB); see delta_sync.py.
+
+A delete endpoint calls record_deletion() right after the delete, so a client
+syncing with `since` learns which ids to drop. A TTL index removes records
+older than SYNC_TOMBSTONE_DAYS.
+"""
+
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+
+from mongodb_models import SyncTombstone
+
+async def record_deletion(collection: str, item_id, user_ids: Iterable[str]):
+    """Remember that `item_id` left `collection` for each of `user_ids`"""
+    now = datetime.utcnow()
+    tombstones = [
+        SyncTombstone(user_id=str(user_id), collection=collection, item_id=str(item_id), deleted_at=now)
+        for user_id in set(user_ids)
+    ]
+    if tombstones:
+        await SyncTombstone.insert_many(tombstones)
+
+async def record_deletions(collection: str, item_ids: Iterable, user_id: str):
+    """Remember that every one of `item_ids` left `user_id`'s `collection`"""
+    now = datetime.utcnow()
+    tombstones = [
+        SyncTombstone(user_id=user_id, collection=collection, item_id=str(item_id), deleted_at=now)
+        for item_id in item_ids
+    ]
+    if tombstones:
+        await SyncTombstone.insert_many(tombstones)
+
+async def record_item_deletions(collection: str, deletions: Iterable[Tuple[object, str]]):
+    """Remember each (item id, user id) pair of items that left `collection`"""
+    now = datetime.utcnow()
+    tombstones = [
+        SyncTombstone(user_id=str(user_id), collection=collection, item_id=str(item_id), deleted_at=now)
+        for item_id, user_id in deletions
+    ]
+    if tombstones:
+        await SyncTombstone.insert_many(tombstones)
+
+async def latest_deletion(user_id: str, collection: str) -> Optional[datetime]:
+    newest = await SyncTombstone.find(
+        {"user_id": user_id, "collection": collection}
+    ).sort("-deleted_at").limit(1).to_list()
+    return newest[0].deleted_at if newest else None
+
+async def deleted_since(user_id: str, collection: str, since: Optional[datetime]) -> List[str]:
+    """Ids deleted at or after `since` (every remembered deletion when None)"""
+    query = {"user_id": user_id, "collection": collection}
+    if since is not None:
+        query["deleted_at"] = {"$gte": since}
+    return [tombstone.item_id for tombstone in await SyncTombstone.find(query).sort("deleted_at").to_list()]
+
+async def collection_version(model, query: dict, field: str) -> Tuple[int, Optional[datetime]]:
+    """(matching documents, newest value of `field`) with one aggregation"""
+    result = await model.find(query).aggregate([
+        {"$group": {"_id": None, "count": {"$sum": 1}, "newest": {"$max": f"${field}"}}}
+    ]).to_list()
+    if not result:
+        return 0, None
+    return result[0]["count"], result[0]["newest"]
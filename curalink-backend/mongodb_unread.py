@@ -0,0 +1,31 @@
+"""
+Unread notification and chat counters (MongoDB); see unread_counters.py.
+
+    unread_notifications   user id -> {None: unread notifications}
+    unread_messages        user id -> {sender id: unread messages from them}
+
+Routers adjust them right after the write they describe.
+"""
+
+from typing import Dict, List
+
+from mongodb_models import ChatMessage, Notification
+from unread_counters import UnreadCounters
+
+async def _count_notifications(user_ids: List[str]) -> Dict[str, dict]:
+    rows = await Notification.find({"user_id": {"$in": user_ids}, "is_read": False}).aggregate([
+        {"$group": {"_id": "$user_id", "count": {"$sum": 1}}}
+    ]).to_list()
+    return {row["_id"]: {None: row["count"]} for row in rows}
+
+async def _count_messages(user_ids: List[str]) -> Dict[str, dict]:
+    rows = await ChatMessage.find({"receiver_id": {"$in": user_ids}, "is_read": False}).aggregate([
+        {"$group": {"_id": {"receiver": "$receiver_id", "sender": "$sender_id"}, "count": {"$sum": 1}}}
+    ]).to_list()
+    counts: Dict[str, dict] = {}
+    for row in rows:
+        counts.setdefault(row["_id"]["receiver"], {})[row["_id"]["sender"]] = row["count"]
+    return counts
+
+unread_notifications = UnreadCounters("unread_notifications", _count_notifications)
+unread_messages = UnreadCounters("unread_messages", _count_messages)
@@ -0,0 +1,224 @@
+"""
+Retention for notifications, the fastest-growing data.
+
+- Read notifications are removed NOTIFICATION_READ_TTL_DAYS after they were
+  read.
+- Each user keeps at most NOTIFICATION_MAX_PER_USER notifications; the oldest
+  beyond that are removed, read or not.
+- With NOTIFICATION_ARCHIVE on, every notification is also written to
+  notification_archive when it is sent (see the notification writers), so the
+  live table can be trimmed freely while a compliance copy is kept for
+  NOTIFICATION_ARCHIVE_DAYS (0 keeps it forever): a TTL index in MongoDB, the
+  purge job on SQL.
+
+The purge job removes NOTIFICATION_PURGE_BATCH notifications at a time and
+writes a delta-sync tombstone for each one with the batch, so clients
+syncing with `since` drop them like any other deletion. (That is why MongoDB
+doesn't expire read notifications with a TTL index: the server would delete
+them without tombstones.) Both apps run it every
+NOTIFICATION_RETENTION_INTERVAL_MINUTES; it can also be run by hand:
+
+    python notification_retention.py           # SQL database
+    python notification_retention.py --mongo   # MongoDB
+
+Unread counters pick up removed unread notifications at their next
+reconciliation.
+"""
+
+import asyncio
+import os
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Awaitable, Callable, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from metrics import Counter
+
+load_dotenv()
+
+NOTIFICATION_READ_TTL_DAYS = int(os.getenv("NOTIFICATION_READ_TTL_DAYS", "30"))
+NOTIFICATION_MAX_PER_USER = int(os.getenv("NOTIFICATION_MAX_PER_USER", "500"))
+NOTIFICATION_ARCHIVE = os.getenv("NOTIFICATION_ARCHIVE", "true").lower() in ("1", "true", "yes")
+NOTIFICATION_ARCHIVE_DAYS = int(os.getenv("NOTIFICATION_ARCHIVE_DAYS", "0"))
+NOTIFICATION_PURGE_BATCH = int(os.getenv("NOTIFICATION_PURGE_BATCH", "1000"))
+NOTIFICATION_RETENTION_INTERVAL_MINUTES = float(os.getenv("NOTIFICATION_RETENTION_INTERVAL_MINUTES", "60"))
+
+PURGED = Counter("notifications_purged_total", "Notifications removed by the retention job", ["reason"])
+
+def _days_ago(days: int) -> datetime:
+    return datetime.utcnow() - timedelta(days=days)
+
+# SQL: each batch function removes up to NOTIFICATION_PURGE_BATCH rows and returns how many
+
+async def _delete_notifications(db: AsyncSession, condition) -> int:
+    from models import Notification
+    from tombstones import record_item_deletions
+
+    # MySQL can't DELETE ... LIMIT with a subquery on the same table, so select the ids first
+    rows = (await db.execute(
+        select(Notification.id, Notification.user_id).where(condition).limit(NOTIFICATION_PURGE_BATCH)
+    )).all()
+    if rows:
+        await db.execute(delete(Notification).where(Notification.id.in_([row.id for row in rows])))
+        await record_item_deletions(db, "notifications", [(row.id, row.user_id) for row in rows])
+    return len(rows)
+
+async def _expired_read_batch(db: AsyncSession) -> int:
+    from models import Notification
+    return await _delete_notifications(db, (Notification.read == True) &
+                                       (Notification.read_at < _days_ago(NOTIFICATION_READ_TTL_DAYS)))
+
+async def _users_over_cap(db: AsyncSession) -> list:
+    from models import Notification
+    return (await db.scalars(
+        select(Notification.user_id).group_by(Notification.user_id)
+        .having(func.count() > NOTIFICATION_MAX_PER_USER)
+    )).all()
+
+async def _over_cap_batch(db: AsyncSession, user_id: int) -> int:
+    from models import Notification
+    # Newest first, so everything past the cap is the user's oldest
+    over_cap = select(Notification.id).where(Notification.user_id == user_id) \
+        .order_by(Notification.id.desc()).offset(NOTIFICATION_MAX_PER_USER).limit(NOTIFICATION_PURGE_BATCH)
+    ids = (await db.scalars(over_cap)).all()
+    return await _delete_notifications(db, Notification.id.in_(ids)) if ids else 0
+
+async def _expired_archive_batch(db: AsyncSession) -> int:
+    from models import NotificationArchive
+    # The archive isn't synced to clients, so no tombstones here
+    ids = (await db.scalars(select(NotificationArchive.id).where(
+        NotificationArchive.archived_at < _days_ago(NOTIFICATION_ARCHIVE_DAYS)
+    ).limit(NOTIFICATION_PURGE_BATCH))).all()
+    if ids:
+        await db.execute(delete(NotificationArchive).where(NotificationArchive.id.in_(ids)))
+    return len(ids)
+
+async def _in_batches(engine, batch) -> int:
+    removed = 0
+    while True:
+        # One transaction per batch: the deletes and their tombstones commit together
+        async with AsyncSession(engine) as db, db.begin():
+            count = await batch(db)
+        removed += count
+        if count < NOTIFICATION_PURGE_BATCH:
+            return removed
+
+async def purge_sql_notifications(engine) -> dict:
+    """Apply the retention rules to the SQL database; returns the rows removed per reason"""
+    removed = {"read_expired": 0, "over_cap": 0, "archive_expired": 0}
+    if NOTIFICATION_READ_TTL_DAYS > 0:
+        removed["read_expired"] = await _in_batches(engine, _expired_read_batch)
+    if NOTIFICATION_MAX_PER_USER > 0:
+        async with AsyncSession(engine) as db:
+            user_ids = await _users_over_cap(db)
+        for user_id in user_ids:
+            removed["over_cap"] += await _in_batches(engine, partial(_over_cap_batch, user_id=user_id))
+    if NOTIFICATION_ARCHIVE_DAYS > 0:
+        removed["archive_expired"] = await _in_batches(engine, _expired_archive_batch)
+    _count(removed)
+    return removed
+
+async def _delete_mongo_batch(notifications, query: dict) -> int:
+    from mongodb_tombstones import record_item_deletions
+
+    documents = await notifications.find(query, {"_id": 1, "user_id": 1}).limit(NOTIFICATION_PURGE_BATCH).to_list(None)
+    if documents:
+        # Tombstones first: a client dropping a notification that is about to go is harmless
+        await record_item_deletions("notifications", [(doc["_id"], doc["user_id"]) for doc in documents])
+        await notifications.delete_many({"_id": {"$in": [doc["_id"] for doc in documents]}})
+    return len(documents)
+
+async def purge_mongo_notifications(database) -> dict:
+    """Apply the read TTL and per-user cap to MongoDB (a TTL index expires the archive); returns the documents removed"""
+    from mongodb_models import Notification
+
+    notifications = database[Notification.Settings.name]
+    removed = {"read_expired": 0, "over_cap": 0}
+    if NOTIFICATION_READ_TTL_DAYS > 0:
+        expired = {"is_read": True, "read_at": {"$lt": _days_ago(NOTIFICATION_READ_TTL_DAYS)}}
+        while True:
+            count = await _delete_mongo_batch(notifications, expired)
+            removed["read_expired"] += count
+            if count < NOTIFICATION_PURGE_BATCH:
+                break
+    if NOTIFICATION_MAX_PER_USER > 0:
+        over_cap = await notifications.aggregate([
+            {"$group": {"_id": "$user_id", "count": {"$sum": 1}}},
+            {"$match": {"count": {"$gt": NOTIFICATION_MAX_PER_USER}}}
+        ]).to_list(None)
+        for row in over_cap:
+            while True:
+                # _id order is creation order, so everything past the cap is the user's oldest
+                ids = [doc["_id"] async for doc in notifications.find(
+                    {"user_id": row["_id"]}, {"_id": 1}
+                ).sort("_id", -1).skip(NOTIFICATION_MAX_PER_USER).limit(NOTIFICATION_PURGE_BATCH)]
+                count = await _delete_mongo_batch(notifications, {"_id": {"$in": ids}}) if ids else 0
+                removed["over_cap"] += count
+                if count < NOTIFICATION_PURGE_BATCH:
+                    break
+    _count(removed)
+    return removed
+
+def _count(removed: dict):
+    for reason, count in removed.items():
+        if count:
+            PURGED.labels(reason=reason).inc(count)
+
+class RetentionJob:
+    """Runs a purge function every NOTIFICATION_RETENTION_INTERVAL_MINUTES in the background"""
+
+    def __init__(self, purge: Callable[[], Awaitable[dict]]):
+        self._purge = purge
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, interval_minutes: float = NOTIFICATION_RETENTION_INTERVAL_MINUTES):
+        if self._task is None and interval_minutes > 0:
+            self._task = asyncio.get_running_loop().create_task(self._run_forever(interval_minutes * 60))
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run_forever(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                removed = await self._purge()
+                if any(removed.values()):
+                    print(f"🧹 Notification retention removed {removed}")
+            except Exception as e:
+                print(f"❌ Notification retention failed: {e}")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Apply notification retention (read TTL, per-user cap, archive expiry)")
+    parser.add_argument("--mongo", action="store_true", help="purge the MongoDB collections instead of SQL")
+    args = parser.parse_args()
+
+    if args.mongo:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        from mongodb_database import MONGODB_URL
+
+        async def run():
+            client = AsyncIOMotorClient(MONGODB_URL)
+            try:
+                return await purge_mongo_notifications(client.get_default_database())
+            finally:
+                client.close()
+    else:
+        from database import engine
+
+        async def run():
+            return await purge_sql_notifications(engine)
+
+    removed = asyncio.run(run())
+    print(f"✅ Removed {sum(removed.values())} notification(s): {removed}")
@@ -0,0 +1,45 @@
+"""
+Batched notification inserts (SQL); see batch_writer.py.
+
+One session and one commit per batch. The generated ids are needed for the
+WebSocket push, so rows go through the ORM: SQLAlchemy sends a multi-row
+INSERT ... RETURNING where it can match the returned ids to the rows, and
+one INSERT per row otherwise (SQLite, MySQL). Either way the batch shares a
+single transaction, which is where the per-notification cost was.
+
+With NOTIFICATION_ARCHIVE on, the compliance copies are inserted in the same
+transaction (see notification_retention).
+
+A notification that belongs to a request's own transaction (a meeting and
+its notification must commit or roll back together) skips the batching:
+add_notifications() puts it in the caller's session instead.
+"""
+
+from datetime import datetime
+from typing import List
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from batch_writer import BatchWriter
+from database import SessionLocal
+from models import Notification, NotificationArchive
+from notification_retention import NOTIFICATION_ARCHIVE
+
+async def add_notifications(db: AsyncSession, notifications: List[Notification]):
+    """Add notifications and their archive copies to `db`'s transaction; the caller commits"""
+    db.add_all(notifications)
+    if NOTIFICATION_ARCHIVE:
+        await db.flush()  # Assigns the ids the archive rows point to
+        now = datetime.utcnow()
+        await db.execute(insert(NotificationArchive), [{
+            "notification_id": n.id, "user_id": n.user_id, "type": n.type, "title": n.title, "message": n.message,
+            "from_user": n.from_user, "meeting_id": n.meeting_id, "created_at": n.created_at, "archived_at": now
+        } for n in notifications])
+
+async def _insert_notifications(notifications: List[Notification]):
+    async with SessionLocal() as db:
+        await add_notifications(db, notifications)
+        await db.commit()
+
+notification_writer = BatchWriter("notifications", _insert_notifications)
@@ -0,0 +1,92 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+from metrics import Counter, Gauge, Histogram
+
+HASH_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HASH_QUEUE_DEPTH = Gauge("password_hash_queue_depth", "Password hashes waiting for a free worker")
+HASH_IN_FLIGHT = Gauge("password_hash_in_flight", "Password hashes queued or running")
+HASH_WORKERS = Gauge("password_hash_workers", "Size of the password hashing pool")
+HASH_QUEUE_WAIT = Histogram(
+    "password_hash_queue_wait_seconds", "Time a password hash waited for a worker", buckets=HASH_BUCKETS
+)
+HASH_DURATION = Histogram("password_hash_duration_seconds", "Time spent hashing or verifying a password", buckets=HASH_BUCKETS)
+HASH_REHASHED = Counter("password_hash_rehashed_total", "Hashes upgraded to the current cost settings on login")
+
+class PasswordHasher:
+    """Runs a passlib CryptContext on a bounded worker pool instead of the event loop.
+
+    bcrypt and hashlib's pbkdf2 both release the GIL while hashing, so a
+    small thread pool gives real parallelism without the cost of a process
+    pool. The pool size caps how many hashes run at once; excess requests
+    queue and the time they wait is recorded, in stats() and on /metrics.
+    """
+
+    def __init__(self, context: CryptContext, max_workers: int = 2):
+        self.context = context
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hash")
+        self.submitted = 0
+        self.started = 0
+        self.completed = 0
+        self.rehashed = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.hash_time_total = 0.0
+        HASH_WORKERS.set(max_workers)
+        HASH_QUEUE_DEPTH.set_function(lambda: self.submitted - self.started)
+        HASH_IN_FLIGHT.set_function(lambda: self.submitted - self.completed)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(self.context.verify, password, hashed_password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Verify a password; if the hash uses outdated cost settings also return a fresh hash"""
+        valid, new_hash = await self._run(self.context.verify_and_update, password, hashed_password)
+        if new_hash:
+            self.rehashed += 1
+            HASH_REHASHED.inc()
+        return valid, new_hash
+
+    async def _run(self, fn, *args):
+        submitted_at = time.perf_counter()
+        self.submitted += 1
+
+        def timed():
+            started_at = time.perf_counter()
+            self.started += 1
+            try:
+                return fn(*args)
+            finally:
+                wait = started_at - submitted_at
+                duration = time.perf_counter() - started_at
+                self.queue_wait_total += wait
+                self.queue_wait_max = max(self.queue_wait_max, wait)
+                self.hash_time_total += duration
+                HASH_QUEUE_WAIT.observe(wait)
+                HASH_DURATION.observe(duration)
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, timed)
+        finally:
+            self.completed += 1
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "queued": self.submitted - self.started,
+            "in_flight": self.submitted - self.completed,
+            "completed": self.completed,
+            "rehashed": self.rehashed,
+            "queue_wait_avg_ms": round(self.queue_wait_total / self.completed * 1000, 2) if self.completed else 0.0,
+            "queue_wait_max_ms": round(self.queue_wait_max * 1000, 2),
+            "hash_time_avg_ms": round(self.hash_time_total / self.completed * 1000, 2) if self.completed else 0.0
+        }
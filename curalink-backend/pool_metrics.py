@@ -0,0 +1,129 @@
+"""
+Connection-pool instrumentation for the SQLAlchemy engine and the Motor client.
+
+Both pools report the same metrics, labelled pool="sql" or pool="mongo":
+
+    db_pool_checkouts_total               connections handed out
+    db_pool_checkout_wait_seconds         time spent waiting for a connection
+    db_pool_checkout_failures_total       checkouts that failed, by reason (timeout, ...)
+    db_pool_connections_created_total     new physical connections
+    db_pool_checked_out                   connections in use right now
+    db_pool_size / db_pool_overflow       configured size and overflow in use (SQL only)
+
+A high wait time with checked_out at the limit means pool starvation; low
+wait with slow requests points at the queries themselves.
+"""
+
+import threading
+import time
+
+from pymongo import monitoring
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from metrics import Counter, Gauge, Histogram
+
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CHECKOUTS = Counter("db_pool_checkouts_total", "Connections checked out of the pool", ["pool"])
+CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection", ["pool"], buckets=POOL_WAIT_BUCKETS
+)
+CHECKOUT_FAILURES = Counter("db_pool_checkout_failures_total", "Failed connection checkouts", ["pool", "reason"])
+CONNECTIONS_CREATED = Counter("db_pool_connections_created_total", "Physical connections opened", ["pool"])
+CHECKED_OUT = Gauge("db_pool_checked_out", "Connections currently in use", ["pool"])
+POOL_SIZE = Gauge("db_pool_size", "Configured number of persistent connections", ["pool"])
+POOL_OVERFLOW = Gauge("db_pool_overflow", "Connections open beyond the pool size", ["pool"])
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that times every checkout, including the wait for a free slot"""
+
+    def _do_get(self):
+        started_at = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            CHECKOUT_FAILURES.labels(pool="sql", reason="timeout").inc()
+            raise
+        except Exception:
+            CHECKOUT_FAILURES.labels(pool="sql", reason="connection_error").inc()
+            raise
+        CHECKOUT_WAIT.labels(pool="sql").observe(time.perf_counter() - started_at)
+        return connection
+
+def instrument_sql_engine(engine):
+    """Attach pool metrics to an (async) SQLAlchemy engine"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        CHECKOUTS.labels(pool="sql").inc()
+
+    @event.listens_for(sync_engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        CONNECTIONS_CREATED.labels(pool="sql").inc()
+
+    # The pool object is replaced on dispose(), so read it at scrape time
+    CHECKED_OUT.labels(pool="sql").set_function(lambda: sync_engine.pool.checkedout())
+    if isinstance(sync_engine.pool, AsyncAdaptedQueuePool):
+        POOL_SIZE.labels(pool="sql").set_function(lambda: sync_engine.pool.size())
+        POOL_OVERFLOW.labels(pool="sql").set_function(lambda: max(sync_engine.pool.overflow(), 0))
+
+class MongoPoolListener(monitoring.ConnectionPoolListener):
+    """pymongo CMAP listener feeding the pool metrics for the Motor client"""
+
+    def __init__(self):
+        # Checkouts are synchronous within a driver thread, so the start time
+        # can be matched to the result by (server, thread)
+        self._started = {}
+        self._lock = threading.Lock()
+
+    def _start_key(self, event):
+        return event.address, threading.get_ident()
+
+    def _wait_time(self, event):
+        with self._lock:
+            started_at = self._started.pop(self._start_key(event), None)
+        duration = getattr(event, "duration", None)  # Reported by pymongo >= 4.7
+        if duration is not None:
+            return duration
+        return time.perf_counter() - started_at if started_at is not None else None
+
+    def connection_check_out_started(self, event):
+        with self._lock:
+            self._started[self._start_key(event)] = time.perf_counter()
+
+    def connection_checked_out(self, event):
+        CHECKOUTS.labels(pool="mongo").inc()
+        CHECKED_OUT.labels(pool="mongo").inc()
+        wait = self._wait_time(event)
+        if wait is not None:
+            CHECKOUT_WAIT.labels(pool="mongo").observe(wait)
+
+    def connection_check_out_failed(self, event):
+        self._wait_time(event)
+        CHECKOUT_FAILURES.labels(pool="mongo", reason=event.reason).inc()
+
+    def connection_checked_in(self, event):
+        CHECKED_OUT.labels(pool="mongo").dec()
+
+    def connection_created(self, event):
+        CONNECTIONS_CREATED.labels(pool="mongo").inc()
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
@@ -0,0 +1,172 @@
+"""
+Query-plan auditor for the hot SQL queries.
+
+Every query the routers run on a hot path is registered here with
+representative parameters. audit_query_plans() asks the database for each
+plan (EXPLAIN QUERY PLAN on SQLite, EXPLAIN on MySQL) and reports the ones
+that fall back to a full table scan, so a missing or unusable index fails the
+audit instead of surfacing as a slow endpoint in production. Plans from other
+dialects are not read; their queries are reported as skipped, never as passing.
+
+Run against a throwaway SQLite database:   python query_audit.py
+Run against the configured database:       python query_audit.py --database-url "$DATABASE_URL"
+
+tests/test_query_audit.py runs the same audit on SQLite with the test suite.
+"""
+
+import re
+import sys
+from typing import List, Optional
+
+from sqlalchemy import select, text, or_, and_
+
+from models import ChatMessage, Notification, Favorite, ForumPost, MeetingRequest
+
+HOT_QUERIES = {}
+
+def hot_query(name):
+    """Register a function returning a representative statement for a hot query"""
+    def register(build):
+        HOT_QUERIES[name] = build
+        return build
+    return register
+
+@hot_query("chat.conversation")
+def _chat_conversation():
+    return select(ChatMessage).where(or_(
+        and_(ChatMessage.sender_id == 1, ChatMessage.receiver_id == 2),
+        and_(ChatMessage.sender_id == 2, ChatMessage.receiver_id == 1)
+    )).order_by(ChatMessage.created_at.asc())
+
+@hot_query("chat.unread_from_sender")
+def _chat_unread_from_sender():
+    return select(ChatMessage.id).where(
+        ChatMessage.sender_id == 2,
+        ChatMessage.receiver_id == 1,
+        ChatMessage.read == False
+    )
+
+@hot_query("chat.partners")
+def _chat_partners():
+    return select(ChatMessage.receiver_id).where(ChatMessage.sender_id == 1).distinct()
+
+@hot_query("notifications.list")
+def _notifications_list():
+    return select(Notification).where(
+        Notification.user_id == 1
+    ).order_by(Notification.created_at.desc())
+
+@hot_query("notifications.unread")
+def _notifications_unread():
+    return select(Notification.id).where(
+        Notification.user_id == 1,
+        Notification.read == False
+    )
+
+@hot_query("favorites.lookup")
+def _favorites_lookup():
+    return select(Favorite).where(
+        Favorite.user_id == 1,
+        Favorite.item_type == "trial",
+        Favorite.item_id == "NCT00000000"
+    )
+
+@hot_query("forums.top_level_posts")
+def _forums_top_level_posts():
+    return select(ForumPost).where(
+        ForumPost.forum_id == 1,
+        ForumPost.parent_id == None
+    )
+
+@hot_query("forums.thread_subtree")
+def _forums_thread_subtree():
+    low, high = ForumPost.subtree_bounds(ForumPost.build_path(None, 1))
+    return select(ForumPost).where(
+        ForumPost.forum_id == 1,
+        ForumPost.path >= low,
+        ForumPost.path < high
+    ).order_by(ForumPost.path.asc())
+
+@hot_query("meetings.received")
+def _meetings_received():
+    return select(MeetingRequest).where(MeetingRequest.expert_id == 1)
+
+@hot_query("meetings.pending_between")
+def _meetings_pending_between():
+    return select(MeetingRequest).where(
+        MeetingRequest.requester_id == 1,
+        MeetingRequest.expert_id == 2,
+        MeetingRequest.status == "pending"
+    )
+
+_SQLITE_FULL_SCAN = re.compile(r"^SCAN (TABLE )?(?P<table>\w+)$")
+
+# Dialects whose plans find_full_scans can read
+AUDITED_DIALECTS = ("sqlite", "mysql")
+
+def find_full_scans(connection, statement) -> Optional[List[str]]:
+    """Return the tables a statement reads with a full scan; None if the dialect's plans can't be read"""
+    dialect = connection.dialect.name
+    if dialect not in AUDITED_DIALECTS:
+        return None
+    sql = str(statement.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True}))
+
+    if dialect == "sqlite":
+        rows = connection.execute(text(f"EXPLAIN QUERY PLAN {sql}")).fetchall()
+        scans = []
+        for row in rows:
+            match = _SQLITE_FULL_SCAN.match(row[-1].strip())
+            if match:
+                scans.append(match.group("table"))
+        return scans
+
+    if dialect == "mysql":
+        rows = connection.execute(text(f"EXPLAIN {sql}")).mappings().fetchall()
+        return [row["table"] for row in rows if row["type"] == "ALL"]
+
+def audit_query_plans(connection, queries=None):
+    """Map each registered hot query that does a full scan to the scanned tables (None: not audited)"""
+    failures = {}
+    for name, build in (queries or HOT_QUERIES).items():
+        scans = find_full_scans(connection, build())
+        if scans is None or scans:
+            failures[name] = scans
+    return failures
+
+def assert_no_full_scans(connection, queries=None):
+    """Raise AssertionError if any registered hot query does a full table scan or could not be audited"""
+    failures = audit_query_plans(connection, queries)
+    if any(scans is None for scans in failures.values()):
+        raise AssertionError(f"Query plans can't be audited on {connection.dialect.name} "
+                             f"(supported: {', '.join(AUDITED_DIALECTS)})")
+    if failures:
+        details = "; ".join(f"{name} scans {', '.join(tables)}" for name, tables in failures.items())
+        raise AssertionError(f"Hot queries without a usable index: {details}")
+
+if __name__ == "__main__":
+    import argparse
+    from sqlalchemy import create_engine
+    from migrations import run_migrations
+
+    parser = argparse.ArgumentParser(description="Fail if a hot query does a full table scan")
+    parser.add_argument("--database-url", default="sqlite://", help="database to audit (default: in-memory SQLite)")
+    args = parser.parse_args()
+
+    audit_engine = create_engine(args.database_url)
+    with audit_engine.begin() as connection:
+        if args.database_url == "sqlite://":
+            run_migrations(connection)
+        failures = audit_query_plans(connection)
+
+    skipped = [name for name, scans in failures.items() if scans is None]
+    for name in HOT_QUERIES:
+        if name in skipped:
+            status = f"⏭️  skipped ({audit_engine.dialect.name} plans are not audited)"
+        elif name in failures:
+            status = f"❌ full scan of {', '.join(failures[name])}"
+        else:
+            status = "✅ indexed"
+        print(f"{name}: {status}")
+
+    # 2: nothing was checked, which must not read as a pass
+    sys.exit(1 if len(failures) > len(skipped) else 2 if skipped else 0)
@@ -0,0 +1,272 @@
+"""
+Slow-query profiler with per-route attribution.
+
+Every SQL statement (SQLAlchemy cursor events) and MongoDB command (pymongo
+command monitoring) is timed, reduced to its shape (literals and parameter
+values removed) and attributed to the FastAPI route that issued it:
+
+- db_query_duration_seconds{backend} histogram in /metrics
+- a top-N table of the slowest executions and of the statement shapes that
+  consume the most total time, per tumbling window
+- N+1 detection: a request that runs the same statement shape
+  QUERY_PROFILER_N_PLUS_ONE_THRESHOLD or more times is reported
+
+GET /debug/queries returns profiler.report().
+"""
+
+import contextvars
+import heapq
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from pymongo import monitoring
+from sqlalchemy import event
+
+from metrics import Counter, Histogram
+
+QUERY_DURATION = Histogram("db_query_duration_seconds", "Database statement latency", ["backend"])
+N_PLUS_ONE = Counter("db_n_plus_one_requests_total", "Requests that repeated one statement shape many times", ["route"])
+
+class RequestQueryLog:
+    """Statements issued while handling one request"""
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.shapes: Dict[Tuple[str, str], int] = {}
+        self.query_count = 0
+        self.query_time = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def route(self) -> str:
+        # The router stores the matched route in the scope before the
+        # endpoint (and its dependencies) run
+        route = self.scope.get("route")
+        path = getattr(route, "path", None) or "unmatched"
+        return f"{self.scope.get('method', 'WS')} {path}"
+
+    def add(self, backend: str, shape: str, duration: float):
+        with self._lock:
+            key = (backend, shape)
+            self.shapes[key] = self.shapes.get(key, 0) + 1
+            self.query_count += 1
+            self.query_time += duration
+
+_current_request: contextvars.ContextVar[Optional[RequestQueryLog]] = contextvars.ContextVar(
+    "query_profiler_request", default=None
+)
+
+class QueryProfiler:
+    """Aggregates timings per (backend, route, statement shape)"""
+
+    def __init__(self, slow_threshold_ms: float = 100, top_n: int = 20,
+                 n_plus_one_threshold: int = 5, window_seconds: float = 900, max_shapes: int = 2000):
+        self.slow_threshold = slow_threshold_ms / 1000
+        self.top_n = top_n
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.window_seconds = window_seconds
+        self.max_shapes = max_shapes
+        self._lock = threading.Lock()
+        self._reset_window()
+        self._n_plus_one: Dict[Tuple[str, str, str], dict] = {}
+
+    def _reset_window(self):
+        self.window_started_at = time.time()
+        self._slowest = []  # Min-heap of (duration, sequence, entry)
+        self._shapes: Dict[Tuple[str, str, str], list] = {}
+        self._sequence = 0
+
+    def record(self, backend: str, statement: str, duration: float):
+        QUERY_DURATION.labels(backend=backend).observe(duration)
+        request = _current_request.get()
+        route = request.route if request else "background"
+        if request:
+            request.add(backend, statement, duration)
+
+        with self._lock:
+            if time.time() - self.window_started_at > self.window_seconds:
+                self._reset_window()
+
+            key = (backend, route, statement)
+            stats = self._shapes.get(key)
+            if stats is None:
+                if len(self._shapes) >= self.max_shapes:
+                    # Forget the cheapest shape to stay bounded
+                    del self._shapes[min(self._shapes, key=lambda k: self._shapes[k][1])]
+                stats = self._shapes[key] = [0, 0.0, 0.0]
+            stats[0] += 1
+            stats[1] += duration
+            stats[2] = max(stats[2], duration)
+
+            if duration >= self.slow_threshold:
+                self._sequence += 1
+                entry = {
+                    "backend": backend,
+                    "route": route,
+                    "statement": statement,
+                    "duration_ms": round(duration * 1000, 2),
+                    "at": time.time()
+                }
+                if len(self._slowest) < self.top_n:
+                    heapq.heappush(self._slowest, (duration, self._sequence, entry))
+                elif duration > self._slowest[0][0]:
+                    heapq.heapreplace(self._slowest, (duration, self._sequence, entry))
+
+    def finish_request(self, request: RequestQueryLog):
+        """Flag statement shapes a request repeated often enough to be an N+1"""
+        repeated = [
+            (backend, shape, count) for (backend, shape), count in request.shapes.items()
+            if count >= self.n_plus_one_threshold
+        ]
+        if not repeated:
+            return
+
+        route = request.route
+        N_PLUS_ONE.labels(route=route).inc()
+        with self._lock:
+            for backend, shape, count in repeated:
+                key = (backend, route, shape)
+                finding = self._n_plus_one.setdefault(key, {
+                    "backend": backend, "route": route, "statement": shape,
+                    "requests": 0, "max_per_request": 0
+                })
+                finding["requests"] += 1
+                finding["max_per_request"] = max(finding["max_per_request"], count)
+                finding["last_seen"] = time.time()
+                if finding["requests"] == 1:
+                    print(f"⚠️  Possible N+1 in {route}: {count}x {backend} {shape[:200]}")
+
+    def report(self) -> dict:
+        with self._lock:
+            slowest = [entry for _, _, entry in sorted(self._slowest, reverse=True)]
+            by_total_time = sorted(self._shapes.items(), key=lambda item: item[1][1], reverse=True)[:self.top_n]
+            n_plus_one = sorted(self._n_plus_one.values(), key=lambda f: f["max_per_request"], reverse=True)
+            window_started_at = self.window_started_at
+
+        return {
+            "window_started_at": window_started_at,
+            "slow_threshold_ms": self.slow_threshold * 1000,
+            "slowest": slowest,
+            "top_by_total_time": [
+                {
+                    "backend": backend,
+                    "route": route,
+                    "statement": statement,
+                    "calls": calls,
+                    "total_ms": round(total * 1000, 2),
+                    "avg_ms": round(total / calls * 1000, 2),
+                    "max_ms": round(maximum * 1000, 2)
+                }
+                for (backend, route, statement), (calls, total, maximum) in by_total_time
+            ],
+            "n_plus_one": n_plus_one[:self.top_n]
+        }
+
+    def reset(self):
+        with self._lock:
+            self._reset_window()
+            self._n_plus_one.clear()
+
+profiler = QueryProfiler(
+    slow_threshold_ms=float(os.getenv("QUERY_PROFILER_SLOW_MS", "100")),
+    top_n=int(os.getenv("QUERY_PROFILER_TOP_N", "20")),
+    n_plus_one_threshold=int(os.getenv("QUERY_PROFILER_N_PLUS_ONE_THRESHOLD", "5")),
+    window_seconds=float(os.getenv("QUERY_PROFILER_WINDOW_SECONDS", "900"))
+)
+
+class QueryProfilerMiddleware:
+    """ASGI middleware that scopes recorded statements to the current request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request = RequestQueryLog(scope)
+        token = _current_request.set(request)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current_request.reset(token)
+            profiler.finish_request(request)
+
+# Statement normalization
+
+_WHITESPACE = re.compile(r"\s+")
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\((?:\s*(?:\?|%s|:\w+|\$\d+)\s*,)+\s*(?:\?|%s|:\w+|\$\d+)\s*\)")
+
+def normalize_sql(statement: str) -> str:
+    """Reduce a SQL statement to its shape: no literals, IN-lists collapsed"""
+    shape = _WHITESPACE.sub(" ", statement).strip()
+    shape = _STRING_LITERAL.sub("?", shape)
+    shape = _NUMBER_LITERAL.sub("?", shape)
+    return _PLACEHOLDER_LIST.sub("(?...)", shape)
+
+_MONGO_SHAPE_FIELDS = ("filter", "pipeline", "query", "sort", "updates", "deletes")
+
+def _mongo_shape(value):
+    if isinstance(value, dict):
+        return {key: _mongo_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_mongo_shape(value[0])] if value else []
+    return "?"
+
+def normalize_mongo(command_name: str, command: dict) -> str:
+    """Reduce a MongoDB command to its shape: collection, operators and field names only"""
+    shape = {"op": command_name, "collection": command.get(command_name)}
+    for field in _MONGO_SHAPE_FIELDS:
+        if field in command:
+            shape[field] = _mongo_shape(command[field])
+    return json.dumps(shape, sort_keys=True, default=str)
+
+# Driver hooks
+
+def profile_sql_engine(engine):
+    """Time every statement the (async) SQLAlchemy engine executes"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_profiler_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get("query_profiler_started")
+        if started:
+            profiler.record("sql", normalize_sql(statement), time.perf_counter() - started.pop())
+
+class MongoCommandProfiler(monitoring.CommandListener):
+    """pymongo command listener feeding the profiler"""
+
+    IGNORED_COMMANDS = {"hello", "ismaster", "isMaster", "ping", "buildInfo", "saslStart", "saslContinue", "endSessions"}
+
+    def __init__(self):
+        self._pending: Dict[Tuple[int, object], str] = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        if event.command_name in self.IGNORED_COMMANDS:
+            return
+        shape = normalize_mongo(event.command_name, event.command)
+        with self._lock:
+            self._pending[(event.request_id, event.connection_id)] = shape
+
+    def _finish(self, event):
+        with self._lock:
+            shape = self._pending.pop((event.request_id, event.connection_id), None)
+        if shape is not None:
+            profiler.record("mongo", shape, event.duration_micros / 1_000_000)
+
+    def succeeded(self, event):
+        self._finish(event)
+
+    def failed(self, event):
+        self._finish(event)
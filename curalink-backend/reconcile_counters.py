@@ -0,0 +1,130 @@
+"""
+Reconciliation job for the denormalized forum counters.
+
+Forum.post_count and ForumPost.reply_count are maintained incrementally when
+posts are created and deleted. Anything that bypasses the routers (manual
+edits, failed requests, restores) makes them drift; this job recomputes them
+in bulk and only rewrites the rows that are wrong.
+
+    python reconcile_counters.py           # SQL database
+    python reconcile_counters.py --mongo   # MongoDB
+"""
+
+from sqlalchemy import select, update, func, bindparam
+from pymongo import UpdateOne
+
+def reconcile_sql_forum_counters(connection):
+    """Recompute SQL forum and post counters; returns the number of rows repaired"""
+    from models import Forum, ForumPost
+
+    forums = Forum.__table__
+    posts = ForumPost.__table__
+
+    # The counts are read first and written back by id: MySQL can't UPDATE a
+    # table that a subquery in the same statement selects from (error 1093)
+    post_counts = select(posts.c.forum_id, func.count().label("actual")).group_by(posts.c.forum_id).subquery()
+    reply_counts = select(posts.c.parent_id, func.count().label("actual")).where(
+        posts.c.parent_id.is_not(None)
+    ).group_by(posts.c.parent_id).subquery()
+
+    actual_posts = func.coalesce(post_counts.c.actual, 0)
+    actual_replies = func.coalesce(reply_counts.c.actual, 0)
+    wrong_forums = connection.execute(
+        select(forums.c.id, actual_posts)
+        .outerjoin(post_counts, post_counts.c.forum_id == forums.c.id)
+        .where(forums.c.post_count != actual_posts)
+    ).all()
+    wrong_posts = connection.execute(
+        select(posts.c.id, actual_replies)
+        .outerjoin(reply_counts, reply_counts.c.parent_id == posts.c.id)
+        .where(posts.c.reply_count != actual_replies)
+    ).all()
+
+    if wrong_forums:
+        connection.execute(
+            update(forums).where(forums.c.id == bindparam("row_id")).values(post_count=bindparam("actual")),
+            [{"row_id": row_id, "actual": actual} for row_id, actual in wrong_forums]
+        )
+    if wrong_posts:
+        connection.execute(
+            update(posts).where(posts.c.id == bindparam("row_id")).values(reply_count=bindparam("actual")),
+            [{"row_id": row_id, "actual": actual} for row_id, actual in wrong_posts]
+        )
+
+    return len(wrong_forums) + len(wrong_posts)
+
+async def reconcile_mongo_forum_counters(database):
+    """Recompute MongoDB forum and post counters; returns the number of documents repaired"""
+    from mongodb_models import Forum, ForumPost
+
+    forums = database[Forum.Settings.name]
+    posts = database[ForumPost.Settings.name]
+
+    post_counts = {
+        doc["_id"]: doc["count"]
+        async for doc in posts.aggregate([{"$group": {"_id": "$forum_id", "count": {"$sum": 1}}}])
+    }
+    reply_counts = {
+        doc["_id"]: doc["count"]
+        async for doc in posts.aggregate([
+            {"$match": {"parent_post_id": {"$ne": None}}},
+            {"$group": {"_id": "$parent_post_id", "count": {"$sum": 1}}}
+        ])
+    }
+
+    forum_updates = [
+        UpdateOne({"_id": doc["_id"]}, {"$set": {"post_count": post_counts.get(str(doc["_id"]), 0)}})
+        async for doc in forums.find({}, {"post_count": 1})
+        if doc.get("post_count", 0) != post_counts.get(str(doc["_id"]), 0)
+    ]
+    # Only posts that have replies or a non-zero counter can be wrong
+    post_updates = [
+        UpdateOne({"_id": doc["_id"]}, {"$set": {"reply_count": reply_counts.get(str(doc["_id"]), 0)}})
+        async for doc in posts.find(
+            {"$or": [{"reply_count": {"$gt": 0}}, {"_id": {"$in": _object_ids(reply_counts)}}]},
+            {"reply_count": 1}
+        )
+        if doc.get("reply_count", 0) != reply_counts.get(str(doc["_id"]), 0)
+    ]
+
+    if forum_updates:
+        await forums.bulk_write(forum_updates, ordered=False)
+    if post_updates:
+        await posts.bulk_write(post_updates, ordered=False)
+
+    return len(forum_updates) + len(post_updates)
+
+def _object_ids(ids):
+    from bson import ObjectId
+    return [ObjectId(i) for i in ids if ObjectId.is_valid(i)]
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+
+    parser = argparse.ArgumentParser(description="Repair drifted forum post/reply counters")
+    parser.add_argument("--mongo", action="store_true", help="reconcile the MongoDB collections instead of SQL")
+    args = parser.parse_args()
+
+    if args.mongo:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        from mongodb_database import MONGODB_URL
+
+        async def run():
+            client = AsyncIOMotorClient(MONGODB_URL)
+            try:
+                return await reconcile_mongo_forum_counters(client.get_default_database())
+            finally:
+                client.close()
+
+        repaired = asyncio.run(run())
+    else:
+        from database import engine
+
+        async def run():
+            async with engine.begin() as connection:
+                return await connection.run_sync(reconcile_sql_forum_counters)
+
+        repaired = asyncio.run(run())
+
+    print(f"✅ Repaired {repaired} forum counter(s)")
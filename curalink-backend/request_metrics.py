@@ -0,0 +1,104 @@
+"""
+Request, upstream and cache metrics for the /metrics endpoint.
+
+    http_request_duration_seconds{method,route,status}   latency per route template
+    http_requests_in_flight                               requests being handled now
+    http_request_size_bytes / http_response_size_bytes    payload sizes per route
+    upstream_request_duration_seconds{service,outcome}    PubMed, ClinicalTrials.gov, ORCID, SambaNova
+    cache_hits_total / cache_misses_total / cache_size   per named cache
+
+Routes are labelled by their template (/api/forums/{forum_id}/posts), never
+by the raw path, so the number of series stays bounded.
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Callable
+
+from metrics import Counter, Gauge, Histogram
+
+SIZE_BUCKETS = (128, 512, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+UPSTREAM_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ["method", "route", "status"]
+)
+REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests currently being handled")
+REQUEST_SIZE = Histogram("http_request_size_bytes", "HTTP request body size", ["method", "route"], buckets=SIZE_BUCKETS)
+RESPONSE_SIZE = Histogram("http_response_size_bytes", "HTTP response body size", ["method", "route"], buckets=SIZE_BUCKETS)
+
+UPSTREAM_DURATION = Histogram(
+    "upstream_request_duration_seconds", "Latency of calls to external APIs", ["service", "outcome"],
+    buckets=UPSTREAM_BUCKETS
+)
+
+CACHE_HITS = Counter("cache_hits_total", "Cache lookups that found a fresh entry", ["cache"])
+CACHE_MISSES = Counter("cache_misses_total", "Cache lookups that missed", ["cache"])
+CACHE_EVICTIONS = Counter("cache_evictions_total", "Entries dropped because they expired or the cache was full", ["cache"])
+CACHE_SIZE = Gauge("cache_size", "Entries currently cached", ["cache"])
+
+def route_label(scope: dict) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+class RequestMetricsMiddleware:
+    """ASGI middleware recording latency, status, in-flight count and payload sizes per route"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        started_at = time.perf_counter()
+        sizes = {"request": 0, "response": 0}
+        status = {"code": 500}
+
+        async def receive_wrapper():
+            message = await receive()
+            if message["type"] == "http.request":
+                sizes["request"] += len(message.get("body", b""))
+            return message
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            elif message["type"] == "http.response.body":
+                sizes["response"] += len(message.get("body", b""))
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            method, route = scope["method"], route_label(scope)
+            REQUEST_DURATION.labels(method=method, route=route, status=status["code"]).observe(
+                time.perf_counter() - started_at
+            )
+            REQUEST_SIZE.labels(method=method, route=route).observe(sizes["request"])
+            RESPONSE_SIZE.labels(method=method, route=route).observe(sizes["response"])
+
+class UpstreamCall:
+    outcome = "ok"
+
+@contextmanager
+def track_upstream(service: str):
+    """Time a call to an external API; set `call.outcome` to record e.g. a non-200 status"""
+    call = UpstreamCall()
+    started_at = time.perf_counter()
+    try:
+        yield call
+    except Exception:
+        call.outcome = "error"
+        raise
+    finally:
+        UPSTREAM_DURATION.labels(service=service, outcome=call.outcome).observe(time.perf_counter() - started_at)
+
+def observe_cache(name: str, stats: Callable[[], dict]):
+    """Export a cache's stats() (hits, misses, evictions, size) under cache=name"""
+    CACHE_HITS.labels(cache=name).set_function(lambda: stats()["hits"])
+    CACHE_MISSES.labels(cache=name).set_function(lambda: stats()["misses"])
+    CACHE_EVICTIONS.labels(cache=name).set_function(lambda: stats().get("evictions", 0))
+    CACHE_SIZE.labels(cache=name).set_function(lambda: stats()["size"])
@@ -1,13 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 
 from database import get_db
 from models import User, PatientProfile, ResearcherProfile
 from schemas import UserCreate, UserLogin, Token, User as UserSchema
 from auth_utils import (
-    verify_password,
-    get_password_hash,
+    password_hasher,
+    user_cache,
     create_access_token,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
@@ -15,9 +16,9 @@ from auth_utils import (
 router = APIRouter()
 
 @router.post("/register", response_model=Token)
-async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     # Check if user exists
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    existing_user = await db.scalar(select(User).where(User.email == user_data.email))
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -25,7 +26,7 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Create user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await password_hasher.hash(user_data.password)
     db_user = User(
         email=user_data.email,
         full_name=user_data.full_name,
@@ -33,8 +34,8 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
         hashed_password=hashed_password
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     
     # Create profile based on role
     if user_data.role == "patient":
@@ -44,7 +45,7 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
         researcher_profile = ResearcherProfile(user_id=db_user.id)
         db.add(researcher_profile)
     
-    db.commit()
+    await db.commit()
     
     # Create access token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -59,16 +60,26 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     }
 
 @router.post("/login", response_model=Token)
-async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == user_credentials.email).first()
+async def login(user_credentials: UserLogin, db: AsyncSession = Depends(get_db)):
+    user = await db.scalar(select(User).where(User.email == user_credentials.email))
     
-    if not user or not verify_password(user_credentials.password, user.hashed_password):
+    valid, new_hash = False, None
+    if user:
+        valid, new_hash = await password_hasher.verify_and_update(user_credentials.password, user.hashed_password)
+    
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    # Upgrade hashes created with older cost settings while we have the plain password
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
+        user_cache.invalidate(str(user.id))
+    
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
         data={"sub": str(user.id)}, expires_delta=access_token_expires
@@ -1,12 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy import select, update, func, case
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 
 from database import get_db
 from auth_utils import get_current_user
 from models import User, ChatMessage
 from schemas import ChatMessage as ChatMessageSchema, ChatMessageCreate
 from websocket_manager import manager
+from delta_sync import make_etag, not_modified, encode_cursor, decode_cursor, cursor_int, tagged_response, delta_response
+from unread import unread_messages
 from services.ai_service import ai_service
 import json
 
@@ -14,37 +17,31 @@ router = APIRouter()
 
 @router.get("/conversations")
 async def get_conversations(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get all conversations for the current user"""
     # Get unique users the current user has chatted with
-    sent_to = db.query(ChatMessage.receiver_id).filter(
+    sent_to = (await db.scalars(select(ChatMessage.receiver_id).where(
         ChatMessage.sender_id == current_user.id
-    ).distinct().all()
+    ).distinct())).all()
     
-    received_from = db.query(ChatMessage.sender_id).filter(
+    received_from = (await db.scalars(select(ChatMessage.sender_id).where(
         ChatMessage.receiver_id == current_user.id
-    ).distinct().all()
+    ).distinct())).all()
     
-    user_ids = set([u[0] for u in sent_to] + [u[0] for u in received_from])
+    user_ids = set(sent_to) | set(received_from)
+    unread = await unread_messages.counts(current_user.id)
     
     conversations = []
     for user_id in user_ids:
-        user = db.query(User).filter(User.id == user_id).first()
+        user = await db.scalar(select(User).where(User.id == user_id))
         if user:
             # Get last message
-            last_message = db.query(ChatMessage).filter(
+            last_message = await db.scalar(select(ChatMessage).where(
                 ((ChatMessage.sender_id == current_user.id) & (ChatMessage.receiver_id == user_id)) |
                 ((ChatMessage.sender_id == user_id) & (ChatMessage.receiver_id == current_user.id))
-            ).order_by(ChatMessage.created_at.desc()).first()
-            
-            # Count unread messages
-            unread_count = db.query(ChatMessage).filter(
-                ChatMessage.sender_id == user_id,
-                ChatMessage.receiver_id == current_user.id,
-                ChatMessage.read == False
-            ).count()
+            ).order_by(ChatMessage.created_at.desc()).limit(1))
             
             conversations.append({
                 "user": {
@@ -56,7 +53,7 @@ async def get_conversations(
                     "message": last_message.message,
                     "created_at": last_message.created_at
                 } if last_message else None,
-                "unread_count": unread_count
+                "unread_count": unread.get(user_id, 0)
             })
     
     return conversations
@@ -64,24 +61,56 @@ async def get_conversations(
 @router.get("/messages/{other_user_id}")
 async def get_messages(
     other_user_id: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    since: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get all messages between current user and another user"""
-    messages = db.query(ChatMessage).filter(
+    """Get all messages between current user and another user, or with `since` only new ones (see delta_sync).
+
+    Read state is part of full responses only: a `since` delta carries new
+    messages, not older ones the other user has read since. Clients that
+    show read receipts refetch the conversation without `since`.
+    """
+    conversation = (
         ((ChatMessage.sender_id == current_user.id) & (ChatMessage.receiver_id == other_user_id)) |
         ((ChatMessage.sender_id == other_user_id) & (ChatMessage.receiver_id == current_user.id))
-    ).order_by(ChatMessage.created_at.asc()).all()
+    )
+    # Messages are only ever added or marked read: the count, newest id and unread
+    # counts per direction describe the conversation, in one aggregate
+    count, newest_id, unread_received, unread_sent = (await db.execute(select(
+        func.count(),
+        func.max(ChatMessage.id),
+        func.count(case(((ChatMessage.sender_id == other_user_id) & (ChatMessage.read == False), 1))),
+        func.count(case(((ChatMessage.sender_id == current_user.id) & (ChatMessage.read == False), 1)))
+    ).where(conversation))).one()
     
-    # Mark messages as read
-    db.query(ChatMessage).filter(
-        ChatMessage.sender_id == other_user_id,
-        ChatMessage.receiver_id == current_user.id,
-        ChatMessage.read == False
-    ).update({"read": True})
-    db.commit()
+    # Opening the conversation reads what the other user sent; polls that find
+    # nothing unread don't write
+    if unread_received:
+        result = await db.execute(update(ChatMessage).where(
+            ChatMessage.sender_id == other_user_id,
+            ChatMessage.receiver_id == current_user.id,
+            ChatMessage.read == False
+        ).values(read=True))
+        await db.commit()
+        if result.rowcount:
+            unread_messages.decrement(current_user.id, other_user_id, result.rowcount)
     
-    return [{
+    # After the update nothing received is unread; what we sent is only in full responses
+    version = [count, newest_id] if since else [count, newest_id, unread_sent]
+    etag = make_etag("messages", current_user.id, other_user_id, *version)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    
+    query = select(ChatMessage).where(conversation)
+    after_id = cursor_int(decode_cursor(since)["c"]) if since else None
+    if after_id is not None:
+        query = query.where(ChatMessage.id > after_id)
+    messages = (await db.scalars(query.order_by(ChatMessage.created_at.asc()))).all()
+    
+    items = [{
         "id": msg.id,
         "sender_id": msg.sender_id,
         "receiver_id": msg.receiver_id,
@@ -89,11 +118,20 @@ async def get_messages(
         "read": msg.read,
         "created_at": msg.created_at
     } for msg in messages]
+    if since is None:
+        return tagged_response(items, etag)
+    return delta_response(items, [], encode_cursor(newest_id), etag)
+
+@router.get("/unread-count")
+async def get_unread_count(current_user: User = Depends(get_current_user)):
+    """Unread messages in total and per sender (from memory, see unread_counters)"""
+    unread = await unread_messages.counts(current_user.id)
+    return {"unread_count": sum(unread.values()), "conversations": unread}
 
 @router.post("/messages", response_model=ChatMessageSchema)
 async def send_message(
     message_data: ChatMessageCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Send a message to another user"""
@@ -103,8 +141,9 @@ async def send_message(
         message=message_data.message
     )
     db.add(message)
-    db.commit()
-    db.refresh(message)
+    await db.commit()
+    await db.refresh(message)
+    unread_messages.increment(message.receiver_id, message.sender_id)
     
     # Send via WebSocket
     await manager.send_personal_message(
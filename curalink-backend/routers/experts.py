@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Optional
 
 from database import get_db
@@ -15,24 +16,24 @@ async def search_experts(
     query: Optional[str] = Query(None),
     specialty: Optional[str] = Query(None),
     condition: Optional[str] = Query(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Search for health experts and researchers"""
     
     # Search local database
-    db_query = db.query(User, ResearcherProfile).join(ResearcherProfile)
+    db_query = select(User, ResearcherProfile).join(ResearcherProfile)
     
     if specialty:
-        db_query = db_query.filter(ResearcherProfile.specialty.contains(specialty))
+        db_query = db_query.where(ResearcherProfile.specialty.contains(specialty))
     
     if query:
-        db_query = db_query.filter(
+        db_query = db_query.where(
             (User.full_name.contains(query)) |
             (ResearcherProfile.research_interests.contains(query))
         )
     
-    local_results = db_query.limit(10).all()
+    local_results = (await db.execute(db_query.limit(10))).all()
     
     experts = []
     for user, profile in local_results:
@@ -71,15 +72,15 @@ async def search_experts(
 @router.get("/{expert_id}")
 async def get_expert_details(
     expert_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get detailed information about a specific expert"""
-    user = db.query(User).filter(User.id == expert_id).first()
+    user = await db.scalar(select(User).where(User.id == expert_id))
     if not user or user.role != "researcher":
         return {"error": "Expert not found"}
     
-    profile = db.query(ResearcherProfile).filter(ResearcherProfile.user_id == expert_id).first()
+    profile = await db.scalar(select(ResearcherProfile).where(ResearcherProfile.user_id == expert_id))
     
     return {
         "id": user.id,
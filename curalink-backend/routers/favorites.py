@@ -1,43 +1,67 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 import json
 
 from database import get_db
 from auth_utils import get_current_user
 from models import User, Favorite
 from schemas import Favorite as FavoriteSchema, FavoriteCreate
+from delta_sync import make_etag, not_modified, encode_cursor, decode_cursor, cursor_int, is_expired, tagged_response, delta_response
+from tombstones import record_deletion, latest_deletion, deleted_since
 
 router = APIRouter()
 
 @router.get("/", response_model=List[FavoriteSchema])
 async def get_favorites(
+    request: Request,
     item_type: str = None,
-    db: Session = Depends(get_db),
+    since: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get all favorites for the current user"""
-    query = db.query(Favorite).filter(Favorite.user_id == current_user.id)
+    """Get all favorites for the current user, or with `since` only what changed (see delta_sync)"""
+    # Favorites are only ever added or removed, so the count, newest id and newest deletion describe them
+    count, newest_id = (await db.execute(select(func.count(), func.max(Favorite.id)).where(
+        Favorite.user_id == current_user.id
+    ))).one()
+    newest_deletion = await latest_deletion(db, current_user.id, "favorites")
+    etag = make_etag("favorites", current_user.id, item_type, count, newest_id, newest_deletion)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    
+    query = select(Favorite).where(Favorite.user_id == current_user.id)
     
     if item_type:
-        query = query.filter(Favorite.item_type == item_type)
+        query = query.where(Favorite.item_type == item_type)
+    
+    position = decode_cursor(since) if since else None
+    full = position is None or is_expired(position)
+    after_id = None if full else cursor_int(position["c"])
+    if after_id is not None:
+        query = query.where(Favorite.id > after_id)
     
-    favorites = query.order_by(Favorite.created_at.desc()).all()
-    return favorites
+    favorites = [FavoriteSchema.from_orm(f).dict() for f in (await db.scalars(query.order_by(Favorite.created_at.desc()))).all()]
+    if since is None:
+        return tagged_response(favorites, etag)
+    deleted = [] if full else await deleted_since(db, current_user.id, "favorites", position["d"])
+    return delta_response(favorites, deleted, encode_cursor(newest_id, newest_deletion), etag, full)
 
 @router.post("/", response_model=FavoriteSchema)
 async def add_favorite(
     favorite_data: FavoriteCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Add an item to favorites"""
     # Check if already favorited
-    existing = db.query(Favorite).filter(
+    existing = await db.scalar(select(Favorite).where(
         Favorite.user_id == current_user.id,
         Favorite.item_type == favorite_data.item_type,
         Favorite.item_id == favorite_data.item_id
-    ).first()
+    ))
     
     if existing:
         raise HTTPException(status_code=400, detail="Item already in favorites")
@@ -47,28 +71,29 @@ async def add_favorite(
         **favorite_data.dict()
     )
     db.add(favorite)
-    db.commit()
-    db.refresh(favorite)
+    await db.commit()
+    await db.refresh(favorite)
     
     return favorite
 
 @router.delete("/{favorite_id}")
 async def remove_favorite(
     favorite_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Remove an item from favorites"""
-    favorite = db.query(Favorite).filter(
+    favorite = await db.scalar(select(Favorite).where(
         Favorite.id == favorite_id,
         Favorite.user_id == current_user.id
-    ).first()
+    ))
     
     if not favorite:
         raise HTTPException(status_code=404, detail="Favorite not found")
     
-    db.delete(favorite)
-    db.commit()
+    await db.delete(favorite)
+    await record_deletion(db, "favorites", favorite.id, [current_user.id])
+    await db.commit()
     
     return {"message": "Removed from favorites"}
 
@@ -76,14 +101,14 @@ async def remove_favorite(
 async def check_favorite(
     item_type: str,
     item_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Check if an item is favorited"""
-    favorite = db.query(Favorite).filter(
+    favorite = await db.scalar(select(Favorite).where(
         Favorite.user_id == current_user.id,
         Favorite.item_type == item_type,
         Favorite.item_id == item_id
-    ).first()
+    ))
     
     return {"is_favorited": favorite is not None, "favorite_id": favorite.id if favorite else None}
@@ -1,6 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select, update, delete, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 
 from database import get_db
 from auth_utils import get_current_user
@@ -18,17 +19,17 @@ router = APIRouter()
 
 @router.get("/", response_model=List[ForumSchema])
 async def get_forums(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get all forums"""
-    forums = db.query(Forum).all()
+    forums = (await db.scalars(select(Forum))).all()
     return forums
 
 @router.post("/", response_model=ForumSchema)
 async def create_forum(
     forum_data: ForumCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Create a new forum (researchers only)"""
@@ -37,11 +38,11 @@ async def create_forum(
     
     forum = Forum(**forum_data.dict())
     db.add(forum)
-    db.commit()
-    db.refresh(forum)
+    await db.commit()
+    await db.refresh(forum)
     
-    # Broadcast new forum to all connected users
-    await manager.broadcast(json.dumps({
+    # Notify clients watching the forum list
+    await manager.publish(["forums"], json.dumps({
         "type": "new_forum",
         "forum": {
             "id": forum.id,
@@ -53,53 +54,130 @@ async def create_forum(
     
     return forum
 
+def _serialize_post(post: ForumPost, author: User) -> dict:
+    return {
+        "id": post.id,
+        "content": post.content,
+        "created_at": post.created_at,
+        "parent_id": post.parent_id,
+        "author": {
+            "id": author.id,
+            "full_name": author.full_name,
+            "role": author.role
+        },
+        "replies": []
+    }
+
+async def _adjust_counters(db: AsyncSession, forum_id: int, parent_id: int, delta: int, reply_delta: int = None) -> bool:
+    """Atomically shift the forum's post count and the parent's reply count.
+
+    Runs as `SET x = x + delta` inside the caller's transaction, so concurrent
+    posts cannot lose updates. The parent's reply count moves by `reply_delta`
+    (default `delta`); it only counts direct replies. Returns False if the
+    forum does not exist.
+    """
+    updated = await db.execute(
+        update(Forum).where(Forum.id == forum_id).values(post_count=Forum.post_count + delta),
+        execution_options={"synchronize_session": False}
+    )
+    if parent_id:
+        await db.execute(
+            update(ForumPost).where(ForumPost.id == parent_id).values(
+                reply_count=ForumPost.reply_count + (delta if reply_delta is None else reply_delta)
+            ),
+            execution_options={"synchronize_session": False}
+        )
+    return updated.rowcount > 0
+
+def _subtree_filter(post: ForumPost):
+    low, high = ForumPost.subtree_bounds(post.path)
+    return and_(ForumPost.path >= low, ForumPost.path < high)
+
+def _build_post_tree(roots, descendants, reply_limit: Optional[int]) -> List[dict]:
+    """Assemble (post, author) rows into nested threads in memory.
+
+    `descendants` must be in path order (depth-first, oldest sibling first).
+    Each node keeps its total `reply_count`; with a `reply_limit` only the
+    latest that many replies are returned per node.
+    """
+    nodes = {post.id: _serialize_post(post, author) for post, author in roots}
+    threads = list(nodes.values())
+    
+    for post, author in descendants:
+        nodes[post.id] = _serialize_post(post, author)
+    for post, _ in descendants:
+        parent = nodes.get(post.parent_id)
+        if parent is not None:
+            parent["replies"].append(nodes[post.id])
+    
+    for node in nodes.values():
+        node["reply_count"] = len(node["replies"])
+        if reply_limit is not None:
+            node["replies"] = node["replies"][-reply_limit:] if reply_limit > 0 else []
+    
+    return threads
+
 @router.get("/{forum_id}/posts")
 async def get_forum_posts(
     forum_id: int,
-    db: Session = Depends(get_db),
+    skip: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=100),
+    reply_limit: Optional[int] = Query(None, ge=0, le=50),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get all posts in a forum"""
-    posts = db.query(ForumPost, User).join(User).filter(
+    """Get the top-level posts in a forum with their replies.
+
+    Everything by default, as before paging existed; `limit` pages the posts
+    and `reply_limit` trims each reply list to a preview (`reply_count` stays
+    the total, so clients can tell replies were left out).
+    """
+    # One query for the page of top-level posts...
+    roots = (await db.execute(select(ForumPost, User).join(User, ForumPost.author_id == User.id).where(
         ForumPost.forum_id == forum_id,
-        ForumPost.parent_id == None  # Only top-level posts
-    ).all()
-    
-    result = []
-    for post, author in posts:
-        # Get replies
-        replies = db.query(ForumPost, User).join(User).filter(
-            ForumPost.parent_id == post.id
-        ).all()
-        
-        result.append({
-            "id": post.id,
-            "content": post.content,
-            "created_at": post.created_at,
-            "author": {
-                "id": author.id,
-                "full_name": author.full_name,
-                "role": author.role
-            },
-            "replies": [{
-                "id": reply.id,
-                "content": reply.content,
-                "created_at": reply.created_at,
-                "author": {
-                    "id": reply_author.id,
-                    "full_name": reply_author.full_name,
-                    "role": reply_author.role
-                }
-            } for reply, reply_author in replies]
-        })
-    
-    return result
+        ForumPost.parent_id == None
+    ).order_by(ForumPost.id.asc()).offset(skip).limit(limit))).all()
+    
+    if not roots:
+        return []
+    
+    # ...and one for every reply at any depth below them: each thread is a
+    # contiguous range of the (forum_id, path) index
+    replies = (await db.execute(select(ForumPost, User).join(User, ForumPost.author_id == User.id).where(
+        ForumPost.forum_id == forum_id,
+        or_(*[_subtree_filter(post) for post, _ in roots])
+    ).order_by(ForumPost.path.asc()))).all()
+    
+    return _build_post_tree(roots, replies, reply_limit)
+
+@router.get("/{forum_id}/posts/{post_id}/thread")
+async def get_post_thread(
+    forum_id: int,
+    post_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get a post with its complete reply tree"""
+    root = (await db.execute(select(ForumPost, User).join(User, ForumPost.author_id == User.id).where(
+        ForumPost.id == post_id,
+        ForumPost.forum_id == forum_id
+    ))).first()
+    
+    if not root:
+        raise HTTPException(status_code=404, detail="Post not found")
+    
+    replies = (await db.execute(select(ForumPost, User).join(User, ForumPost.author_id == User.id).where(
+        ForumPost.forum_id == forum_id,
+        _subtree_filter(root[0])
+    ).order_by(ForumPost.path.asc()))).all()
+    
+    return _build_post_tree([root], replies, len(replies))[0]
 
 @router.post("/{forum_id}/posts", response_model=ForumPostSchema)
 async def create_post(
     forum_id: int,
     post_data: ForumPostCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Create a new post in a forum"""
@@ -107,6 +185,17 @@ async def create_post(
     if post_data.parent_id and current_user.role == "patient":
         raise HTTPException(status_code=403, detail="Only researchers can reply to posts")
     
+    parent = None
+    if post_data.parent_id:
+        parent = await db.scalar(select(ForumPost).where(
+            ForumPost.id == post_data.parent_id,
+            ForumPost.forum_id == forum_id
+        ))
+        if not parent:
+            raise HTTPException(status_code=404, detail="Parent post not found")
+        if parent.path.count(ForumPost.PATH_SEPARATOR) + 1 >= ForumPost.MAX_DEPTH:
+            raise HTTPException(status_code=400, detail="Replies are nested too deeply")
+    
     post = ForumPost(
         forum_id=forum_id,
         author_id=current_user.id,
@@ -114,11 +203,18 @@ async def create_post(
         parent_id=post_data.parent_id
     )
     db.add(post)
-    db.commit()
-    db.refresh(post)
+    await db.flush()  # Assigns post.id, which is the last segment of its path
+    post.path = ForumPost.build_path(parent.path if parent else None, post.id)
+    if not await _adjust_counters(db, forum_id, post.parent_id, 1):
+        raise HTTPException(status_code=404, detail="Forum not found")
+    await db.commit()
+    await db.refresh(post)
     
-    # Broadcast new post to all connected users
-    await manager.broadcast(json.dumps({
+    # Notify clients following this forum, thread or author
+    topics = [f"forum:{forum_id}", f"user:{current_user.id}"]
+    if post.parent_id:
+        topics.append(f"thread:{int(post.path.split(ForumPost.PATH_SEPARATOR, 1)[0])}")
+    await manager.publish(topics, json.dumps({
         "type": "new_post",
         "forum_id": forum_id,
         "post": {
@@ -139,14 +235,14 @@ async def create_post(
 async def delete_post(
     forum_id: int,
     post_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Delete a post (only author can delete)"""
-    post = db.query(ForumPost).filter(
+    """Delete a post and its replies (only author can delete)"""
+    post = await db.scalar(select(ForumPost).where(
         ForumPost.id == post_id,
         ForumPost.forum_id == forum_id
-    ).first()
+    ))
     
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
@@ -154,7 +250,22 @@ async def delete_post(
     if post.author_id != current_user.id:
         raise HTTPException(status_code=403, detail="You can only delete your own posts")
     
-    db.delete(post)
-    db.commit()
+    # The replies go with it; leaving them would orphan them under a missing parent.
+    # Deepest level first: InnoDB checks the parent_id foreign key row by row,
+    # so a single DELETE could remove a parent before its replies.
+    subtree = (await db.execute(select(ForumPost.id, ForumPost.path).where(
+        ForumPost.forum_id == forum_id, _subtree_filter(post)
+    ))).all()
+    levels = {}
+    for reply_id, path in subtree:
+        levels.setdefault(path.count(ForumPost.PATH_SEPARATOR), []).append(reply_id)
+    for depth in sorted(levels, reverse=True):
+        await db.execute(
+            delete(ForumPost).where(ForumPost.id.in_(levels[depth])),
+            execution_options={"synchronize_session": False}
+        )
+    await db.delete(post)
+    await _adjust_counters(db, forum_id, post.parent_id, -(len(subtree) + 1), reply_delta=-1)
+    await db.commit()
     
     return {"message": "Post deleted successfully"}
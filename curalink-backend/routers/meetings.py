@@ -1,27 +1,55 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from database import get_db
 from models import User, MeetingRequest
 from schemas import MeetingRequestCreate, MeetingRequestResponse
 from auth_utils import get_current_user
-from routers.notifications import create_meeting_notification
+from routers.notifications import create_meeting_notification, announce_notification
 from websocket_manager import manager
+from delta_sync import make_etag, not_modified, encode_cursor, decode_cursor, cursor_datetime, is_expired, tagged_response, delta_response
+from tombstones import record_deletion, latest_deletion, deleted_since
 import json
 
 router = APIRouter()
 
 @router.get("/", response_model=List[dict])
 async def get_meeting_requests(
-    db: Session = Depends(get_db),
+    request: Request,
+    since: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get all meeting requests for the current user"""
-    if current_user.role == "patient":
+    """Get all meeting requests for the current user, or with `since` only what changed (see delta_sync)"""
+    is_patient = current_user.role == "patient"
+    mine = MeetingRequest.requester_id == current_user.id if is_patient else MeetingRequest.expert_id == current_user.id
+    count, newest = (await db.execute(select(func.count(), func.max(MeetingRequest.updated_at)).where(mine))).one()
+    newest_deletion = await latest_deletion(db, current_user.id, "meetings")
+    etag = make_etag("meetings", current_user.id, count, newest, newest_deletion)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
+    
+    position = decode_cursor(since) if since else None
+    full = position is None or is_expired(position)
+    changed_since = None if full else cursor_datetime(position["c"])
+    
+    items = await _meeting_requests(db, current_user, is_patient, changed_since)
+    if since is None:
+        return tagged_response(items, etag)
+    deleted = [] if full else await deleted_since(db, current_user.id, "meetings", position["d"])
+    return delta_response(items, deleted, encode_cursor(newest, newest_deletion), etag, full)
+
+async def _meeting_requests(db: AsyncSession, current_user: User, is_patient: bool, changed_since=None) -> list:
+    if is_patient:
         # Get requests sent by patient
-        requests = db.query(MeetingRequest, User).join(
+        query = select(MeetingRequest, User).join(
             User, MeetingRequest.expert_id == User.id
-        ).filter(MeetingRequest.requester_id == current_user.id).all()
+        ).where(MeetingRequest.requester_id == current_user.id)
+        if changed_since is not None:
+            query = query.where(MeetingRequest.updated_at >= changed_since)
+        requests = (await db.execute(query)).all()
         
         return [{
             "id": req.id,
@@ -37,9 +65,12 @@ async def get_meeting_requests(
         } for req, expert in requests]
     else:
         # Get requests received by researcher
-        requests = db.query(MeetingRequest, User).join(
+        query = select(MeetingRequest, User).join(
             User, MeetingRequest.requester_id == User.id
-        ).filter(MeetingRequest.expert_id == current_user.id).all()
+        ).where(MeetingRequest.expert_id == current_user.id)
+        if changed_since is not None:
+            query = query.where(MeetingRequest.updated_at >= changed_since)
+        requests = (await db.execute(query)).all()
         
         return [{
             "id": req.id,
@@ -57,12 +88,12 @@ async def get_meeting_requests(
 @router.post("/", response_model=MeetingRequestResponse)
 async def create_meeting_request(
     request_data: MeetingRequestCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Create a meeting request"""
     # Check if target user exists
-    target_user = db.query(User).filter(User.id == request_data.expert_id).first()
+    target_user = await db.scalar(select(User).where(User.id == request_data.expert_id))
     if not target_user:
         raise HTTPException(status_code=404, detail="Target user not found")
     
@@ -71,11 +102,11 @@ async def create_meeting_request(
         raise HTTPException(status_code=400, detail="Cannot request meeting with yourself")
     
     # Check if request already exists
-    existing = db.query(MeetingRequest).filter(
+    existing = await db.scalar(select(MeetingRequest).where(
         MeetingRequest.requester_id == current_user.id,
         MeetingRequest.expert_id == request_data.expert_id,
         MeetingRequest.status == "pending"
-    ).first()
+    ))
     
     if existing:
         raise HTTPException(status_code=400, detail="Meeting request already pending")
@@ -86,11 +117,10 @@ async def create_meeting_request(
         message=request_data.message
     )
     db.add(meeting_request)
-    db.commit()
-    db.refresh(meeting_request)
+    await db.flush()  # Assigns the id the notification points to
     
-    # Create notification for the expert
-    await create_meeting_notification(
+    # Create notification for the expert, in the same transaction
+    notification = await create_meeting_notification(
         db=db,
         user_id=str(request_data.expert_id),
         notification_type="meeting_request",
@@ -99,12 +129,16 @@ async def create_meeting_request(
         from_user=current_user.full_name,
         meeting_id=meeting_request.id
     )
+    await db.commit()
+    await db.refresh(meeting_request)
+    await announce_notification(notification)
     
     # Send notification via WebSocket
     await manager.send_personal_message(
         str(request_data.expert_id),
         json.dumps({
             "type": "meeting_request",
+            "request_id": meeting_request.id,
             "request": {
                 "id": meeting_request.id,
                 "requester": {
@@ -124,13 +158,13 @@ async def create_meeting_request(
 async def update_meeting_status(
     request_id: int,
     status_data: dict,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Update meeting request status (accept/reject)"""
-    meeting_request = db.query(MeetingRequest).filter(
+    meeting_request = await db.scalar(select(MeetingRequest).where(
         MeetingRequest.id == request_id
-    ).first()
+    ))
     
     if not meeting_request:
         raise HTTPException(status_code=404, detail="Meeting request not found")
@@ -144,14 +178,13 @@ async def update_meeting_status(
         raise HTTPException(status_code=400, detail="Invalid status")
     
     meeting_request.status = new_status
-    db.commit()
     
-    # Create notification for the requester
+    # Create notification for the requester, in the same transaction
     notification_type = "meeting_accepted" if new_status == "accepted" else "meeting_declined"
     notification_title = f"Meeting Request {new_status.title()}"
     notification_message = f"{current_user.full_name} has {new_status} your meeting request"
     
-    await create_meeting_notification(
+    notification = await create_meeting_notification(
         db=db,
         user_id=str(meeting_request.requester_id),
         notification_type=notification_type,
@@ -160,12 +193,15 @@ async def update_meeting_status(
         from_user=current_user.full_name,
         meeting_id=meeting_request.id
     )
+    await db.commit()
+    await announce_notification(notification)
     
     # Notify requester via WebSocket
     await manager.send_personal_message(
         str(meeting_request.requester_id),
         json.dumps({
             "type": "meeting_status_update",
+            "request_id": meeting_request.id,
             "request": {
                 "id": meeting_request.id,
                 "status": new_status,
@@ -182,19 +218,20 @@ async def update_meeting_status(
 @router.delete("/{request_id}")
 async def cancel_meeting_request(
     request_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """Cancel a meeting request"""
-    meeting_request = db.query(MeetingRequest).filter(
+    meeting_request = await db.scalar(select(MeetingRequest).where(
         MeetingRequest.id == request_id,
         MeetingRequest.requester_id == current_user.id
-    ).first()
+    ))
     
     if not meeting_request:
         raise HTTPException(status_code=404, detail="Meeting request not found")
     
-    db.delete(meeting_request)
-    db.commit()
+    await db.delete(meeting_request)
+    await record_deletion(db, "meetings", meeting_request.id, [meeting_request.requester_id, meeting_request.expert_id])
+    await db.commit()
     
     return {"message": "Meeting request cancelled"}
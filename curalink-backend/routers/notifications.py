@@ -1,31 +1,56 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy import select, update, delete, func, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from database import get_db
 from models import User, Notification
-from schemas import NotificationCreate, NotificationResponse
+from schemas import NotificationCreate, NotificationResponse, NotificationSelection
 from auth_utils import get_current_user
+from websocket_manager import manager
+from delta_sync import make_etag, not_modified, encode_cursor, decode_cursor, cursor_datetime, is_expired, tagged_response, delta_response
+from tombstones import record_deletion, record_deletions, latest_deletion, deleted_since
+from unread import unread_notifications
+from notification_writer import add_notifications, notification_writer
 from datetime import datetime
+import json
 
 router = APIRouter(prefix="/api/notifications", tags=["notifications"])
 
 @router.get("/", response_model=List[NotificationResponse])
 async def get_notifications(
+    request: Request,
+    since: Optional[str] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get all notifications for the current user"""
-    notifications = db.query(Notification).filter(
+    """Get all notifications for the current user, or with `since` only what changed (see delta_sync)"""
+    count, newest = (await db.execute(select(func.count(), func.max(Notification.updated_at)).where(
         Notification.user_id == current_user.id
-    ).order_by(Notification.created_at.desc()).all()
+    ))).one()
+    newest_deletion = await latest_deletion(db, current_user.id, "notifications")
+    etag = make_etag("notifications", current_user.id, count, newest, newest_deletion)
+    cached = not_modified(request, etag)
+    if cached:
+        return cached
     
-    return notifications
+    query = select(Notification).where(Notification.user_id == current_user.id).order_by(Notification.created_at.desc())
+    position = decode_cursor(since) if since else None
+    full = position is None or is_expired(position)
+    changed_since = None if full else cursor_datetime(position["c"])
+    if changed_since is not None:
+        query = query.where(Notification.updated_at >= changed_since)
+    
+    notifications = [NotificationResponse.from_orm(n).dict() for n in (await db.scalars(query)).all()]
+    if since is None:
+        return tagged_response(notifications, etag)
+    deleted = [] if full else await deleted_since(db, current_user.id, "notifications", position["d"])
+    return delta_response(notifications, deleted, encode_cursor(newest, newest_deletion), etag, full)
 
 @router.post("/", response_model=NotificationResponse)
 async def create_notification(
     notification_data: NotificationCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new notification"""
     notification = Notification(
@@ -39,9 +64,8 @@ async def create_notification(
         created_at=datetime.utcnow()
     )
     
-    db.add(notification)
-    db.commit()
-    db.refresh(notification)
+    await notification_writer.write(notification)
+    unread_notifications.increment(notification.user_id)
     
     return notification
 
@@ -49,13 +73,13 @@ async def create_notification(
 async def mark_notification_as_read(
     notification_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Mark a notification as read"""
-    notification = db.query(Notification).filter(
+    notification = await db.scalar(select(Notification).where(
         Notification.id == notification_id,
         Notification.user_id == current_user.id
-    ).first()
+    ))
     
     if not notification:
         raise HTTPException(
@@ -63,37 +87,110 @@ async def mark_notification_as_read(
             detail="Notification not found"
         )
     
-    notification.read = True
-    db.commit()
+    # Conditional update, so concurrent requests only count the notification once
+    result = await db.execute(update(Notification).where(
+        Notification.id == notification.id,
+        Notification.read == False
+    ).values(read=True, read_at=datetime.utcnow()))
+    await db.commit()
+    if result.rowcount:
+        unread_notifications.decrement(current_user.id)
     
     return {"message": "Notification marked as read"}
 
 @router.put("/mark-all-read")
 async def mark_all_notifications_as_read(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Mark all notifications as read for the current user"""
-    db.query(Notification).filter(
+    result = await db.execute(update(Notification).where(
         Notification.user_id == current_user.id,
         Notification.read == False
-    ).update({"read": True})
+    ).values(read=True, read_at=datetime.utcnow()))
     
-    db.commit()
+    await db.commit()
+    # By the rows changed rather than to zero, so a notification inserted meanwhile stays counted
+    if result.rowcount:
+        unread_notifications.decrement(current_user.id, amount=result.rowcount)
     
     return {"message": "All notifications marked as read"}
 
+def _selected(selection: NotificationSelection):
+    if not selection.ids and selection.from_id is None and selection.to_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Select notifications by ids or an id range"
+        )
+    conditions = []
+    if selection.ids:
+        conditions.append(Notification.id.in_(selection.ids))
+    bounds = []
+    if selection.from_id is not None:
+        bounds.append(Notification.id >= selection.from_id)
+    if selection.to_id is not None:
+        bounds.append(Notification.id <= selection.to_id)
+    if bounds:
+        conditions.append(and_(*bounds))
+    return or_(*conditions)
+
+@router.put("/bulk-read")
+async def mark_notifications_as_read(
+    selection: NotificationSelection,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Mark several notifications as read with one statement"""
+    result = await db.execute(update(Notification).where(
+        Notification.user_id == current_user.id,
+        Notification.read == False,
+        _selected(selection)
+    ).values(read=True, read_at=datetime.utcnow()))
+    
+    await db.commit()
+    if result.rowcount:
+        unread_notifications.decrement(current_user.id, amount=result.rowcount)
+    
+    return {"message": f"{result.rowcount} notification(s) marked as read", "updated": result.rowcount}
+
+@router.post("/bulk-delete")
+async def delete_notifications(
+    selection: NotificationSelection,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Delete several notifications in one transaction"""
+    ids = (await db.scalars(select(Notification.id).where(
+        Notification.user_id == current_user.id,
+        _selected(selection)
+    ))).all()
+    
+    unread = 0
+    if ids:
+        # Unread ones first, for the same reason as in delete_notification
+        unread = (await db.execute(delete(Notification).where(
+            Notification.id.in_(ids),
+            Notification.read == False
+        ))).rowcount
+        await db.execute(delete(Notification).where(Notification.id.in_(ids)))
+        await record_deletions(db, "notifications", ids, current_user.id)
+        await db.commit()
+    if unread:
+        unread_notifications.decrement(current_user.id, amount=unread)
+    
+    return {"message": f"{len(ids)} notification(s) deleted", "deleted": len(ids)}
+
 @router.delete("/{notification_id}")
 async def delete_notification(
     notification_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Delete a notification"""
-    notification = db.query(Notification).filter(
+    notification = await db.scalar(select(Notification).where(
         Notification.id == notification_id,
         Notification.user_id == current_user.id
-    ).first()
+    ))
     
     if not notification:
         raise HTTPException(
@@ -101,27 +198,41 @@ async def delete_notification(
             detail="Notification not found"
         )
     
-    db.delete(notification)
-    db.commit()
+    # Delete it while still unread first, so a concurrent mark-read can't decrement the count too
+    unread = (await db.execute(delete(Notification).where(
+        Notification.id == notification.id,
+        Notification.read == False
+    ))).rowcount
+    if not unread:
+        await db.delete(notification)
+    await record_deletion(db, "notifications", notification.id, [current_user.id])
+    await db.commit()
+    if unread:
+        unread_notifications.decrement(current_user.id)
     
     return {"message": "Notification deleted"}
 
 @router.get("/unread-count")
 async def get_unread_count(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get count of unread notifications"""
-    count = db.query(Notification).filter(
-        Notification.user_id == current_user.id,
-        Notification.read == False
-    ).count()
-    
-    return {"unread_count": count}
+    """Get count of unread notifications (from memory, see unread_counters)"""
+    return {"unread_count": await unread_notifications.total(current_user.id)}
+
+async def push_notification(notification: Notification):
+    """Send a notification to its recipient's sockets, in the GET /api/notifications/ shape"""
+    payload = NotificationResponse.from_orm(notification).dict()
+    payload["created_at"] = notification.created_at.isoformat()
+    await manager.send_personal_message(
+        str(notification.user_id),
+        json.dumps({"type": "notification", "notification": payload}),
+        "notification"
+    )
 
 # Helper function to create notifications for meeting requests
 async def create_meeting_notification(
-    db: Session,
+    db: AsyncSession,
     user_id: str,
     notification_type: str,
     title: str,
@@ -129,7 +240,7 @@ async def create_meeting_notification(
     from_user: str = None,
     meeting_id: str = None
 ):
-    """Helper function to create meeting-related notifications"""
+    """Add a meeting notification to the caller's transaction; announce_notification() it after the commit"""
     notification = Notification(
         user_id=user_id,
         type=notification_type,
@@ -141,8 +252,11 @@ async def create_meeting_notification(
         created_at=datetime.utcnow()
     )
     
-    db.add(notification)
-    db.commit()
-    db.refresh(notification)
-    
+    # Not batched: it must roll back with the meeting change that caused it
+    await add_notifications(db, [notification])
     return notification
+
+async def announce_notification(notification: Notification):
+    """Count and push a notification once it is committed"""
+    unread_notifications.increment(notification.user_id)
+    await push_notification(notification)
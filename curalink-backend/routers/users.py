@@ -1,5 +1,6 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
 from database import get_db
@@ -11,7 +12,7 @@ from schemas import (
     ResearcherProfile as ResearcherProfileSchema,
     ResearcherProfileCreate
 )
-from auth_utils import get_current_user
+from auth_utils import get_current_user, user_cache
 
 router = APIRouter()
 
@@ -22,12 +23,12 @@ async def get_current_user_profile(current_user: User = Depends(get_current_user
 @router.get("/patient-profile", response_model=PatientProfileSchema)
 async def get_patient_profile(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     if current_user.role != "patient":
         raise HTTPException(status_code=403, detail="Not a patient. Please register as a patient to access this dashboard.")
     
-    profile = db.query(PatientProfile).filter(PatientProfile.user_id == current_user.id).first()
+    profile = await db.scalar(select(PatientProfile).where(PatientProfile.user_id == current_user.id))
     if not profile:
         # Create a default profile if it doesn't exist
         profile = PatientProfile(
@@ -36,39 +37,40 @@ async def get_patient_profile(
             location="Not specified"
         )
         db.add(profile)
-        db.commit()
-        db.refresh(profile)
+        await db.commit()
+        await db.refresh(profile)
     return profile
 
 @router.put("/patient-profile", response_model=PatientProfileSchema)
 async def update_patient_profile(
     profile_data: PatientProfileCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     if current_user.role != "patient":
         raise HTTPException(status_code=403, detail="Not a patient")
     
-    profile = db.query(PatientProfile).filter(PatientProfile.user_id == current_user.id).first()
+    profile = await db.scalar(select(PatientProfile).where(PatientProfile.user_id == current_user.id))
     if not profile:
         raise HTTPException(status_code=404, detail="Profile not found")
     
     for key, value in profile_data.dict(exclude_unset=True).items():
         setattr(profile, key, value)
     
-    db.commit()
-    db.refresh(profile)
+    await db.commit()
+    await db.refresh(profile)
+    user_cache.invalidate(str(current_user.id))
     return profile
 
 @router.get("/researcher-profile", response_model=ResearcherProfileSchema)
 async def get_researcher_profile(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     if current_user.role != "researcher":
         raise HTTPException(status_code=403, detail="Not a researcher")
     
-    profile = db.query(ResearcherProfile).filter(ResearcherProfile.user_id == current_user.id).first()
+    profile = await db.scalar(select(ResearcherProfile).where(ResearcherProfile.user_id == current_user.id))
     if not profile:
         raise HTTPException(status_code=404, detail="Profile not found")
     return profile
@@ -77,34 +79,35 @@ async def get_researcher_profile(
 async def update_researcher_profile(
     profile_data: ResearcherProfileCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     if current_user.role != "researcher":
         raise HTTPException(status_code=403, detail="Not a researcher")
     
-    profile = db.query(ResearcherProfile).filter(ResearcherProfile.user_id == current_user.id).first()
+    profile = await db.scalar(select(ResearcherProfile).where(ResearcherProfile.user_id == current_user.id))
     if not profile:
         raise HTTPException(status_code=404, detail="Profile not found")
     
     for key, value in profile_data.dict(exclude_unset=True).items():
         setattr(profile, key, value)
     
-    db.commit()
-    db.refresh(profile)
+    await db.commit()
+    await db.refresh(profile)
+    user_cache.invalidate(str(current_user.id))
     return profile
 
 @router.get("/researchers", response_model=List[dict])
 async def get_researchers(
     specialty: str = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    query = db.query(User, ResearcherProfile).join(ResearcherProfile)
+    query = select(User, ResearcherProfile).join(ResearcherProfile)
     
     if specialty:
-        query = query.filter(ResearcherProfile.specialty.contains(specialty))
+        query = query.where(ResearcherProfile.specialty.contains(specialty))
     
-    results = query.all()
+    results = (await db.execute(query)).all()
     
     researchers = []
     for user, profile in results:
@@ -0,0 +1,143 @@
+"""
+On-demand statistical profiler for a live worker.
+
+POST /debug/profile starts a sampling session for N seconds. A background
+thread snapshots the event-loop thread's stack every few milliseconds. While a
+request runs, its whole coroutine chain is on that stack, including the
+SamplingProfilerMiddleware frame. The sampler finds that frame and keeps the
+sample only if the request was selected, either by the `fraction` of requests
+to profile or by a `route` template. The result is returned in the collapsed
+stack format understood by flamegraph.pl and speedscope:
+
+    GET /api/forums/{forum_id}/posts;get_forum_posts (routers/forums.py:126);... 42
+"""
+
+import asyncio
+import os
+import random
+import sys
+import threading
+from collections import Counter as StackCounter
+from typing import Optional
+
+_BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+class ProfileAlreadyRunning(RuntimeError):
+    """Only one sampling session may run per worker"""
+
+class SamplingSession:
+    def __init__(self, seconds: float, fraction: float, route: Optional[str], interval: float, all_threads: bool):
+        self.seconds = seconds
+        self.fraction = fraction
+        self.route = route
+        self.interval = interval
+        self.all_threads = all_threads
+        self.stacks = StackCounter()
+        self.samples = 0
+
+    def selects(self, scope: dict) -> bool:
+        """Decide at the start of a request whether it is profiled"""
+        if self.route is not None:
+            return True  # Matched against the route template while sampling
+        return random.random() < self.fraction
+
+    def matches_route(self, scope: dict) -> bool:
+        if self.route is None:
+            return True
+        route = scope.get("route")
+        return self.route in (getattr(route, "path", None), scope.get("path"))
+
+class SamplingProfiler:
+    def __init__(self):
+        self.session: Optional[SamplingSession] = None
+        self._lock = threading.Lock()
+
+    @property
+    def active(self) -> bool:
+        return self.session is not None
+
+    async def profile(self, seconds: float, fraction: float = 1.0, route: Optional[str] = None,
+                      interval_ms: float = 5, all_threads: bool = False) -> SamplingSession:
+        """Sample for `seconds` and return the finished session"""
+        with self._lock:
+            if self.session is not None:
+                raise ProfileAlreadyRunning("A profiling session is already running")
+            session = self.session = SamplingSession(seconds, fraction, route, interval_ms / 1000, all_threads)
+
+        loop_thread_id = threading.get_ident()
+        stop = threading.Event()
+        sampler = threading.Thread(
+            target=self._sample, args=(session, loop_thread_id, stop), name="sampling-profiler", daemon=True
+        )
+        sampler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            stop.set()
+            await asyncio.get_running_loop().run_in_executor(None, sampler.join)
+            self.session = None
+        return session
+
+    def _sample(self, session: SamplingSession, loop_thread_id: int, stop: threading.Event):
+        own_thread_id = threading.get_ident()
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        while not stop.wait(session.interval):
+            session.samples += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == loop_thread_id:
+                    stack = _request_stack(frame, session)
+                elif session.all_threads and thread_id != own_thread_id:
+                    name = thread_names.get(thread_id) or f"thread-{thread_id}"
+                    stack = [f"thread:{name}"] + _frames(frame)
+                else:
+                    continue
+                if stack:
+                    session.stacks[";".join(stack)] += 1
+
+def _frames(frame, stop_at=None) -> list:
+    """Stack from the outermost frame down to `frame`, formatted for collapsed output"""
+    names = []
+    while frame is not None and frame is not stop_at:
+        code = frame.f_code
+        filename = code.co_filename
+        if filename.startswith(_BACKEND_DIR):
+            filename = os.path.relpath(filename, _BACKEND_DIR)
+        names.append(f"{code.co_name} ({filename}:{frame.f_lineno})")
+        frame = frame.f_back
+    names.reverse()
+    return names
+
+def _request_stack(frame, session: SamplingSession) -> Optional[list]:
+    """The part of the loop thread's stack below a selected request's middleware frame"""
+    cursor = frame
+    while cursor is not None:
+        if cursor.f_code is SamplingProfilerMiddleware.__call__.__code__:
+            scope = cursor.f_locals.get("scope")
+            if not cursor.f_locals.get("selected") or not session.matches_route(scope):
+                return None
+            route = scope.get("route")
+            root = f"{scope.get('method')} {getattr(route, 'path', None) or scope.get('path')}"
+            # Frames above the middleware (server, other middleware) are
+            # the same for every request; start at the request itself
+            return [root] + _frames(frame, stop_at=cursor)
+        cursor = cursor.f_back
+    return None
+
+def render_collapsed(session: SamplingSession) -> str:
+    lines = [f"{stack} {count}" for stack, count in session.stacks.most_common()]
+    return "\n".join(lines) + "\n"
+
+sampling_profiler = SamplingProfiler()
+
+class SamplingProfilerMiddleware:
+    """Marks requests selected for profiling; the sampler finds this frame on the stack"""
+
+    def __init__(self, app, profiler: SamplingProfiler = sampling_profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope, receive, send):
+        session = self.profiler.session
+        # Read from this frame by the sampler thread (see _request_stack)
+        selected = scope["type"] == "http" and session is not None and session.selects(scope)
+        await self.app(scope, receive, send)
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, List
 from datetime import datetime
 from models import UserRole
@@ -87,6 +87,7 @@ class ForumCreate(BaseModel):
 
 class Forum(ForumCreate):
     id: int
+    post_count: int = 0
     created_at: datetime
     
     class Config:
@@ -100,6 +101,7 @@ class ForumPostCreate(BaseModel):
 class ForumPost(ForumPostCreate):
     id: int
     author_id: int
+    reply_count: int = 0
     created_at: datetime
     updated_at: Optional[datetime] = None
     
@@ -176,6 +178,12 @@ class NotificationCreate(BaseModel):
     from_user: Optional[str] = None
     meeting_id: Optional[int] = None
 
+class NotificationSelection(BaseModel):
+    """Notifications to mark read or delete at once: a list of ids and/or an inclusive id range"""
+    ids: List[int] = Field(default=[], max_length=500)
+    from_id: Optional[int] = None
+    to_id: Optional[int] = None
+
 class NotificationResponse(BaseModel):
     id: int
     user_id: int
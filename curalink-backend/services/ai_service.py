@@ -7,6 +7,8 @@ import time
 from typing import Dict, Optional
 import hashlib
 
+from request_metrics import track_upstream
+
 load_dotenv()
 
 class AIService:
@@ -24,12 +26,18 @@ class AIService:
         self.min_request_interval = 5.0  # Increased to 5 seconds between requests due to strict rate limits
         self.response_cache: Dict[str, Dict] = {}
         self.cache_ttl = 600  # Cache responses for 10 minutes (longer cache)
+        self.cache_hits = 0
+        self.cache_misses = 0
     
     def _get_cache_key(self, messages: list, temperature: float) -> str:
         """Generate a cache key for the request"""
         content = json.dumps(messages, sort_keys=True) + str(temperature)
         return hashlib.md5(content.encode()).hexdigest()
     
+    def cache_stats(self) -> dict:
+        """Response cache counters in the same shape as TTLCache.stats()"""
+        return {"hits": self.cache_hits, "misses": self.cache_misses, "size": len(self.response_cache)}
+    
     def _is_cache_valid(self, cache_entry: Dict) -> bool:
         """Check if cache entry is still valid"""
         return time.time() - cache_entry["timestamp"] < self.cache_ttl
@@ -44,7 +52,9 @@ class AIService:
         cache_key = self._get_cache_key(messages, temperature)
         if cache_key in self.response_cache and self._is_cache_valid(self.response_cache[cache_key]):
             print("Returning cached response")
+            self.cache_hits += 1
             return self.response_cache[cache_key]["response"]
+        self.cache_misses += 1
         
         # Rate limiting - ensure minimum interval between requests
         current_time = time.time()
@@ -66,12 +76,15 @@ class AIService:
             print(f"Making request to SambaNova API with model: {self.model}")
             
             self.last_request_time = time.time()
-            response = requests.post(
-                f"{self.base_url}/chat/completions",
-                headers=self.headers,
-                json=payload,
-                timeout=30
-            )
+            with track_upstream("sambanova") as call:
+                response = requests.post(
+                    f"{self.base_url}/chat/completions",
+                    headers=self.headers,
+                    json=payload,
+                    timeout=30
+                )
+                if response.status_code != 200:
+                    call.outcome = f"http_{response.status_code}"
             
             print(f"Response status: {response.status_code}")
             
@@ -5,6 +5,8 @@ import json
 import os
 from dotenv import load_dotenv
 
+from request_metrics import track_upstream
+
 load_dotenv()
 
 # Set your email for NCBI
@@ -17,18 +19,20 @@ class PubMedService:
     async def search_publications(query: str, max_results: int = 20) -> List[Dict]:
         try:
             # Search PubMed
-            handle = Entrez.esearch(db="pubmed", term=query, retmax=max_results, sort="relevance")
-            record = Entrez.read(handle)
-            handle.close()
+            with track_upstream("pubmed"):
+                handle = Entrez.esearch(db="pubmed", term=query, retmax=max_results, sort="relevance")
+                record = Entrez.read(handle)
+                handle.close()
             
             id_list = record["IdList"]
             if not id_list:
                 return []
             
             # Fetch details
-            handle = Entrez.efetch(db="pubmed", id=id_list, rettype="medline", retmode="xml")
-            records = Entrez.read(handle)
-            handle.close()
+            with track_upstream("pubmed"):
+                handle = Entrez.efetch(db="pubmed", id=id_list, rettype="medline", retmode="xml")
+                records = Entrez.read(handle)
+                handle.close()
             
             publications = []
             for article in records['PubmedArticle']:
@@ -102,10 +106,11 @@ class ClinicalTrialsService:
                 params["query.cond"] = condition if condition else ""
                 params["query.locn"] = location if location else ""
             
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(ClinicalTrialsService.BASE_URL, params=params)
-                response.raise_for_status()
-                data = response.json()
+            with track_upstream("clinicaltrials"):
+                async with httpx.AsyncClient(timeout=30.0) as client:
+                    response = await client.get(ClinicalTrialsService.BASE_URL, params=params)
+                    response.raise_for_status()
+                    data = response.json()
             
             trials = []
             for study in data.get("studies", []):
@@ -155,11 +160,12 @@ class ORCIDService:
         try:
             async with httpx.AsyncClient(timeout=30.0) as client:
                 headers = {"Accept": "application/json"}
-                response = await client.get(
-                    f"{ORCIDService.BASE_URL}/{orcid_id}/person",
-                    headers=headers
-                )
-                response.raise_for_status()
+                with track_upstream("orcid"):
+                    response = await client.get(
+                        f"{ORCIDService.BASE_URL}/{orcid_id}/person",
+                        headers=headers
+                    )
+                    response.raise_for_status()
                 data = response.json()
                 
                 # Extract basic info
@@ -181,12 +187,13 @@ class ORCIDService:
         try:
             async with httpx.AsyncClient(timeout=30.0) as client:
                 headers = {"Accept": "application/json"}
-                response = await client.get(
-                    f"{ORCIDService.BASE_URL}/search",
-                    params={"q": query, "rows": max_results},
-                    headers=headers
-                )
-                response.raise_for_status()
+                with track_upstream("orcid"):
+                    response = await client.get(
+                        f"{ORCIDService.BASE_URL}/search",
+                        params={"q": query, "rows": max_results},
+                        headers=headers
+                    )
+                    response.raise_for_status()
                 data = response.json()
                 
                 researchers = []
@@ -16,5 +16,14 @@ FLUSH PRIVILEGES;
 -- Use the database
 USE curalink;
 
+-- Versioned schema migrations (see migrations.py). Tables and indexes are
+-- created by the application on startup or by create_database.py; each applied
+-- migration is recorded here so it never runs twice.
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INT NOT NULL PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
 -- Show success message
 SELECT 'Database setup complete! You can now run the FastAPI application.' AS message;
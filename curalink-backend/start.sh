@@ -15,7 +15,7 @@ source venv/bin/activate
 
 # Install dependencies
 echo "📥 Installing dependencies..."
-pip install -q pymysql python-dotenv
+pip install -q pymysql aiomysql aiosqlite python-dotenv "sqlalchemy[asyncio]"
 
 # Create database
 echo ""
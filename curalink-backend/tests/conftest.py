@@ -0,0 +1,19 @@
+"""
+Shared test setup. Run from curalink-backend:
+
+    pip install -r requirements-dev.txt
+    python -m pytest
+
+Async tests use anyio's pytest plugin (anyio ships with FastAPI).
+"""
+
+import os
+
+# Importing models creates the app's engine; never point it at a real database
+os.environ["DATABASE_URL"] = "sqlite://"
+
+import pytest
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
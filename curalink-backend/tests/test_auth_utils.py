@@ -0,0 +1,13 @@
+from datetime import timedelta
+
+from auth_utils import create_access_token, token_subject
+
+def test_token_subject_returns_the_user_id():
+    assert token_subject(create_access_token({"sub": "5"})) == "5"
+
+def test_token_subject_rejects_bad_tokens():
+    token = create_access_token({"sub": "5"})
+    assert token_subject(token[:-2] + ("AA" if token[-2:] != "AA" else "BB")) is None
+    assert token_subject("not a token") is None
+    assert token_subject(create_access_token({"sub": "5"}, timedelta(seconds=-1))) is None
+    assert token_subject(create_access_token({"role": "patient"})) is None
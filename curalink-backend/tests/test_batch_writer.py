@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from batch_writer import BatchWriter
+
+pytestmark = pytest.mark.anyio
+
+class Store:
+    """Flush function that records batches, assigns ids and rejects items marked bad"""
+
+    def __init__(self):
+        self.batches = []
+        self.rows = []
+
+    async def flush(self, items):
+        self.batches.append([item["name"] for item in items])
+        if any(item.get("bad") for item in items):
+            raise ValueError("bad row")  # Nothing stored, like a rolled back transaction
+        for item in items:
+            self.rows.append(item)
+            item["id"] = len(self.rows)
+
+async def test_concurrent_writes_share_a_batch():
+    store = Store()
+    writer = BatchWriter("test", store.flush, max_batch=10, max_delay_ms=5)
+    items = await asyncio.gather(*[writer.write({"name": n}) for n in "abc"])
+    assert store.batches == [["a", "b", "c"]]
+    assert [item["id"] for item in items] == [1, 2, 3]
+
+async def test_full_batch_is_written_without_waiting():
+    store = Store()
+    writer = BatchWriter("test", store.flush, max_batch=2, max_delay_ms=60_000)
+    items = await asyncio.wait_for(asyncio.gather(*[writer.write({"name": n}) for n in "abcd"]), timeout=1)
+    assert store.batches == [["a", "b"], ["c", "d"]]
+    assert [item["id"] for item in items] == [1, 2, 3, 4]
+
+async def test_sequential_writes_are_separate_batches():
+    store = Store()
+    writer = BatchWriter("test", store.flush, max_batch=10, max_delay_ms=0)
+    await writer.write({"name": "a"})
+    await writer.write({"name": "b"})
+    assert store.batches == [["a"], ["b"]]
+
+async def test_cancelled_producer_does_not_cancel_the_batch():
+    store = Store()
+    writer = BatchWriter("test", store.flush, max_batch=10, max_delay_ms=20)
+    cancelled = asyncio.ensure_future(writer.write({"name": "a"}))
+    other = asyncio.ensure_future(writer.write({"name": "b"}))
+    await asyncio.sleep(0)
+    cancelled.cancel()
+    assert (await other)["id"] == 2
+    assert [item["name"] for item in store.rows] == ["a", "b"]
+
+async def test_failed_batch_gives_each_producer_its_own_result():
+    store = Store()
+    writer = BatchWriter("test", store.flush, max_batch=10, max_delay_ms=5)
+    results = await asyncio.gather(
+        writer.write({"name": "a"}), writer.write({"name": "b", "bad": True}), writer.write({"name": "c"}),
+        return_exceptions=True
+    )
+    assert store.batches == [["a", "b", "c"], ["a"], ["b"], ["c"]]
+    assert results[0]["id"] == 1 and results[2]["id"] == 2
+    assert isinstance(results[1], ValueError)
+
+async def test_failed_single_write_is_not_retried():
+    store = Store()
+    writer = BatchWriter("test", store.flush, max_batch=10, max_delay_ms=0)
+    with pytest.raises(ValueError):
+        await writer.write({"name": "a", "bad": True})
+    assert store.batches == [["a"]]
@@ -0,0 +1,70 @@
+import base64
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+import delta_sync
+from delta_sync import (
+    cursor_int, decode_cursor, delta_response, encode_cursor, is_expired, make_etag, not_modified
+)
+
+def request_with(**headers) -> Request:
+    return Request({"type": "http", "headers": [(k.replace("_", "-").encode(), v.encode()) for k, v in headers.items()]})
+
+def test_cursor_round_trips_timestamps():
+    changed, deleted = datetime(2026, 1, 2, 3, 4, 5, 678901), datetime(2026, 1, 1)
+    cursor = encode_cursor(changed, deleted)
+    assert "=" not in cursor
+    position = decode_cursor(cursor)
+    assert datetime.fromisoformat(position["c"]) == changed
+    assert position["d"] == deleted
+    assert datetime.utcnow() - position["t"] < timedelta(seconds=5)
+
+def test_cursor_round_trips_ids():
+    position = decode_cursor(encode_cursor(42))
+    assert cursor_int(position["c"]) == 42
+    assert position["d"] is None
+
+@pytest.mark.parametrize("cursor", [
+    "not base64 at all!",
+    base64.urlsafe_b64encode(b"[1, 2]").decode(),
+    base64.urlsafe_b64encode(json.dumps({"c": 1, "t": "yesterday"}).encode()).decode(),
+])
+def test_malformed_cursor_is_a_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    assert error.value.status_code == 400
+
+def test_non_numeric_id_cursor_is_a_400():
+    with pytest.raises(HTTPException):
+        cursor_int("abc")
+
+def test_cursor_expires_with_the_tombstones(monkeypatch):
+    monkeypatch.setattr(delta_sync, "SYNC_TOMBSTONE_DAYS", 30)
+    fresh = decode_cursor(encode_cursor(1))
+    assert not is_expired(fresh)
+    assert is_expired({**fresh, "t": datetime.utcnow() - timedelta(days=31)})
+    assert is_expired({**fresh, "t": None})
+
+def test_etag_changes_with_the_version():
+    assert make_etag("notifications", 1, 3, datetime(2026, 1, 1)) == make_etag("notifications", 1, 3, datetime(2026, 1, 1))
+    assert make_etag("notifications", 1, 3, None) != make_etag("notifications", 1, 4, None)
+    assert make_etag("messages", 1, 2, 10, 0) != make_etag("messages", 1, 2, 10, 1)
+    assert make_etag("a").startswith('W/"')
+
+def test_not_modified_matches_the_etag():
+    etag = make_etag("favorites", 1)
+    assert not_modified(request_with(), etag) is None
+    assert not_modified(request_with(if_none_match='W/"other"'), etag) is None
+    for header in (etag, f'W/"other", {etag}', "*"):
+        response = not_modified(request_with(if_none_match=header), etag)
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag
+
+def test_delta_response_shape():
+    response = delta_response([{"id": 1}], [7, "abc"], "cursor", make_etag("x"), full=True)
+    assert json.loads(response.body) == {"items": [{"id": 1}], "deleted": ["7", "abc"], "cursor": "cursor", "full": True}
+    assert response.headers["cache-control"] == "private, no-cache"
@@ -0,0 +1,85 @@
+import pytest
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from database import Base
+from models import Forum, ForumPost, User
+from routers.forums import delete_post, get_forum_posts
+
+pytestmark = pytest.mark.anyio
+
+@pytest.fixture
+async def db(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'forums.db'}")
+    event.listen(engine.sync_engine, "connect", lambda connection, _: connection.execute("PRAGMA foreign_keys=ON"))
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        yield session
+    await engine.dispose()
+
+async def add_post(db, forum, parent=None):
+    post = ForumPost(forum_id=forum.id, author_id=1, parent_id=parent.id if parent else None, content="x")
+    db.add(post)
+    await db.flush()
+    post.path = ForumPost.build_path(parent.path if parent else None, post.id)
+    if parent:
+        parent.reply_count += 1
+    forum.post_count += 1
+    await db.commit()
+    return post
+
+async def test_posts_are_complete_unless_a_client_pages(db):
+    author = User(id=1, email="a@b.c", hashed_password="x", full_name="A", role="researcher")
+    forum = Forum(title="F", post_count=0)
+    db.add_all([author, forum])
+    await db.commit()
+    for _ in range(25):
+        root = await add_post(db, forum)
+    for _ in range(5):
+        await add_post(db, forum, root)
+
+    everything = await get_forum_posts(forum.id, db=db, current_user=author, skip=0, limit=None, reply_limit=None)
+    assert len(everything) == 25
+    assert len(everything[-1]["replies"]) == everything[-1]["reply_count"] == 5
+
+    page = await get_forum_posts(forum.id, db=db, current_user=author, skip=20, limit=10, reply_limit=2)
+    assert len(page) == 5
+    assert (len(page[-1]["replies"]), page[-1]["reply_count"]) == (2, 5)
+
+async def test_delete_post_removes_its_replies_deepest_first(db):
+    author = User(id=1, email="a@b.c", hashed_password="x", full_name="A", role="researcher")
+    forum = Forum(title="F", post_count=0)
+    db.add_all([author, forum])
+    await db.commit()
+    root = await add_post(db, forum)
+    reply = await add_post(db, forum, root)
+    nested = await add_post(db, forum, reply)
+    await add_post(db, forum, nested)
+    sibling = await add_post(db, forum, root)
+
+    deleted = []
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("DELETE"):
+            deleted.append(list(parameters))
+    event.listen(db.bind.sync_engine, "before_cursor_execute", record)
+
+    await delete_post(forum.id, reply.id, db=db, current_user=author)
+
+    assert [ids[0] for ids in deleted] == [nested.id + 1, nested.id, reply.id]
+    remaining = (await db.execute(select(ForumPost.id).order_by(ForumPost.id))).scalars().all()
+    assert remaining == [root.id, sibling.id]
+    await db.refresh(forum)
+    await db.refresh(root)
+    assert (forum.post_count, root.reply_count) == (2, 1)
+
+async def test_only_the_author_can_delete(db):
+    from fastapi import HTTPException
+
+    forum = Forum(title="F", post_count=0)
+    db.add_all([User(id=1, email="a@b.c", hashed_password="x", full_name="A", role="researcher"), forum])
+    await db.commit()
+    post = await add_post(db, forum)
+    with pytest.raises(HTTPException) as error:
+        await delete_post(forum.id, post.id, db=db, current_user=User(id=2))
+    assert error.value.status_code == 403
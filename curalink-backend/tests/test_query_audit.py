@@ -0,0 +1,38 @@
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.dialects import postgresql
+
+from migrations import run_migrations
+from models import ChatMessage
+from query_audit import HOT_QUERIES, assert_no_full_scans, audit_query_plans, find_full_scans
+
+@pytest.fixture
+def connection():
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        run_migrations(connection)
+        yield connection
+
+def test_hot_queries_use_an_index(connection):
+    assert HOT_QUERIES
+    assert_no_full_scans(connection)
+
+def test_full_scan_is_reported(connection):
+    unindexed = select(ChatMessage).where(ChatMessage.message == "hello")
+    assert find_full_scans(connection, unindexed) == ["chat_messages"]
+    assert audit_query_plans(connection, {"unindexed": lambda: unindexed}) == {"unindexed": ["chat_messages"]}
+    with pytest.raises(AssertionError, match="unindexed scans chat_messages"):
+        assert_no_full_scans(connection, {"unindexed": lambda: unindexed})
+
+class _PostgresConnection:
+    dialect = postgresql.dialect()
+
+    def execute(self, *args, **kwargs):
+        raise AssertionError("plans of unsupported dialects must not be requested")
+
+def test_unsupported_dialect_is_skipped_not_passed():
+    connection = _PostgresConnection()
+    assert find_full_scans(connection, select(ChatMessage)) is None
+    assert audit_query_plans(connection) == {name: None for name in HOT_QUERIES}
+    with pytest.raises(AssertionError, match="can't be audited on postgresql"):
+        assert_no_full_scans(connection)
@@ -0,0 +1,48 @@
+import pytest
+from sqlalchemy import create_engine, insert, select, update
+from sqlalchemy.dialects import mysql
+
+from database import Base
+from models import Forum, ForumPost
+from reconcile_counters import reconcile_sql_forum_counters
+
+forums = Forum.__table__
+posts = ForumPost.__table__
+
+@pytest.fixture
+def connection():
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        Base.metadata.create_all(connection)
+        connection.execute(insert(forums), [{"id": 1, "title": "a"}, {"id": 2, "title": "b"}])
+        connection.execute(insert(posts), [
+            {"id": 1, "forum_id": 1, "parent_id": None, "content": "root"},
+            {"id": 2, "forum_id": 1, "parent_id": 1, "content": "reply"},
+            {"id": 3, "forum_id": 1, "parent_id": 2, "content": "reply of a reply"},
+            {"id": 4, "forum_id": 1, "parent_id": 1, "content": "reply"},
+        ])
+        yield connection
+
+def counters(connection):
+    return (
+        dict(connection.execute(select(forums.c.id, forums.c.post_count)).all()),
+        dict(connection.execute(select(posts.c.id, posts.c.reply_count)).all()),
+    )
+
+def test_repairs_drifted_counters(connection):
+    connection.execute(update(forums).where(forums.c.id == 2).values(post_count=5))
+    assert reconcile_sql_forum_counters(connection) == 4  # Both forums, and posts 1 and 2 (inserted with no counts)
+    assert counters(connection) == ({1: 4, 2: 0}, {1: 2, 2: 1, 3: 0, 4: 0})
+
+def test_correct_counters_are_left_alone(connection):
+    reconcile_sql_forum_counters(connection)
+    assert reconcile_sql_forum_counters(connection) == 0
+
+def test_no_update_selects_from_its_own_table(connection, monkeypatch):
+    """MySQL rejects an UPDATE whose subquery reads the table being updated (error 1093)"""
+    statements = []
+    execute = connection.execute
+    monkeypatch.setattr(connection, "execute", lambda statement, *args: statements.append(statement) or execute(statement, *args))
+    reconcile_sql_forum_counters(connection)
+    updates = [str(s.compile(dialect=mysql.dialect())) for s in statements if s.is_dml]
+    assert updates and all("SELECT" not in sql for sql in updates)
@@ -0,0 +1,55 @@
+import pytest
+
+import ttl_cache
+from ttl_cache import TTLCache
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ttl_cache.time, "monotonic", lambda: now[0])
+    return now
+
+def test_hit_and_miss():
+    cache = TTLCache("test", ttl_seconds=30)
+    assert cache.get("a") is None
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.stats()["hit_rate"] == 0.5
+
+def test_entries_expire_after_ttl(clock):
+    cache = TTLCache("test", ttl_seconds=30)
+    cache.set("a", 1)
+    clock[0] += 29.9
+    assert cache.get("a") == 1
+    clock[0] += 0.1
+    assert cache.get("a") is None
+    assert cache.evictions == 1
+    assert cache.stats()["size"] == 0
+
+def test_setting_again_restarts_the_ttl(clock):
+    cache = TTLCache("test", ttl_seconds=30)
+    cache.set("a", 1)
+    clock[0] += 20
+    cache.set("a", 2)
+    clock[0] += 20
+    assert cache.get("a") == 2
+
+def test_oldest_entry_is_evicted_when_full():
+    cache = TTLCache("test", ttl_seconds=30, max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.set("b", 3)  # Replacing an entry never evicts
+    assert cache.evictions == 0
+    cache.set("c", 4)
+    assert cache.get("a") is None
+    assert (cache.get("b"), cache.get("c")) == (3, 4)
+    assert cache.evictions == 1
+
+def test_invalidate_counts_only_present_keys():
+    cache = TTLCache("test", ttl_seconds=30)
+    cache.set("a", 1)
+    cache.invalidate("a")
+    cache.invalidate("a")
+    assert cache.get("a") is None
+    assert cache.invalidations == 1
@@ -0,0 +1,102 @@
+import pytest
+
+import unread_counters
+from unread_counters import ALL, UnreadCounters
+
+pytestmark = pytest.mark.anyio
+
+class FakeStore:
+    """Unread rows per user and bucket, counted the way the SQL/Mongo loaders do"""
+
+    def __init__(self, rows=None):
+        self.rows = rows or {}
+        self.loads = []
+        self.during_load = None
+
+    async def load(self, user_ids):
+        self.loads.append(list(user_ids))
+        if self.during_load:
+            self.during_load()
+        return {user_id: dict(self.rows[user_id]) for user_id in user_ids if user_id in self.rows}
+
+async def test_counts_load_once_then_come_from_memory():
+    store = FakeStore({1: {None: 3}})
+    counters = UnreadCounters("test", store.load)
+    assert await counters.total(1) == 3
+    assert await counters.total(1) == 3
+    assert await counters.counts(2) == {}
+    assert store.loads == [[1], [2]]
+    assert (counters.hits, counters.misses) == (1, 2)
+
+async def test_writers_adjust_cached_counts():
+    store = FakeStore({1: {"a": 2, "b": 1}})
+    counters = UnreadCounters("test", store.load)
+    await counters.counts(1)
+    counters.increment(1, "a")
+    counters.decrement(1, "b", 5)  # Never below zero
+    assert await counters.counts(1) == {"a": 3}
+    counters.clear(1, "a")
+    assert await counters.counts(1) == {}
+    counters.increment(1, "c", 2)
+    counters.clear(1, ALL)
+    assert await counters.total(1) == 0
+
+async def test_writes_for_uncached_users_are_left_to_the_next_load():
+    store = FakeStore({1: {None: 1}})
+    counters = UnreadCounters("test", store.load)
+    counters.increment(1)  # Already in the store; must not be counted twice
+    assert await counters.total(1) == 1
+
+async def test_reconcile_repairs_drift():
+    store = FakeStore({1: {None: 2}, 2: {None: 1}})
+    counters = UnreadCounters("test", store.load)
+    await counters.counts(1)
+    await counters.counts(2)
+    store.rows[1] = {None: 5}  # Written by another worker
+    assert await counters.reconcile() == 1
+    assert await counters.total(1) == 5
+    assert counters.stats()["repairs"] == 1
+    assert await counters.reconcile() == 0
+
+async def test_reconcile_keeps_a_count_written_to_while_recounting():
+    store = FakeStore({1: {None: 1}})
+    counters = UnreadCounters("test", store.load)
+    await counters.counts(1)
+    store.rows[1] = {None: 2}
+    # The insert lands after the recount read the store
+    store.during_load = lambda: counters.increment(1)
+    assert await counters.reconcile() == 0
+    assert await counters.total(1) == 2
+    store.during_load = None
+    assert await counters.reconcile() == 0
+
+async def test_a_load_racing_a_write_is_not_cached():
+    store = FakeStore({1: {None: 1}})
+    counters = UnreadCounters("test", store.load)
+    store.during_load = lambda: counters.increment(1)
+    assert await counters.total(1) == 1
+    store.during_load = None
+    store.rows[1] = {None: 2}
+    assert await counters.total(1) == 2
+    assert len(store.loads) == 2
+
+async def test_reconcile_loads_in_batches(monkeypatch):
+    monkeypatch.setattr(unread_counters, "RECONCILE_BATCH_SIZE", 2)
+    store = FakeStore({user_id: {None: 1} for user_id in range(5)})
+    counters = UnreadCounters("test", store.load)
+    for user_id in range(5):
+        await counters.counts(user_id)
+    store.loads.clear()
+    await counters.reconcile()
+    assert store.loads == [[0, 1], [2, 3], [4]]
+
+async def test_oldest_user_is_evicted_at_max_users():
+    store = FakeStore({1: {None: 1}, 2: {None: 2}, 3: {None: 3}})
+    counters = UnreadCounters("test", store.load, max_users=2)
+    for user_id in (1, 2, 3):
+        await counters.counts(user_id)
+    assert counters.stats()["size"] == 2
+    assert counters.evictions == 1
+    store.loads.clear()
+    await counters.counts(1)
+    assert store.loads == [[1]]
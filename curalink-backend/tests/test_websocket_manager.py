@@ -0,0 +1,185 @@
+import asyncio
+import json
+
+import pytest
+
+import websocket_manager
+from backplane import InProcessBackplane
+from websocket_manager import ClientConnection, ConnectionManager, OutboundMessage, SLOW_CONSUMER_CLOSE_CODE
+
+pytestmark = pytest.mark.anyio
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+        self.close_code = None
+
+    async def send_text(self, text: str):
+        self.sent.append(text)
+
+    async def close(self, code: int = 1000):
+        self.close_code = code
+
+def make_manager(**options) -> ConnectionManager:
+    options.setdefault("max_size", 6)
+    options.setdefault("high_water", 3)
+    options.setdefault("evict_after", 5)
+    return ConnectionManager(backplane=InProcessBackplane(), **options)
+
+def register(manager: ConnectionManager, user_id: str = "1") -> ClientConnection:
+    """A connection whose writer is not running, so its buffer only grows"""
+    connection = ClientConnection(user_id, FakeWebSocket(), manager)
+    manager.active_connections.setdefault(user_id, set()).add(connection)
+    return connection
+
+def message(message_type: str, **fields) -> OutboundMessage:
+    return OutboundMessage(json.dumps({"type": message_type, **fields}))
+
+async def test_coalescing_messages_replace_the_queued_one():
+    connection = register(make_manager())
+    assert connection.enqueue(message("meeting_status_update", request_id=7, status="accepted"))
+    assert connection.enqueue(message("meeting_status_update", request_id=8, status="pending"))
+    assert connection.enqueue(message("meeting_status_update", request_id=7, status="cancelled"))
+    assert connection.depth == 2
+    assert [json.loads(m.text)["status"] for m in connection.buffer] == ["cancelled", "pending"]
+
+async def test_coalescing_without_a_key_is_kept():
+    connection = register(make_manager())
+    connection.enqueue(message("meeting_status_update", status="a"))
+    connection.enqueue(message("meeting_status_update", status="b"))
+    assert connection.depth == 2
+
+async def test_droppable_messages_are_discarded_above_high_water():
+    connection = register(make_manager())
+    for i in range(3):
+        assert connection.enqueue(message("chat_message", id=i))
+    assert not connection.enqueue(message("new_post", id=1))
+    assert connection.enqueue(message("chat_message", id=3))
+    assert [m.type for m in connection.buffer] == ["chat_message"] * 4
+
+async def test_full_buffer_evicts_the_consumer():
+    manager = make_manager()
+    connection = register(manager)
+    for i in range(6):
+        assert connection.enqueue(message("chat_message", id=i))
+    assert not connection.enqueue(message("chat_message", id=6))
+    await asyncio.sleep(0)  # Let the close task run
+    assert connection.closed
+    assert connection.websocket.close_code == SLOW_CONSUMER_CLOSE_CODE
+    assert manager.connection_count() == 0
+
+async def test_staying_above_high_water_evicts_the_consumer(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(websocket_manager.time, "monotonic", lambda: now[0])
+    connection = register(make_manager())
+    for i in range(4):
+        connection.enqueue(message("chat_message", id=i))
+    now[0] += 4.9
+    assert connection.enqueue(message("chat_message", id=4))
+    now[0] += 0.2
+    assert not connection.enqueue(message("chat_message", id=5))
+    assert connection.closed
+
+async def test_writer_sends_in_order_and_each_connection_gets_its_own_copy():
+    manager = make_manager()
+    first, second = register(manager), register(manager)
+    first.start()
+    second.start()
+    manager.deliver({"kind": "user", "user_id": "1", "message": json.dumps({"type": "chat", "n": 1}), "message_type": None})
+    manager.deliver({"kind": "user", "user_id": "1", "message": json.dumps({"type": "chat", "n": 2}), "message_type": None})
+    for _ in range(5):
+        await asyncio.sleep(0)
+    assert [json.loads(text)["n"] for text in first.websocket.sent] == [1, 2]
+    assert second.websocket.sent == first.websocket.sent
+    first.abort()
+    second.abort()
+
+async def test_topic_delivery_reaches_subscribers_once():
+    manager = make_manager()
+    subscriber, other = register(manager, "1"), register(manager, "2")
+    assert manager.subscribe(subscriber, ["forum:1", "thread:9", "bad topic"]) == (["forum:1", "thread:9"], ["bad topic"])
+    manager.deliver({"kind": "topic", "topics": ["forum:1", "thread:9"], "message": json.dumps({"type": "new_post"}), "message_type": None})
+    assert (subscriber.depth, other.depth) == (1, 0)
+    manager.disconnect(subscriber)
+    assert manager.topics == {}
+
+class HandshakeWebSocket(FakeWebSocket):
+    """A socket that has not been accepted yet, optionally with a token in its URL and queued frames"""
+
+    def __init__(self, query_token=None, frames=()):
+        super().__init__()
+        self.query_params = {"token": query_token} if query_token is not None else {}
+        self.frames = list(frames)
+        self.client_state = websocket_manager.WebSocketState.CONNECTING
+
+    async def accept(self):
+        self.client_state = websocket_manager.WebSocketState.CONNECTED
+
+    async def receive_text(self) -> str:
+        if not self.frames:
+            await asyncio.sleep(3600)
+        return self.frames.pop(0)
+
+def authenticating_manager() -> ConnectionManager:
+    manager = make_manager()
+    manager.token_verifier = lambda token: {"token-1": "1", "token-2": "2"}.get(token)
+    return manager
+
+async def test_token_in_query_string_authenticates():
+    manager = authenticating_manager()
+    connection = await manager.connect("1", HandshakeWebSocket(query_token="token-1"))
+    assert connection is not None and connection.user_id == "1"
+    assert connection.websocket.client_state == websocket_manager.WebSocketState.CONNECTED
+    connection.abort()
+
+async def test_token_in_first_frame_authenticates():
+    manager = authenticating_manager()
+    connection = await manager.connect("1", HandshakeWebSocket(frames=[json.dumps({"type": "auth", "token": "token-1"})]))
+    assert connection is not None
+    connection.abort()
+
+@pytest.mark.parametrize("websocket", [
+    HandshakeWebSocket(query_token="token-2"),
+    HandshakeWebSocket(query_token="forged"),
+    HandshakeWebSocket(frames=[json.dumps({"type": "subscribe", "topics": ["forums"]})]),
+    HandshakeWebSocket(frames=["not json"]),
+], ids=["other-users-token", "invalid-token", "no-auth-frame", "garbage-frame"])
+async def test_socket_without_the_users_token_is_closed(websocket):
+    manager = authenticating_manager()
+    assert await manager.connect("1", websocket) is None
+    assert websocket.close_code == websocket_manager.POLICY_VIOLATION_CLOSE_CODE
+    assert manager.connection_count() == 0
+
+async def test_silent_socket_times_out(monkeypatch):
+    monkeypatch.setattr(websocket_manager, "AUTH_TIMEOUT_SECONDS", 0.01)
+    websocket = HandshakeWebSocket()
+    assert await authenticating_manager().connect("1", websocket) is None
+    assert websocket.close_code == websocket_manager.POLICY_VIOLATION_CLOSE_CODE
+
+async def test_without_a_token_verifier_everything_is_rejected():
+    websocket = HandshakeWebSocket(query_token="token-1")
+    assert await make_manager().connect("1", websocket) is None
+
+@pytest.mark.parametrize("request_type", ["subscribe", "resume"])
+async def test_acting_as_another_user_closes_the_socket(request_type):
+    manager = authenticating_manager()
+    connection = await manager.connect("1", HandshakeWebSocket(query_token="token-1"))
+    assert await manager.handle_client_message(connection, {"type": request_type, "user_id": "2", "topics": ["forums"], "cursor": "x"})
+    await asyncio.sleep(0)
+    assert connection.closed
+    assert connection.websocket.close_code == websocket_manager.POLICY_VIOLATION_CLOSE_CODE
+    assert manager.topics == {}
+
+async def test_resume_replays_for_the_authenticated_user_only():
+    manager = authenticating_manager()
+    asked_for = []
+
+    async def replay(user_id, cursor):
+        asked_for.append(user_id)
+        return []
+
+    manager.resume_handler = replay
+    connection = await manager.connect("1", HandshakeWebSocket(query_token="token-1"))
+    assert await manager.handle_client_message(connection, {"type": "resume", "cursor": "abc"})
+    assert asked_for == ["1"]
+    connection.abort()
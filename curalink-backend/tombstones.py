@@ -0,0 +1,72 @@
+"""
+Deletion records for delta sync (SQL); see delta_sync.py.
+
+A delete endpoint calls record_deletion() in the same transaction as the
+delete, so a client syncing with `since` learns which ids to drop. Records
+older than SYNC_TOMBSTONE_DAYS are pruned as new ones are written.
+"""
+
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from delta_sync import tombstone_cutoff
+from models import SyncTombstone
+
+async def record_deletion(db: AsyncSession, collection: str, item_id, user_ids: Iterable[int]):
+    """Remember that `item_id` left `collection` for each of `user_ids`; the caller commits"""
+    user_ids = list(user_ids)
+    now = datetime.utcnow()
+    await _insert(db, [
+        {"user_id": user_id, "collection": collection, "item_id": str(item_id), "deleted_at": now}
+        for user_id in user_ids
+    ])
+    await _prune(db, user_ids)
+
+async def record_deletions(db: AsyncSession, collection: str, item_ids: Iterable, user_id: int):
+    """Remember that every one of `item_ids` left `user_id`'s `collection`; the caller commits"""
+    now = datetime.utcnow()
+    await _insert(db, [
+        {"user_id": user_id, "collection": collection, "item_id": str(item_id), "deleted_at": now}
+        for item_id in item_ids
+    ])
+    await _prune(db, [user_id])
+
+async def record_item_deletions(db: AsyncSession, collection: str, deletions: Iterable[Tuple[object, int]]):
+    """Remember each (item id, user id) pair of items that left `collection`; the caller commits"""
+    now = datetime.utcnow()
+    rows = [
+        {"user_id": user_id, "collection": collection, "item_id": str(item_id), "deleted_at": now}
+        for item_id, user_id in deletions
+    ]
+    await _insert(db, rows)
+    await _prune(db, list({row["user_id"] for row in rows}))
+
+async def _insert(db: AsyncSession, rows: List[dict]):
+    # Core executemany: no ids to fetch back, so drivers send one batched INSERT
+    if rows:
+        await db.execute(insert(SyncTombstone), rows)
+
+async def _prune(db: AsyncSession, user_ids: List[int]):
+    await db.execute(delete(SyncTombstone).where(
+        SyncTombstone.user_id.in_(user_ids),
+        SyncTombstone.deleted_at < tombstone_cutoff()
+    ))
+
+async def latest_deletion(db: AsyncSession, user_id: int, collection: str) -> Optional[datetime]:
+    return await db.scalar(select(func.max(SyncTombstone.deleted_at)).where(
+        SyncTombstone.user_id == user_id,
+        SyncTombstone.collection == collection
+    ))
+
+async def deleted_since(db: AsyncSession, user_id: int, collection: str, since: Optional[datetime]) -> List[str]:
+    """Ids deleted at or after `since` (every remembered deletion when None)"""
+    query = select(SyncTombstone.item_id).where(
+        SyncTombstone.user_id == user_id,
+        SyncTombstone.collection == collection
+    )
+    if since is not None:
+        query = query.where(SyncTombstone.deleted_at >= since)
+    return list((await db.scalars(query.order_by(SyncTombstone.deleted_at))).all())
@@ -0,0 +1,63 @@
+import time
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+class TTLCache:
+    """Small in-process cache whose entries expire after a fixed time-to-live.
+
+    Meant for hot, rarely changing lookups. Each worker process has its own
+    copy, so writers must call invalidate() and the TTL bounds how stale
+    another worker's copy can get.
+    """
+
+    def __init__(self, name: str, ttl_seconds: float, max_entries: int = 10000):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            self.evictions += 1
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any):
+        if key not in self._entries and len(self._entries) >= self.max_entries:
+            # Dicts keep insertion order, so the first key is the oldest entry
+            del self._entries[next(iter(self._entries))]
+            self.evictions += 1
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+
+    def invalidate(self, key: Hashable):
+        if self._entries.pop(key, None) is not None:
+            self.invalidations += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "ttl_seconds": self.ttl_seconds
+        }
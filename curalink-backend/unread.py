@@ -0,0 +1,40 @@
+"""
+Unread notification and chat counters (SQL); see unread_counters.py.
+
+    unread_notifications   user id -> {None: unread notifications}
+    unread_messages        user id -> {sender id: unread messages from them}
+
+Routers adjust them after committing the write they describe.
+"""
+
+from typing import Dict, List
+
+from sqlalchemy import func, select
+
+from database import SessionLocal
+from models import ChatMessage, Notification
+from unread_counters import UnreadCounters
+
+async def _count_notifications(user_ids: List[int]) -> Dict[int, dict]:
+    async with SessionLocal() as db:
+        rows = (await db.execute(
+            select(Notification.user_id, func.count())
+            .where(Notification.user_id.in_(user_ids), Notification.read == False)
+            .group_by(Notification.user_id)
+        )).all()
+    return {user_id: {None: count} for user_id, count in rows}
+
+async def _count_messages(user_ids: List[int]) -> Dict[int, dict]:
+    async with SessionLocal() as db:
+        rows = (await db.execute(
+            select(ChatMessage.receiver_id, ChatMessage.sender_id, func.count())
+            .where(ChatMessage.receiver_id.in_(user_ids), ChatMessage.read == False)
+            .group_by(ChatMessage.receiver_id, ChatMessage.sender_id)
+        )).all()
+    counts: Dict[int, dict] = {}
+    for receiver_id, sender_id, count in rows:
+        counts.setdefault(receiver_id, {})[sender_id] = count
+    return counts
+
+unread_notifications = UnreadCounters("unread_notifications", _count_notifications)
+unread_messages = UnreadCounters("unread_messages", _count_messages)
@@ -0,0 +1,181 @@
+"""
+In-memory unread counters for notification and chat badges.
+
+Badge counts are requested on every page, so instead of a COUNT(*) per call
+each worker keeps per-user counts in memory:
+
+- The first request for a user loads them with one grouped count.
+- Writers adjust them: increment() on insert, decrement() when one item is
+  read or deleted, clear() when a conversation or everything is marked read.
+- reconcile() periodically recounts every cached user in batches and repairs
+  what drifted: writes made by other workers, rows changed outside the
+  routers, or a failed request that adjusted a counter it shouldn't have.
+  UNREAD_RECONCILE_SECONDS bounds how stale a count can get.
+
+Each user's counts are split into buckets: the sender id for chat (unread
+messages per conversation) and a single None bucket for notifications.
+"""
+
+import asyncio
+import os
+import time
+from typing import Awaitable, Callable, Dict, Hashable, List, Optional, Set
+
+from dotenv import load_dotenv
+
+from metrics import Counter
+
+load_dotenv()
+
+UNREAD_RECONCILE_SECONDS = float(os.getenv("UNREAD_RECONCILE_SECONDS", "30"))
+UNREAD_MAX_USERS = int(os.getenv("UNREAD_MAX_USERS", "50000"))
+RECONCILE_BATCH_SIZE = 500
+
+REPAIRS = Counter("unread_counter_repairs_total", "Cached unread counts corrected by reconciliation", ["counter"])
+
+Counts = Dict[Optional[Hashable], int]
+# Grouped count for a batch of users: {user_id: {bucket: unread}}; users with nothing unread may be missing
+Loader = Callable[[List[Hashable]], Awaitable[Dict[Hashable, Counts]]]
+
+ALL = object()  # clear() every bucket
+
+class UnreadCounters:
+    """Per-user unread counts served from memory, loaded on first use and reconciled periodically"""
+
+    def __init__(self, name: str, load: Loader, max_users: int = UNREAD_MAX_USERS):
+        self.name = name
+        self._load = load
+        self.max_users = max_users
+        self._counts: Dict[Hashable, Counts] = {}
+        # Adjustments per user, so a recount that raced with a write is not stored
+        self._writes: Dict[Hashable, int] = {}
+        self._loading: Set[Hashable] = set()
+        self._task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.repairs = 0
+        self.reconciled_at: Optional[float] = None
+
+    async def counts(self, user_id: Hashable) -> Counts:
+        """Unread count per bucket for one user (only non-zero buckets)"""
+        counts = self._counts.get(user_id)
+        if counts is not None:
+            self.hits += 1
+            return {bucket: count for bucket, count in counts.items() if count}
+
+        self.misses += 1
+        writes = self._writes.get(user_id, 0)
+        self._loading.add(user_id)
+        try:
+            counts = dict((await self._load([user_id])).get(user_id, {}))
+        finally:
+            self._loading.discard(user_id)
+        if self._writes.get(user_id, 0) == writes:
+            self._store(user_id, counts)
+        else:
+            # A write landed while counting; serve this result but count again next time
+            self._writes.pop(user_id, None)
+        return {bucket: count for bucket, count in counts.items() if count}
+
+    async def total(self, user_id: Hashable) -> int:
+        return sum((await self.counts(user_id)).values())
+
+    def increment(self, user_id: Hashable, bucket: Optional[Hashable] = None, amount: int = 1):
+        counts = self._adjust(user_id)
+        if counts is not None:
+            counts[bucket] = counts.get(bucket, 0) + amount
+
+    def decrement(self, user_id: Hashable, bucket: Optional[Hashable] = None, amount: int = 1):
+        counts = self._adjust(user_id)
+        if counts is not None:
+            counts[bucket] = max(counts.get(bucket, 0) - amount, 0)
+
+    def clear(self, user_id: Hashable, bucket=ALL):
+        """Nothing unread in `bucket` (or at all) any more"""
+        counts = self._adjust(user_id)
+        if counts is None:
+            return
+        if bucket is ALL:
+            counts.clear()
+        else:
+            counts.pop(bucket, None)
+
+    def _adjust(self, user_id: Hashable) -> Optional[Counts]:
+        """The cached counts to change, or None when the user isn't cached (the next load counts the write)"""
+        counts = self._counts.get(user_id)
+        if counts is not None or user_id in self._loading:
+            self._writes[user_id] = self._writes.get(user_id, 0) + 1
+        return counts
+
+    def _store(self, user_id: Hashable, counts: Counts):
+        if user_id not in self._counts and len(self._counts) >= self.max_users:
+            # Dicts keep insertion order, so the first user is the oldest entry
+            oldest = next(iter(self._counts))
+            del self._counts[oldest]
+            self._writes.pop(oldest, None)
+            self.evictions += 1
+        self._counts[user_id] = counts
+
+    async def reconcile(self) -> int:
+        """Recount every cached user; returns how many had drifted"""
+        user_ids = list(self._counts)
+        repaired = 0
+        for start in range(0, len(user_ids), RECONCILE_BATCH_SIZE):
+            batch = user_ids[start:start + RECONCILE_BATCH_SIZE]
+            writes = {user_id: self._writes.get(user_id, 0) for user_id in batch}
+            actual = await self._load(batch)
+            for user_id in batch:
+                cached = self._counts.get(user_id)
+                if cached is None or self._writes.get(user_id, 0) != writes[user_id]:
+                    continue  # Evicted or written to meanwhile; the next pass checks it
+                counts = {bucket: count for bucket, count in actual.get(user_id, {}).items() if count}
+                if {bucket: count for bucket, count in cached.items() if count} != counts:
+                    self._counts[user_id] = counts
+                    repaired += 1
+            # Write sequences only need to outlive one batch
+            for user_id in batch:
+                if self._writes.get(user_id, 0) == writes[user_id]:
+                    self._writes.pop(user_id, None)
+        if repaired:
+            self.repairs += repaired
+            REPAIRS.labels(counter=self.name).inc(repaired)
+        self.reconciled_at = time.time()
+        return repaired
+
+    def start(self, interval: float = UNREAD_RECONCILE_SECONDS):
+        """Reconcile every `interval` seconds in the background"""
+        if self._task is None and interval > 0:
+            self._task = asyncio.get_running_loop().create_task(self._reconcile_forever(interval))
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _reconcile_forever(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                repaired = await self.reconcile()
+                if repaired:
+                    print(f"🔧 Repaired {repaired} drifted {self.name} unread count(s)")
+            except Exception as e:
+                print(f"❌ Reconciling {self.name} unread counts failed: {e}")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "size": len(self._counts),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "repairs": self.repairs,
+            "reconciled_at": self.reconciled_at
+        }
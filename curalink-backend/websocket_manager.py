@@ -1,40 +1,457 @@
-from fastapi import WebSocket
-from typing import Dict
+"""
+WebSocket connection registry with per-connection backpressure.
+
+A user can be connected from several tabs or devices at once, so every user
+id maps to a set of connections. Sending never awaits a socket: each
+connection owns a send buffer drained by its own writer task, so request
+handlers only enqueue and HTTP latency does not depend on the recipient's
+network.
+
+Each message type has a delivery policy, applied per connection:
+
+    keep       always buffered (chat, meeting requests)
+    coalesce   a newer message with the same key replaces the queued one
+               (status updates: only the latest matters)
+    drop       discarded while the buffer is above the high-water mark
+               (forum broadcasts the client can refetch)
+
+Besides per-user messages and broadcasts, clients subscribe to topics over
+the same socket ({"type": "subscribe", "topics": ["forum:3", "thread:17"]})
+and publish() reaches only the connections subscribed to them, through a
+topic -> connections index.
+
+Sockets are authenticated before they are registered: the client passes its
+access token as ?token=... or in its first frame ({"type": "auth", "token":
+"..."}), and the socket is closed with 1008 unless the token was issued to
+the user id in the URL. Subscriptions and resumes then act for that user only.
+
+A reconnecting client sends {"type": "resume", "cursor": "<last event cursor>"};
+the app's resume_handler returns the events it missed, or None when it cannot
+replay them and the client should {"type": "resync"} (refetch over HTTP).
+
+A consumer is evicted (closed with 1013, the client reconnects) when its
+buffer reaches WS_BUFFER_MAX, when it stays above the high-water mark for
+WS_EVICT_AFTER_SECONDS without draining back to the low-water mark, or when
+a single send takes longer than WS_SEND_TIMEOUT_SECONDS.
+"""
+
+from fastapi import WebSocket, WebSocketDisconnect
+from starlette.websockets import WebSocketState
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from collections import deque
+import asyncio
 import json
+import os
+import re
+import time
+
+from dotenv import load_dotenv
+
+from metrics import Counter, Gauge, Histogram
+from backplane import Backplane, create_backplane
+
+load_dotenv()
+
+BUFFER_MAX = int(os.getenv("WS_BUFFER_MAX", "200"))
+BUFFER_HIGH_WATER = int(os.getenv("WS_BUFFER_HIGH_WATER", "50"))
+EVICT_AFTER_SECONDS = float(os.getenv("WS_EVICT_AFTER_SECONDS", "5"))
+SEND_TIMEOUT_SECONDS = float(os.getenv("WS_SEND_TIMEOUT_SECONDS", "10"))
+MAX_TOPICS_PER_CONNECTION = int(os.getenv("WS_MAX_TOPICS_PER_CONNECTION", "100"))
+
+AUTH_TIMEOUT_SECONDS = float(os.getenv("WS_AUTH_TIMEOUT_SECONDS", "10"))
+
+# 1013 "Try Again Later": the client was too slow and should reconnect
+SLOW_CONSUMER_CLOSE_CODE = 1013
+# 1008 "Policy Violation": missing or wrong access token
+POLICY_VIOLATION_CLOSE_CODE = 1008
+
+KEEP = "keep"
+COALESCE = "coalesce"
+DROP = "drop"
+
+# Message type -> (policy, field identifying what a coalescing message is about)
+MESSAGE_POLICIES: Dict[str, Tuple[str, Optional[str]]] = {
+    "chat": (KEEP, None),
+    "chat_message": (KEEP, None),
+    "notification": (KEEP, None),
+    "meeting_request": (KEEP, None),
+    "meeting_status_update": (COALESCE, "request_id"),
+    "new_forum": (DROP, None),
+    "new_post": (DROP, None),
+    "subscribed": (KEEP, None),
+    "unsubscribed": (KEEP, None),
+    "resumed": (KEEP, None),
+    "resync": (KEEP, None),
+}
+DEFAULT_POLICY = (KEEP, None)
+
+# Topics a client may subscribe to over /ws/{user_id}; all of them carry public
+# forum data, private events (notifications, chat) only go to the user's own sockets:
+#   forums            forum list changes (new forums)
+#   forum:<id>        new posts and replies in one forum
+#   thread:<post id>  replies anywhere under one thread root
+#   user:<id>         posts written by one user
+TOPIC_PATTERN = re.compile(r"^(forums|(forum|thread|user):[A-Za-z0-9_-]{1,64})$")
+
+# (user_id, cursor) -> [(message, message_type), ...] oldest first, or None to make the client resync
+ResumeHandler = Callable[[str, str], Awaitable[Optional[List[Tuple[str, str]]]]]
+# access token -> the user id it was issued to, or None when it is invalid or expired
+TokenVerifier = Callable[[str], Optional[str]]
+
+DEPTH_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100, 200, 500)
+
+WS_CONNECTIONS = Gauge("websocket_connections", "Open WebSocket connections")
+WS_BUFFERED = Gauge("websocket_buffered_messages", "Messages waiting in WebSocket send buffers")
+WS_MAX_DEPTH = Gauge("websocket_buffer_depth_max", "Deepest WebSocket send buffer right now")
+WS_DEPTH = Histogram("websocket_buffer_depth", "Send buffer depth seen when a message is queued", buckets=DEPTH_BUCKETS)
+WS_SENT = Counter("websocket_messages_sent_total", "Messages written to WebSocket clients", ["type"])
+WS_DROPPED = Counter("websocket_messages_dropped_total", "Messages not delivered because of backpressure", ["type", "reason"])
+WS_EVICTIONS = Counter("websocket_evictions_total", "Slow WebSocket consumers disconnected", ["reason"])
+WS_SUBSCRIPTIONS = Gauge("websocket_topic_subscriptions", "Topic subscriptions held by open connections")
+
+class OutboundMessage:
+    __slots__ = ("type", "key", "text", "policy")
+
+    def __init__(self, text: str, message_type: Optional[str] = None):
+        policy_key = None
+        if message_type is None:
+            try:
+                data = json.loads(text)
+                message_type = data.get("type", "unknown") if isinstance(data, dict) else "unknown"
+            except ValueError:
+                data, message_type = None, "unknown"
+        else:
+            data = None
+        self.policy, key_field = MESSAGE_POLICIES.get(message_type, DEFAULT_POLICY)
+        if self.policy == COALESCE and key_field:
+            if data is None:
+                data = json.loads(text)
+            policy_key = data.get(key_field)
+            if policy_key is None:
+                # Nothing identifies what it is about, so it cannot safely replace another one
+                self.policy = KEEP
+        self.type = message_type
+        self.key = (message_type, policy_key) if self.policy == COALESCE else None
+        self.text = text
+
+    def for_connection(self) -> "OutboundMessage":
+        """Coalescing edits a queued message in place, so each connection needs its own copy"""
+        if self.key is None:
+            return self
+        clone = OutboundMessage.__new__(OutboundMessage)
+        clone.type, clone.key, clone.text, clone.policy = self.type, self.key, self.text, self.policy
+        return clone
+
+class ClientConnection:
+    """One socket plus its send buffer and writer task"""
+
+    def __init__(self, user_id: str, websocket: WebSocket, manager: "ConnectionManager"):
+        self.user_id = user_id
+        self.websocket = websocket
+        self.manager = manager
+        self.buffer = deque()
+        self.pending: Dict[tuple, OutboundMessage] = {}  # Coalescing key -> queued message
+        self.over_high_water_since: Optional[float] = None
+        self.topics: Set[str] = set()
+        self.closed = False
+        self._ready = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+
+    @property
+    def depth(self) -> int:
+        return len(self.buffer)
+
+    def start(self):
+        self._writer = asyncio.get_running_loop().create_task(self._write())
+
+    def enqueue(self, message: OutboundMessage) -> bool:
+        """Buffer a message according to its policy; False if it was not queued"""
+        if self.closed:
+            return False
+        manager = self.manager
+        depth = self.depth
+        WS_DEPTH.observe(depth)
+
+        if message.policy == COALESCE:
+            queued = self.pending.get(message.key)
+            if queued is not None:
+                # Swap the text in place: the client still gets one, current, update
+                queued.text = message.text
+                WS_DROPPED.labels(type=message.type, reason="coalesced").inc()
+                return True
+
+        if depth >= manager.high_water:
+            now = time.monotonic()
+            if self.over_high_water_since is None:
+                self.over_high_water_since = now
+            elif now - self.over_high_water_since > manager.evict_after:
+                self.evict("over_high_water")
+                return False
+            if message.policy == DROP:
+                WS_DROPPED.labels(type=message.type, reason="high_water").inc()
+                return False
+        if depth >= manager.max_size:
+            self.evict("buffer_full")
+            return False
+
+        self.buffer.append(message)
+        if message.key is not None:
+            self.pending[message.key] = message
+        self._ready.set()
+        return True
+
+    async def _write(self):
+        while True:
+            if not self.buffer:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+            message = self.buffer.popleft()
+            if message.key is not None and self.pending.get(message.key) is message:
+                del self.pending[message.key]
+            if self.over_high_water_since is not None and self.depth <= self.manager.low_water:
+                self.over_high_water_since = None
+            try:
+                await asyncio.wait_for(self.websocket.send_text(message.text), self.manager.send_timeout)
+            except asyncio.TimeoutError:
+                self.evict("send_timeout")
+                return
+            except Exception as e:
+                print(f"Error sending message to {self.user_id}: {e!r}")
+                self.abort()
+                return
+            WS_SENT.labels(type=message.type).inc()
+
+    def evict(self, reason: str):
+        """Disconnect a consumer that cannot keep up; what it had buffered is dropped"""
+        if self.closed:
+            return
+        WS_EVICTIONS.labels(reason=reason).inc()
+        for message in self.buffer:
+            WS_DROPPED.labels(type=message.type, reason="evicted").inc()
+        print(f"⚠️  Evicting slow WebSocket consumer for user {self.user_id} ({reason}, {self.depth} buffered)")
+        self.abort(SLOW_CONSUMER_CLOSE_CODE)
+
+    def abort(self, close_code: Optional[int] = None):
+        """Stop writing, forget the connection and, with a close code, close the socket"""
+        if self.closed:
+            return
+        self.closed = True
+        self.buffer.clear()
+        self.pending.clear()
+        if self._writer and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+        self.manager.disconnect(self)
+        if close_code is not None:
+            asyncio.get_running_loop().create_task(self._close(close_code))
+
+    async def _close(self, code: int):
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            pass  # Already closed by the client
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}
+    def __init__(self, max_size: int = BUFFER_MAX, high_water: int = BUFFER_HIGH_WATER,
+                 evict_after: float = EVICT_AFTER_SECONDS, send_timeout: float = SEND_TIMEOUT_SECONDS,
+                 backplane: Optional[Backplane] = None):
+        self.max_size = max_size
+        self.high_water = min(high_water, max_size)
+        self.low_water = self.high_water // 2
+        self.evict_after = evict_after
+        self.send_timeout = send_timeout
+        self.backplane = backplane or create_backplane()
+        self.active_connections: Dict[str, Set[ClientConnection]] = {}
+        self.topics: Dict[str, Set[ClientConnection]] = {}  # Topic -> subscribed connections
+        self.resume_handler: Optional[ResumeHandler] = None
+        self.token_verifier: Optional[TokenVerifier] = None
+
+    async def start(self):
+        """Start receiving messages published by other workers"""
+        await self.backplane.start(self.deliver)
+
+    async def stop(self):
+        await self.backplane.stop()
+
+    async def connect(self, user_id: str, websocket: WebSocket) -> Optional[ClientConnection]:
+        """Authenticate and register a socket; None (socket closed with 1008) when the token is not `user_id`'s"""
+        token = websocket.query_params.get("token")
+        if token is None:
+            await websocket.accept()
+            token = await self._receive_auth_frame(websocket)
+        if not self._token_matches(token, user_id):
+            print(f"⚠️  Rejected WebSocket for user {user_id}: missing or invalid token")
+            await websocket.close(code=POLICY_VIOLATION_CLOSE_CODE)
+            return None
+        if websocket.client_state == WebSocketState.CONNECTING:
+            await websocket.accept()
+        connection = ClientConnection(user_id, websocket, self)
+        self.active_connections.setdefault(user_id, set()).add(connection)
+        connection.start()
+        print(f"User {user_id} connected ({len(self.active_connections[user_id])} connection(s)). "
+              f"Total connections: {self.connection_count()}")
+        return connection
+
+    async def _receive_auth_frame(self, websocket: WebSocket) -> Optional[str]:
+        try:
+            message = json.loads(await asyncio.wait_for(websocket.receive_text(), AUTH_TIMEOUT_SECONDS))
+        except (asyncio.TimeoutError, ValueError, WebSocketDisconnect):
+            return None
+        if isinstance(message, dict) and message.get("type") == "auth":
+            return message.get("token")
+        return None
 
-    async def connect(self, user_id: str, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections[user_id] = websocket
-        print(f"User {user_id} connected. Total connections: {len(self.active_connections)}")
+    def _token_matches(self, token, user_id: str) -> bool:
+        if not isinstance(token, str) or self.token_verifier is None:
+            return False
+        return self.token_verifier(token) == str(user_id)
 
-    def disconnect(self, user_id: str):
-        if user_id in self.active_connections:
-            del self.active_connections[user_id]
-            print(f"User {user_id} disconnected. Total connections: {len(self.active_connections)}")
+    def disconnect(self, connection: ClientConnection):
+        connections = self.active_connections.get(connection.user_id)
+        if connections is None or connection not in connections:
+            return
+        connections.discard(connection)
+        if not connections:
+            del self.active_connections[connection.user_id]
+        for topic in list(connection.topics):
+            self._remove_subscription(connection, topic)
+        connection.abort()
+        print(f"User {connection.user_id} disconnected. Total connections: {self.connection_count()}")
 
-    async def send_personal_message(self, user_id: str, message: str):
-        if user_id in self.active_connections:
+    def subscribe(self, connection: ClientConnection, topics) -> Tuple[list, list]:
+        """Subscribe a connection to topics; returns (subscribed, rejected)"""
+        subscribed, rejected = [], []
+        for topic in topics:
+            if not isinstance(topic, str) or not TOPIC_PATTERN.match(topic):
+                rejected.append(topic)
+                continue
+            if topic not in connection.topics and len(connection.topics) >= MAX_TOPICS_PER_CONNECTION:
+                rejected.append(topic)
+                continue
+            connection.topics.add(topic)
+            self.topics.setdefault(topic, set()).add(connection)
+            subscribed.append(topic)
+        return subscribed, rejected
+
+    def unsubscribe(self, connection: ClientConnection, topics) -> list:
+        removed = [topic for topic in topics if topic in connection.topics]
+        for topic in removed:
+            self._remove_subscription(connection, topic)
+        return removed
+
+    def _remove_subscription(self, connection: ClientConnection, topic: str):
+        connection.topics.discard(topic)
+        subscribers = self.topics.get(topic)
+        if subscribers is not None:
+            subscribers.discard(connection)
+            if not subscribers:
+                del self.topics[topic]
+
+    async def handle_client_message(self, connection: ClientConnection, message_data: dict) -> bool:
+        """Handle subscribe/unsubscribe/resume requests from a client; False for other message types"""
+        if message_data.get("type") in ("subscribe", "resume") and \
+                message_data.get("user_id") not in (None, connection.user_id):
+            # A socket only ever acts for the user it authenticated as
+            print(f"⚠️  User {connection.user_id} asked to {message_data['type']} as user {message_data['user_id']}")
+            connection.abort(POLICY_VIOLATION_CLOSE_CODE)
+            return True
+        if message_data.get("type") == "resume":
+            await self.resume(connection, message_data.get("cursor"))
+            return True
+        topics = message_data.get("topics")
+        if not isinstance(topics, list):
+            topics = [message_data.get("topic")]
+        if message_data.get("type") == "subscribe":
+            subscribed, rejected = self.subscribe(connection, topics)
+            connection.enqueue(OutboundMessage(
+                json.dumps({"type": "subscribed", "topics": subscribed, "rejected": rejected}), "subscribed"
+            ))
+            return True
+        if message_data.get("type") == "unsubscribe":
+            removed = self.unsubscribe(connection, topics)
+            connection.enqueue(OutboundMessage(json.dumps({"type": "unsubscribed", "topics": removed}), "unsubscribed"))
+            return True
+        return False
+
+    async def resume(self, connection: ClientConnection, cursor: Optional[str]):
+        """Replay what a reconnecting client missed since `cursor` to that connection only"""
+        events = None
+        if cursor and self.resume_handler is not None:
             try:
-                await self.active_connections[user_id].send_text(message)
+                events = await self.resume_handler(connection.user_id, str(cursor))
             except Exception as e:
-                print(f"Error sending message to {user_id}: {e}")
-                self.disconnect(user_id)
-
-    async def broadcast(self, message: str, exclude_user: str = None):
-        disconnected_users = []
-        for user_id, connection in self.active_connections.items():
-            if user_id != exclude_user:
-                try:
-                    await connection.send_text(message)
-                except Exception as e:
-                    print(f"Error broadcasting to {user_id}: {e}")
-                    disconnected_users.append(user_id)
-        
-        for user_id in disconnected_users:
-            self.disconnect(user_id)
+                print(f"❌ Resume for user {connection.user_id} failed: {e}")
+        if events is not None and connection.depth + len(events) >= self.max_size:
+            events = None  # Replaying would overflow the buffer and evict the client
+        if events is None:
+            connection.enqueue(OutboundMessage(json.dumps({"type": "resync"}), "resync"))
+            return
+        for message, message_type in events:
+            connection.enqueue(OutboundMessage(message, message_type))
+        connection.enqueue(OutboundMessage(json.dumps({"type": "resumed", "replayed": len(events)}), "resumed"))
+
+    def connections(self):
+        for connections in list(self.active_connections.values()):
+            yield from list(connections)
+
+    def connection_count(self) -> int:
+        return sum(len(connections) for connections in self.active_connections.values())
+
+    async def send_personal_message(self, user_id: str, message: str, message_type: str = None):
+        """Deliver to every connection of `user_id`, on this worker and the others; never waits on a client"""
+        await self._publish({"kind": "user", "user_id": str(user_id), "message": message, "message_type": message_type})
+
+    async def broadcast(self, message: str, exclude_user: str = None, message_type: str = None):
+        """Deliver to every connected user except `exclude_user`, on every worker"""
+        await self._publish({
+            "kind": "broadcast", "exclude_user": exclude_user, "message": message, "message_type": message_type
+        })
+
+    async def publish(self, topics, message: str, message_type: str = None):
+        """Deliver to the connections subscribed to any of `topics` (each connection gets one copy), on every worker"""
+        await self._publish({"kind": "topic", "topics": list(topics), "message": message, "message_type": message_type})
+
+    async def _publish(self, envelope: dict):
+        self.deliver(envelope)
+        await self.backplane.publish(envelope)
+
+    def deliver(self, envelope: dict):
+        """Queue an envelope's message for the matching connections on this worker"""
+        if envelope["kind"] == "user":
+            targets = list(self.active_connections.get(envelope["user_id"], ()))
+        elif envelope["kind"] == "broadcast":
+            targets = [
+                connection for connection in self.connections()
+                if connection.user_id != envelope.get("exclude_user")
+            ]
+        elif envelope["kind"] == "topic":
+            targets = set()
+            for topic in envelope["topics"]:
+                targets.update(self.topics.get(topic, ()))
+        else:
+            return
+        if not targets:
+            return
+        outbound = OutboundMessage(envelope["message"], envelope.get("message_type"))
+        for connection in targets:
+            connection.enqueue(outbound.for_connection())
+
+    def stats(self) -> dict:
+        depths = [connection.depth for connection in self.connections()]
+        return {
+            "users": len(self.active_connections),
+            "connections": len(depths),
+            "queued_messages": sum(depths),
+            "max_buffer_depth": max(depths, default=0),
+            "high_water": self.high_water,
+            "max_buffer": self.max_size,
+            "topics": len(self.topics),
+            "backplane": self.backplane.name,
+        }
 
 manager = ConnectionManager()
+
+WS_CONNECTIONS.set_function(manager.connection_count)
+WS_BUFFERED.set_function(lambda: sum(connection.depth for connection in manager.connections()))
+WS_SUBSCRIPTIONS.set_function(lambda: sum(len(subscribers) for subscribers in manager.topics.values()))
+WS_MAX_DEPTH.set_function(lambda: max((connection.depth for connection in manager.connections()), default=0))
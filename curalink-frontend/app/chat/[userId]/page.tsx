@@ -3,9 +3,13 @@
 import { useEffect, useRef, useState } from "react";
 import { useParams, useRouter } from "next/navigation";
 import { chatAPI } from "@/lib/api";
+import { listenToConversation, mergeMessage } from "@/lib/websocket";
 import { motion } from "framer-motion";
 import { ArrowLeft, Send } from "lucide-react";
 
+// New messages are pushed over the WebSocket; this slow poll is only a safety net
+const FALLBACK_POLL_MS = 30000;
+
 interface MessageItem {
   id?: number;
   sender_id?: number;
@@ -51,8 +55,17 @@ export default function ChatPage() {
     };
 
     load();
-    pollRef.current = window.setInterval(load, 2500);
+    const stopListening = listenToConversation(
+      otherUserId,
+      (message) => {
+        setMessages((prev) => mergeMessage(prev, message as unknown as MessageItem));
+        setTimeout(scrollToBottom, 100);
+      },
+      load
+    );
+    pollRef.current = window.setInterval(load, FALLBACK_POLL_MS);
     return () => {
+      stopListening();
       if (pollRef.current) window.clearInterval(pollRef.current);
     };
   }, [otherUserId]);
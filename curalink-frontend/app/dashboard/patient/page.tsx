@@ -17,6 +17,7 @@ import ChatModal from '@/components/ChatModal';
 import VideoCallModal from '@/components/VideoCallModal';
 import { useNotifications } from '@/contexts/NotificationContext';
 import { useTheme } from '@/contexts/ThemeContext';
+import { wsManager } from '@/lib/websocket';
 
 interface User {
   id: string;
@@ -205,12 +206,19 @@ export default function PatientDashboard() {
     }
   }, [notifications, markAsRead]);
 
-  // Polling for meetings to keep in sync with researcher actions
+  // Refresh meetings when a researcher accepts or declines (pushed), with a slow fallback poll
   useEffect(() => {
-    const id = window.setInterval(() => {
+    const refresh = () => {
       meetingsAPI.getAll().then((res) => setMeetings(res.data || [])).catch(() => {});
-    }, 30000);
-    return () => window.clearInterval(id);
+    };
+    wsManager.on('meeting_status_update', refresh);
+    wsManager.on('resync', refresh);
+    const id = window.setInterval(refresh, 30000);
+    return () => {
+      wsManager.off('meeting_status_update', refresh);
+      wsManager.off('resync', refresh);
+      window.clearInterval(id);
+    };
   }, []);
 
   // Reminder for upcoming accepted meetings (patient side)
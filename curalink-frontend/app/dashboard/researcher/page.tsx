@@ -14,6 +14,7 @@ import NotificationDropdown from '@/components/NotificationDropdown';
 import NotificationBanner from '@/components/NotificationBanner';
 import { useNotifications } from '@/contexts/NotificationContext';
 import { useTheme } from '@/contexts/ThemeContext';
+import { wsManager } from '@/lib/websocket';
 import ChatModal from '@/components/ChatModal';
 
 interface User {
@@ -102,12 +103,19 @@ export default function ResearcherDashboard() {
     }
   }, [notifications, markAsRead]);
 
-  // Lightweight polling to refresh meetings every 30s for near real-time updates
+  // Refresh when a meeting request arrives (pushed), with a slow fallback poll
   useEffect(() => {
-    const id = window.setInterval(() => {
+    const refresh = () => {
       loadData();
-    }, 30000);
-    return () => window.clearInterval(id);
+    };
+    wsManager.on('meeting_request', refresh);
+    wsManager.on('resync', refresh);
+    const id = window.setInterval(refresh, 30000);
+    return () => {
+      wsManager.off('meeting_request', refresh);
+      wsManager.off('resync', refresh);
+      window.clearInterval(id);
+    };
   }, []);
 
   const loadData = async () => {
@@ -4,6 +4,10 @@ import { useState, useEffect, useRef, useCallback } from 'react';
 import { motion, AnimatePresence } from 'framer-motion';
 import { X, Send, MessageCircle } from 'lucide-react';
 import { chatAPI } from '@/lib/api';
+import { listenToConversation, mergeMessage } from '@/lib/websocket';
+
+// New messages are pushed over the WebSocket; this slow poll is only a safety net
+const FALLBACK_POLL_MS = 30000;
 
 interface Message {
   id: string;
@@ -51,12 +55,22 @@ export default function ChatModal({ isOpen, onClose, otherUser }: ChatModalProps
     if (isOpen) {
       loadMessages();
       
-      // Set up real-time polling for messages
-      const interval = setInterval(() => {
-        loadMessages();
-      }, 2000); // Poll every 2 seconds
+      const stopListening = listenToConversation(
+        otherUser.id,
+        (message) => setMessages(prev => mergeMessage(prev, {
+          ...message,
+          id: String(message.id),
+          sender_id: String(message.sender_id),
+          sender_name: message.sender_name || '',
+        })),
+        loadMessages
+      );
+      const interval = setInterval(loadMessages, FALLBACK_POLL_MS);
       
-      return () => clearInterval(interval);
+      return () => {
+        stopListening();
+        clearInterval(interval);
+      };
     }
   }, [isOpen, otherUser.id, loadMessages]);
 
@@ -4,6 +4,10 @@ import { useEffect, useRef, useState } from 'react';
 import { motion, AnimatePresence } from 'framer-motion';
 import { X, Send, MessageSquare } from 'lucide-react';
 import { chatAPI } from '@/lib/api';
+import { listenToConversation, mergeMessage } from '@/lib/websocket';
+
+// New messages are pushed over the WebSocket; this slow poll is only a safety net
+const FALLBACK_POLL_MS = 30000;
 
 interface ConversationChatModalProps {
   isOpen: boolean;
@@ -41,9 +45,18 @@ export default function ConversationChatModal({ isOpen, onClose, otherUser }: Co
     };
 
     loadMessages();
-    pollRef.current = window.setInterval(loadMessages, 2500);
+    const stopListening = listenToConversation(
+      otherUser.id,
+      (message) => {
+        setMessages(prev => mergeMessage(prev, message as unknown as MessageItem));
+        setTimeout(scrollToBottom, 100);
+      },
+      loadMessages
+    );
+    pollRef.current = window.setInterval(loadMessages, FALLBACK_POLL_MS);
 
     return () => {
+      stopListening();
       if (pollRef.current) window.clearInterval(pollRef.current);
     };
   }, [isOpen, otherUser]);
@@ -15,6 +15,7 @@ interface Notification {
   sender_id?: string;
   call_room?: string;
   message_content?: string;
+  occurrences?: number;
   read: boolean;
 }
 
@@ -163,6 +164,9 @@ export default function NotificationDropdown({
                                 : 'text-gray-700 dark:text-gray-300'
                             }`}>
                               {notification.title}
+                              {(notification.occurrences ?? 1) > 1 && (
+                                <span className="ml-1 text-xs text-gray-500 dark:text-gray-400">({notification.occurrences})</span>
+                              )}
                             </h4>
                             <p className="text-sm text-gray-600 dark:text-gray-400 mt-1">
                               Don&apos;t miss important updates
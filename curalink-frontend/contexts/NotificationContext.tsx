@@ -1,7 +1,11 @@
 'use client';
 
-import React, { createContext, useContext, useState, useEffect, useCallback } from 'react';
+import React, { createContext, useContext, useState, useEffect, useCallback, useRef } from 'react';
 import { notificationsAPI } from '@/lib/api';
+import { wsManager } from '@/lib/websocket';
+
+// Notifications are pushed over the WebSocket; this slow poll only covers a socket that cannot connect
+const FALLBACK_POLL_MS = 60000;
 
 interface Notification {
   id: string;
@@ -14,6 +18,7 @@ interface Notification {
   sender_id?: string;
   call_room?: string;
   message_content?: string;
+  occurrences?: number;
   read: boolean;
 }
 
@@ -50,6 +55,8 @@ export const NotificationProvider: React.FC<NotificationProviderProps> = ({ chil
   const [onCallAccepted, setOnCallAccepted] = useState<((roomName: string) => void) | undefined>();
 
   const unreadCount = notifications.filter(n => !n.read).length;
+  const notificationsRef = useRef<Notification[]>([]);
+  notificationsRef.current = notifications;
 
   // Fetch notifications from backend
   const fetchNotifications = useCallback(async () => {
@@ -98,7 +105,8 @@ export const NotificationProvider: React.FC<NotificationProviderProps> = ({ chil
 
   // Add new notification (for real-time updates)
   const addNotification = useCallback((notification: Notification) => {
-    setNotifications(prev => [notification, ...prev]);
+    // A coalesced notification replaces the earlier copy and moves to the top
+    setNotifications(prev => [notification, ...prev.filter(n => String(n.id) !== String(notification.id))]);
     
     // Handle special "Call Accepted" notifications - auto-open video modal
     if (notification.title === 'Call Accepted' && notification.type === 'video_call' && notification.call_room) {
@@ -187,9 +195,8 @@ export const NotificationProvider: React.FC<NotificationProviderProps> = ({ chil
     setActiveBanner(null);
   }, []);
 
-  // Real-time polling for notifications
+  // Connect the WebSocket that pushes notifications; keep a slow fallback poll
   useEffect(() => {
-    // Only start polling if user has a token
     const token = localStorage.getItem('token');
     if (!token) {
       setNotifications([]);
@@ -197,52 +204,50 @@ export const NotificationProvider: React.FC<NotificationProviderProps> = ({ chil
     }
     
     fetchNotifications();
+    try {
+      const user = JSON.parse(localStorage.getItem('user') || 'null');
+      if (user?.id != null) {
+        wsManager.connect(String(user.id));
+      }
+    } catch {}
+    
     const interval = setInterval(() => {
       // Check token before each fetch
-      const currentToken = localStorage.getItem('token');
-      if (currentToken) {
+      if (localStorage.getItem('token')) {
         fetchNotifications();
       }
-    }, 5000);
+    }, FALLBACK_POLL_MS);
     
     return () => clearInterval(interval);
   }, [fetchNotifications]);
 
-  // Listen for real-time updates (WebSocket simulation with polling)
+  // Notifications pushed at write time (and replayed after a reconnect)
   useEffect(() => {
-    let lastNotificationCount = notifications.length;
-    
-    const checkForNewNotifications = async () => {
-      try {
-        const token = localStorage.getItem('token');
-        if (!token) return; // Skip if not authenticated
-        
-        const response = await notificationsAPI.getAll();
-        const newNotifications = response.data || [];
-        
-        if (newNotifications.length > lastNotificationCount) {
-          // New notifications arrived
-          const latestNotifications = newNotifications.slice(0, newNotifications.length - lastNotificationCount);
-          latestNotifications.forEach((notification: Notification) => {
-            if (!notifications.find(n => n.id === notification.id)) {
-              addNotification(notification);
-            }
-          });
-        }
-        
-        lastNotificationCount = newNotifications.length;
-      } catch (error: any) {
-        if (error.response?.status !== 401) {
-          console.error('Failed to check for new notifications:', error);
-        }
-      }
+    const handleNotification = (data: unknown) => {
+      const notification = (data as { notification?: Notification }).notification;
+      if (!notification) return;
+      // Replays can repeat notifications we already have; a coalesced one comes back with more occurrences
+      const existing = notificationsRef.current.find(n => String(n.id) === String(notification.id));
+      if (existing && (existing.occurrences ?? 1) >= (notification.occurrences ?? 1)) return;
+      const received = {
+        ...notification,
+        timestamp: notification.timestamp || (notification as { created_at?: string }).created_at || new Date().toISOString(),
+      };
+      // Replayed events arrive together, before the next render updates the ref
+      notificationsRef.current = [received, ...notificationsRef.current.filter(n => n !== existing)];
+      addNotification(received);
+    };
+    const handleResync = () => {
+      fetchNotifications();
     };
-
-    // Check for new notifications every 3 seconds for real-time feel
-    const realtimeInterval = setInterval(checkForNewNotifications, 3000);
     
-    return () => clearInterval(realtimeInterval);
-  }, [notifications.length, addNotification]);
+    wsManager.on('notification', handleNotification);
+    wsManager.on('resync', handleResync);
+    return () => {
+      wsManager.off('notification', handleNotification);
+      wsManager.off('resync', handleResync);
+    };
+  }, [addNotification, fetchNotifications]);
 
   const value: NotificationContextType = {
     notifications,
@@ -110,6 +110,9 @@ export const notificationsAPI = {
   markAsRead: (notificationId: string) => api.put(`/api/notifications/${notificationId}/read`),
   markAllAsRead: () => api.put('/api/notifications/mark-all-read'),
   delete: (notificationId: string) => api.delete(`/api/notifications/${notificationId}`),
+  // Many at once: a list of ids and/or an inclusive id range
+  markManyAsRead: (selection: {ids?: string[], from_id?: string, to_id?: string}) => api.put('/api/notifications/bulk-read', selection),
+  deleteMany: (selection: {ids?: string[], from_id?: string, to_id?: string}) => api.post('/api/notifications/bulk-delete', selection),
   sendVideoCall: (data: {receiver_id: string, room_name: string}) => api.post('/api/notifications/video-call', data),
   sendMessage: (data: {receiver_id: string, message_content: string}) => api.post('/api/notifications/message', data),
   respondToVideoCall: (notificationId: string, action: string) => api.put(`/api/notifications/video-call/${notificationId}/respond`, {action}),
@@ -5,22 +5,49 @@ class WebSocketManager {
   private socket: WebSocket | null = null;
   private userId: string | null = null;
   private listeners: Map<string, Set<(data: unknown) => void>> = new Map();
+  // Topics survive reconnects: forums, forum:<id>, thread:<post id>, user:<id>
+  private topics: Set<string> = new Set();
+  // Newest event cursor seen; sent on reconnect so the server replays what we missed
+  private cursor: string | null = null;
+  private hasConnected = false;
 
   connect(userId: string) {
-    if (this.socket?.readyState === WebSocket.OPEN) {
+    if (this.userId === userId && (this.socket?.readyState === WebSocket.OPEN || this.socket?.readyState === WebSocket.CONNECTING)) {
       return;
     }
+    if (this.userId !== userId) {
+      this.cursor = null;
+      this.hasConnected = false;
+    }
 
     this.userId = userId;
     this.socket = new WebSocket(`${WS_URL}/ws/${userId}`);
 
     this.socket.onopen = () => {
       console.log('WebSocket connected');
+      // The server closes the socket (1008) unless the first frame carries our access token
+      this.send({ type: 'auth', token: localStorage.getItem('token') });
+      if (this.topics.size > 0) {
+        this.send({ type: 'subscribe', topics: Array.from(this.topics) });
+      }
+      if (this.hasConnected) {
+        // Catch up on events sent while we were disconnected
+        if (this.cursor) {
+          this.send({ type: 'resume', cursor: this.cursor });
+        } else {
+          this.notifyListeners('resync', { type: 'resync' });
+        }
+      }
+      this.hasConnected = true;
     };
 
     this.socket.onmessage = (event) => {
       try {
         const data = JSON.parse(event.data);
+        // Cursors are ObjectId hex strings, so newer ones compare greater
+        if (typeof data.cursor === 'string' && (!this.cursor || data.cursor > this.cursor)) {
+          this.cursor = data.cursor;
+        }
         this.notifyListeners(data.type, data);
       } catch (error) {
         console.error('Error parsing WebSocket message:', error);
@@ -43,11 +70,13 @@ class WebSocketManager {
   }
 
   disconnect() {
+    this.userId = null;
+    this.cursor = null;
+    this.hasConnected = false;
     if (this.socket) {
       this.socket.close();
       this.socket = null;
     }
-    this.userId = null;
   }
 
   send(data: unknown) {
@@ -56,6 +85,21 @@ class WebSocketManager {
     }
   }
 
+  subscribe(...topics: string[]) {
+    const added = topics.filter((topic) => !this.topics.has(topic));
+    added.forEach((topic) => this.topics.add(topic));
+    if (added.length > 0) {
+      this.send({ type: 'subscribe', topics: added });
+    }
+  }
+
+  unsubscribe(...topics: string[]) {
+    const removed = topics.filter((topic) => this.topics.delete(topic));
+    if (removed.length > 0) {
+      this.send({ type: 'unsubscribe', topics: removed });
+    }
+  }
+
   on(eventType: string, callback: (data: unknown) => void) {
     if (!this.listeners.has(eventType)) {
       this.listeners.set(eventType, new Set());
@@ -79,3 +123,42 @@ class WebSocketManager {
 }
 
 export const wsManager = new WebSocketManager();
+
+export interface LiveChatMessage {
+  id: string | number;
+  sender_id: string | number;
+  receiver_id?: string | number;
+  sender_name?: string;
+  message: string;
+  created_at: string;
+}
+
+// Messages pushed for the conversation with otherUserId; onResync runs when the
+// client missed too much to replay. Returns a function that stops listening.
+export function listenToConversation(
+  otherUserId: string | number,
+  onMessage: (message: LiveChatMessage) => void,
+  onResync: () => void
+) {
+  const other = String(otherUserId);
+  const handleMessage = (data: unknown) => {
+    const message = (data as { message?: LiveChatMessage }).message;
+    if (message && (String(message.sender_id) === other || String(message.receiver_id) === other)) {
+      onMessage(message);
+    }
+  };
+  wsManager.on('chat_message', handleMessage);
+  wsManager.on('resync', onResync);
+  return () => {
+    wsManager.off('chat_message', handleMessage);
+    wsManager.off('resync', onResync);
+  };
+}
+
+// Append pushed messages, skipping ones already loaded (replays can repeat them)
+export function mergeMessage<T extends { id?: string | number; created_at?: string }>(messages: T[], message: T): T[] {
+  if (messages.some((m) => String(m.id) === String(message.id))) {
+    return messages;
+  }
+  return [...messages, message].sort((a, b) => (a.created_at || '').localeCompare(b.created_at || ''));
+}